@@ -5,23 +5,91 @@ from flask_login import login_required, current_user
 
 # 导入服务
 from ..services.patient_service import patient_service
+from ..services import ecg_manager
 from ..services.ecg_manager import get_ecg_system
 
 # 创建Blueprint
 monitor_bp = Blueprint('monitor', __name__)
 
+def _system_for(data):
+    """按请求中的 session_id（JSON 或查询参数）返回监测会话，未指定时为主会话"""
+    session_id = (data or {}).get('session_id') or request.args.get('session_id')
+    return get_ecg_system(session_id)
+
+def _session_not_found():
+    return jsonify({'success': False, 'message': '监测会话不存在'}), 404
+
+@monitor_bp.route('/sessions', methods=['GET'])
+# @login_required  # 暂时禁用登录要求
+def list_sessions():
+    """列出所有监测会话以及共享处理线程池、处理分片和多设备UDP服务器的统计"""
+    executor = ecg_manager.get_executor()
+    shards = ecg_manager.get_shard_manager()
+    udp_server = ecg_manager.get_udp_server()
+    return jsonify({
+        'success': True,
+        'sessions': ecg_manager.list_sessions(),
+        'executor': executor.get_stats() if executor else None,
+        'shards': shards.get_stats() if shards else None,
+        'udp_server': udp_server.get_stats() if udp_server else None
+    })
+
+@monitor_bp.route('/sessions', methods=['POST'])
+# @login_required  # 暂时禁用登录要求
+def create_session():
+    """创建监测会话，之后的 /connect、/start 等请求带上返回的 session_id
+
+    sharded 为 false 时即使启用了处理分片也在 web 进程中处理（例如文件回放）
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        system = ecg_manager.create_session(patient_id=data.get('patient_id'), sharded=data.get('sharded'))
+        return jsonify({
+            'success': True,
+            'message': '已创建监测会话',
+            'session': ecg_manager.session_info(system)
+        }), 201
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'创建监测会话失败: {str(e)}'
+        }), 500
+
+@monitor_bp.route('/sessions/<session_id>', methods=['DELETE'])
+# @login_required  # 暂时禁用登录要求
+def stop_session(session_id):
+    """停止监测会话并断开其数据源（主会话停止后保留）"""
+    try:
+        if not ecg_manager.stop_session(session_id):
+            return _session_not_found()
+        return jsonify({
+            'success': True,
+            'message': '已停止监测会话',
+            'session_id': session_id
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'停止监测会话失败: {str(e)}'
+        }), 500
+
 @monitor_bp.route('/connect', methods=['POST'])
 # @login_required  # 暂时禁用登录要求
 def connect():
     """连接数据源"""
     data = request.get_json()
     source_type = data.get('source_type')
+    system = _system_for(data)
+    if system is None:
+        return _session_not_found()
     
     try:
         if source_type == 'serial':
             port = data.get('port', 'COM7')
             baudrate = int(data.get('baudrate', 921600))
-            get_ecg_system().connect_serial(port=port, baudrate=baudrate)
+            # 串口会话共用 ecg_manager 的复用采集线程
+            system.connect_serial(port=port, baudrate=baudrate,
+                                  acquisition_manager=ecg_manager.get_acquisition_manager())
             return jsonify({
                 'success': True,
                 'message': f'已连接到串口 {port}，波特率 {baudrate}',
@@ -36,7 +104,7 @@ def connect():
             remote_ip = data.get('remote_ip')
             remote_port = int(data.get('remote_port')) if data.get('remote_port') else None
             
-            get_ecg_system().connect_udp(
+            system.connect_udp(
                 local_ip=local_ip,
                 local_port=local_port,
                 remote_ip=remote_ip,
@@ -63,7 +131,7 @@ def connect():
                     'message': '缺少蓝牙设备端口'
                 }), 400
             
-            get_ecg_system().connect_bluetooth(port=port, baudrate=baudrate)
+            system.connect_bluetooth(port=port, baudrate=baudrate)
             
             return jsonify({
                 'success': True,
@@ -82,7 +150,14 @@ def connect():
                     'message': '缺少文件名'
                 }), 400
             
-            get_ecg_system().connect_file(file_name=file_name)
+            if not system.local_sources:
+                # 分片会话的数据源在工作进程中创建，文件回放需要单进程会话
+                return jsonify({
+                    'success': False,
+                    'message': '分片会话不支持文件回放，请以 sharded=false 创建会话'
+                }), 400
+            
+            system.connect_file(file_name=file_name)
             
             return jsonify({
                 'success': True,
@@ -107,8 +182,11 @@ def connect():
 # @login_required  # 暂时禁用登录要求
 def disconnect():
     """断开数据源连接"""
+    system = _system_for(request.get_json(silent=True))
+    if system is None:
+        return _session_not_found()
     try:
-        get_ecg_system().disconnect()
+        system.disconnect()
         return jsonify({
             'success': True,
             'message': '已断开连接'
@@ -125,13 +203,27 @@ def start():
     """开始监测"""
     data = request.get_json()
     speed = float(data.get('speed', 1.0))
+    wire_format = data.get('wire_format')
+    system = _system_for(data)
+    if system is None:
+        return _session_not_found()
     
     try:
-        get_ecg_system().start_monitoring(speed=speed)
+        if wire_format:
+            # 可选的二进制推送格式：'int16' / 'float32'，默认 'json'
+            system.set_wire_format(wire_format)
+        if data.get('latency_target') is not None or data.get('max_samples') is not None:
+            # 可选的推送策略：延迟目标（秒）和每次推送的最大样本数
+            system.set_flush_policy(data.get('latency_target'), data.get('max_samples'))
+        system.start_monitoring(speed=speed)
         return jsonify({
             'success': True,
             'message': '开始监测',
-            'speed': speed
+            'session_id': system.session_id,
+            'speed': speed,
+            'wire_format': system.wire_format,
+            'latency_target': system.latency_target,
+            'max_samples': system.max_samples
         })
     except Exception as e:
         return jsonify({
@@ -143,8 +235,11 @@ def start():
 # @login_required  # 暂时禁用登录要求
 def stop():
     """停止监测"""
+    system = _system_for(request.get_json(silent=True))
+    if system is None:
+        return _session_not_found()
     try:
-        get_ecg_system().stop()
+        system.stop()
         return jsonify({
             'success': True,
             'message': '停止监测'
@@ -155,6 +250,24 @@ def stop():
             'message': f'停止监测失败: {str(e)}'
         }), 500
 
+@monitor_bp.route('/pipeline-stats', methods=['GET'])
+# @login_required  # 暂时禁用登录要求
+def pipeline_stats():
+    """获取处理流水线统计：缓冲区占用、各阶段队列深度、推送次数和端到端延迟"""
+    system = _system_for(None)
+    if system is None:
+        return _session_not_found()
+    try:
+        return jsonify({
+            'success': True,
+            'stats': system.get_pipeline_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取流水线统计失败: {str(e)}'
+        }), 500
+
 @monitor_bp.route('/set-patient', methods=['POST'])
 # @login_required  # 暂时禁用登录要求
 def set_monitoring_patient():
@@ -164,6 +277,9 @@ def set_monitoring_patient():
     # 检查必要字段
     if 'patient_id' not in data:
         return jsonify({'success': False, 'message': '缺少患者ID'}), 400
+    system = _system_for(data)
+    if system is None:
+        return _session_not_found()
     
     # 检查患者是否存在
     patient_result = patient_service.get_patient(data['patient_id'])
@@ -171,7 +287,7 @@ def set_monitoring_patient():
         return jsonify({'success': False, 'message': '患者不存在'}), 404
     
     # 设置患者ID
-    get_ecg_system().set_patient_id(data['patient_id'])
+    system.set_patient_id(data['patient_id'])
     
     return jsonify({
         'success': True,
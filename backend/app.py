@@ -102,11 +102,18 @@ socketio = create_socketio(app)
 # 初始化各种服务
 from .services import ecg_manager
 from .services.alert_service import init_alert_service
-ecg_manager.init(socketio)
+ecg_manager.init(socketio, max_workers=config.ECG_WORKER_THREADS, max_sessions=config.ECG_MAX_SESSIONS,
+                 process_shards=config.ECG_PROCESS_SHARDS, serial_multiplex=config.ECG_SERIAL_MULTIPLEX,
+                 udp_server_port=config.ECG_UDP_SERVER_PORT, udp_server_ip=config.ECG_UDP_SERVER_IP,
+                 udp_demux=config.ECG_UDP_DEMUX)
 
 # 初始化报警服务
 init_alert_service(socketio)
 
+# 初始化ecg_data推送订阅服务（分级抽取）
+from .services.stream_service import init_stream_service
+init_stream_service(socketio)
+
 # 初始化数据库连接
 from .data.database_manager import database_manager
 # 确保创建必要的数据库目录
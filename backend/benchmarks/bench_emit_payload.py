@@ -0,0 +1,82 @@
+# bench_emit_payload.py
+
+"""
+ecg_data 推送负载基准：比较整窗口推送与增量推送的带宽和序列化时间
+
+模拟 500 Hz 的 12 导联数据流，每 200 个新样本推送一次：
+    - 整窗口：每次推送全部累积数据（最多 max_samples * 10 = 2000 点/导联），即原来的协议
+    - 增量：每次只推送上次之后的新样本，并带事件序号和首个样本序号
+两种负载都按 Socket.IO 的方式转换为列表并用 json.dumps 序列化，报告每秒的字节数和序列化耗时。
+
+用法:
+    python -m backend.benchmarks.bench_emit_payload --duration 60 --rate 500
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backend.utils.ring_buffer import LeadRingBuffer
+
+
+def window_payload(ring, window):
+    times, leads = ring.latest(window)
+    return {'leads': leads.tolist(), 'time_stamps': times.tolist()}
+
+
+def incremental_payload(ring, new_samples, seq):
+    times, leads = ring.latest(new_samples)
+    return {
+        'leads': leads.tolist(),
+        'time_stamps': times.tolist(),
+        'seq': seq,
+        'first_sample_index': int(ring.latest_indices(new_samples)[0]),
+        'sample_count': new_samples
+    }
+
+
+def run(duration, rate, max_samples):
+    ring = LeadRingBuffer(capacity=max_samples * 10, leads=12)
+    rng = np.random.default_rng(0)
+    totals = {mode: {'bytes': 0, 'seconds': 0.0, 'events': 0} for mode in ('window', 'incremental')}
+    seq = 0
+
+    for first in range(0, int(duration * rate), max_samples):
+        block = rng.standard_normal((12, max_samples)).astype(np.float32)
+        ring.append(block, (first + np.arange(max_samples)) / rate)
+        seq += 1
+
+        for mode in totals:
+            start = time.perf_counter()
+            if mode == 'window':
+                payload = window_payload(ring, max_samples * 10)
+            else:
+                payload = incremental_payload(ring, max_samples, seq)
+            encoded = json.dumps(payload)
+            totals[mode]['seconds'] += time.perf_counter() - start
+            totals[mode]['bytes'] += len(encoded)
+            totals[mode]['events'] += 1
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ecg_data 推送负载基准')
+    parser.add_argument('--duration', type=float, default=60.0, help='模拟的数据时长（秒）')
+    parser.add_argument('--rate', type=int, default=500, help='采样率（Hz）')
+    parser.add_argument('--max-samples', type=int, default=200, help='每次推送的新样本数')
+    args = parser.parse_args()
+
+    totals = run(args.duration, args.rate, args.max_samples)
+    for mode, total in totals.items():
+        print(f"{mode:>11}: {total['events']} 次推送, {total['bytes'] / args.duration / 1024:>9,.1f} KB/秒, "
+              f"序列化 {total['seconds'] / total['events'] * 1000:>6.2f} ms/次 "
+              f"({total['seconds'] / args.duration * 100:.2f}% CPU)")
+    window, incremental = totals['window'], totals['incremental']
+    print(f"增量推送节省带宽 {1 - incremental['bytes'] / window['bytes']:.1%}, "
+          f"节省序列化时间 {1 - incremental['seconds'] / window['seconds']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# bench_flush_policy.py
+
+"""
+推送策略基准：延迟目标与推送开销的权衡
+
+按实时速度向 ECGMonitoringSystem 送入数据（每 block-interval 秒到达一块），对每个延迟目标报告：
+    - 每秒推送次数（开销）
+    - 端到端延迟：每次推送中最早样本和最新样本从采样时间到推送完成的时间
+推送目标是只记录事件的假 SocketIO，数据库写入被替换为空操作。
+
+用法:
+    python -m backend.benchmarks.bench_flush_policy --targets 0.01,0.04,0.1,0.4 --duration 5
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import time
+
+import numpy as np
+
+import backend.services.monitoring_service as monitoring_service
+
+
+class CountingSocketIO:
+    def __init__(self):
+        self.events = 0
+
+    def emit(self, event, *args, **kwargs):
+        if event == 'ecg_data':
+            self.events += 1
+
+
+def run(latency_target, max_samples, duration, rate, block_interval):
+    monitoring_service.database_manager.store_ecg_data = lambda **kwargs: True
+    socketio = CountingSocketIO()
+    system = monitoring_service.ECGMonitoringSystem(socketio)
+    system.set_flush_policy(latency_target, max_samples)
+    system._reset_stream()
+    system._start_processing()
+
+    rng = np.random.default_rng(0)
+    block = max(1, int(round(rate * block_interval)))
+    period = block / rate
+    start = time.time()
+    for i in range(int(duration / period)):
+        # 按实时速度到达，样本时间戳为各自的采样时间
+        arrival = start + (i + 1) * period
+        eventlet.sleep(max(0.0, arrival - time.time()))
+        timestamps = arrival - (block - 1 - np.arange(block)) / rate
+        system.handle_new_block(rng.standard_normal((block, 8)).astype(np.float32), timestamps)
+    system._stop_processing()
+
+    stats = system.get_pipeline_stats()
+    return socketio.events / duration, stats['latency'], stats['flush']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推送策略基准')
+    parser.add_argument('--targets', type=str, default='0.01,0.04,0.1,0.4', help='逗号分隔的延迟目标（秒）')
+    parser.add_argument('--max-samples', type=int, default=200, help='每次推送的最大样本数')
+    parser.add_argument('--duration', type=float, default=5.0, help='每个目标的运行秒数')
+    parser.add_argument('--rate', type=int, default=500, help='采样率（Hz）')
+    parser.add_argument('--block-interval', type=float, default=0.008, help='设备数据块的到达间隔（秒）')
+    args = parser.parse_args()
+
+    for target in [float(t) for t in args.targets.split(',')]:
+        events_per_second, latency, flush = run(target, args.max_samples, args.duration, args.rate,
+                                                args.block_interval)
+        oldest, newest = latency['oldest'], latency['newest']
+        print(f"目标 {target * 1000:>5.0f} ms: {events_per_second:>6.1f} 次推送/秒 "
+              f"(定时 {flush['timer']}, 满批 {flush['size']}), "
+              f"最早样本延迟 p50 {oldest.get('p50', 0) * 1000:>6.1f} ms / p99 {oldest.get('p99', 0) * 1000:>6.1f} ms, "
+              f"最新样本延迟 p50 {newest.get('p50', 0) * 1000:>5.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
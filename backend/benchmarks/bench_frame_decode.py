@@ -0,0 +1,65 @@
+# bench_frame_decode.py
+
+"""
+Firewater 帧解码微基准：比较 SerialPortReader 逐帧解析与块解码的帧/秒
+
+用法:
+    python -m backend.benchmarks.bench_frame_decode --frames 200000 --chunk 4096
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.devices.firewater import encode_frames
+from backend.devices.serial_reader import SerialPortReader
+
+
+def make_stream(n_frames, channels=8, seed=0):
+    """生成 n_frames 个随机 Firewater 帧"""
+    rng = np.random.default_rng(seed)
+    values = rng.standard_normal((n_frames, channels)).astype(np.float32)
+    return encode_frames(values)
+
+
+def run(stream, chunk_size, block_decoding):
+    """按 chunk_size 分块喂给 SerialPortReader，返回 (帧数, 耗时秒)"""
+    reader = SerialPortReader(port=None)
+    reader.block_decoding = block_decoding
+    reader.stats['start_time'] = time.time()
+
+    received = [0]
+
+    def on_frame(values, timestamp):
+        received[0] += 1
+
+    reader.register_callback(on_frame)
+
+    start = time.perf_counter()
+    for i in range(0, len(stream), chunk_size):
+        reader._handle_bytes(stream[i:i + chunk_size])
+    elapsed = time.perf_counter() - start
+    return received[0], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Firewater 帧解码微基准')
+    parser.add_argument('--frames', type=int, default=200000, help='帧数')
+    parser.add_argument('--chunk', type=int, default=4096, help='每次读取的字节数')
+    args = parser.parse_args()
+
+    stream = make_stream(args.frames)
+    print(f"{args.frames} 帧, {len(stream)} 字节, 分块 {args.chunk} 字节")
+
+    results = {}
+    for name, block_decoding in (('逐帧解析', False), ('块解码', True)):
+        frames, elapsed = run(stream, args.chunk, block_decoding)
+        results[name] = frames / elapsed
+        print(f"{name}: {frames} 帧, {elapsed:.3f} 秒, {frames / elapsed:,.0f} 帧/秒")
+
+    print(f"加速比: {results['块解码'] / results['逐帧解析']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# bench_lead_derivation.py
+
+"""
+12导联导出微基准：比较逐样本 compute_12_leads 与按块矩阵导出 compute_12_leads_block
+
+逐样本路径与原来的监测系统一致：每个样本转换为 Python 列表，调用一次 compute_12_leads，
+再把 12 个导联值组成数组；块路径对整块 (n, 8) 数据乘以 (8, 12) 导出矩阵。
+同时检查两条路径的结果一致。
+
+用法:
+    python -m backend.benchmarks.bench_lead_derivation --samples 200000 --blocks 1,16,200,4096
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.processing.ecg_data_processor import ECGDataProcessor
+
+
+def per_sample(processor, values):
+    """逐样本导出，返回 (n, 12) 数组"""
+    return np.array([processor.compute_12_leads(row) for row in values.tolist()], dtype=np.float32)
+
+
+def per_block(processor, values, block_size):
+    """按 block_size 分块导出，返回 (n, 12) 数组"""
+    return np.concatenate([processor.compute_12_leads_block(values[i:i + block_size])
+                           for i in range(0, len(values), block_size)])
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='12导联导出微基准')
+    parser.add_argument('--samples', type=int, default=200000, help='样本数')
+    parser.add_argument('--blocks', type=str, default='1,16,200,4096', help='逗号分隔的块大小')
+    args = parser.parse_args()
+
+    processor = ECGDataProcessor()
+    values = np.random.default_rng(0).standard_normal((args.samples, 8)).astype(np.float32)
+
+    reference, elapsed = timed(per_sample, processor, values)
+    print(f"逐样本: {args.samples / elapsed:>12,.0f} 样本/秒")
+
+    for block_size in [int(b) for b in args.blocks.split(',')]:
+        leads, elapsed = timed(per_block, processor, values, block_size)
+        error = float(np.abs(leads - reference).max())
+        print(f"块大小 {block_size:>5}: {args.samples / elapsed:>12,.0f} 样本/秒, 与逐样本最大差 {error:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# bench_lod_fanout.py
+
+"""
+分级抽取（LOD）推送基准：比较全速率推送与按订阅点率抽取后推送的带宽和服务端耗时
+
+模拟 500 Hz 的 12 导联数据流，每 200 个新样本推送一次，若干客户端分别订阅不同的点率：
+    - 全速率：每个事件把 12 导联全部样本编码一次
+    - LOD：ECGStreamService 对每个点率计算一次最小/最大值包络，每个房间编码一次
+推送目标是记录负载的假 SocketIO，只统计编码后的字节数，不经过网络。
+
+用法:
+    python -m backend.benchmarks.bench_lod_fanout --levels 100,200,400 --duration 60
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backend.services.stream_service import ECGStreamService
+from backend.utils.ecg_wire import encode_ecg_block
+
+
+class RecordingSocketIO:
+    """只记录 emit 负载大小的 SocketIO 替身"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.events = 0
+
+    def emit(self, event, payload, to=None):
+        self.events += 1
+        self.bytes += len(payload) if isinstance(payload, (bytes, bytearray)) else len(json.dumps(payload))
+
+
+def build_service(levels, leads):
+    socketio = RecordingSocketIO()
+    service = ECGStreamService()
+    service.socketio = socketio
+    noop = lambda *args, **kwargs: None
+    for i, points_per_second in enumerate(levels):
+        room, subscription = service.room_for({'session_id': 'bench', 'points_per_second': points_per_second,
+                                               'leads': leads})
+        service._move_client(f"client-{i}", room, subscription, noop, noop)
+    return service, socketio
+
+
+def run(levels, leads, duration, rate, block, wire_format):
+    rng = np.random.default_rng(0)
+    service, socketio = build_service(levels, leads)
+    full = RecordingSocketIO()
+    totals = {'full': 0.0, 'lod': 0.0}
+
+    for first in range(0, int(duration * rate), block):
+        values = rng.standard_normal((12, block)).astype(np.float32)
+        times = (first + np.arange(block)) / rate
+
+        start = time.perf_counter()
+        if wire_format == 'json':
+            full.emit('ecg_data', {'leads': values.tolist(), 'time_stamps': times.tolist()})
+        else:
+            full.emit('ecg_data', encode_ecg_block(values, float(times[0]), rate, first_sample_index=first,
+                                                   dtype=wire_format))
+        totals['full'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        service.publish('bench', values, times, first, rate, seq=0, wire_format=wire_format)
+        totals['lod'] += time.perf_counter() - start
+    return full, socketio, totals, service.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分级抽取推送基准')
+    parser.add_argument('--levels', type=str, default='100,200,400', help='逗号分隔的订阅点率（点/秒/导联）')
+    parser.add_argument('--leads', type=str, default='', help='逗号分隔的订阅导联下标，默认全部 12 个')
+    parser.add_argument('--duration', type=float, default=60.0, help='模拟的数据时长（秒）')
+    parser.add_argument('--rate', type=int, default=500, help='采样率（Hz）')
+    parser.add_argument('--block', type=int, default=200, help='每次推送的新样本数')
+    parser.add_argument('--wire-format', choices=('json', 'int16', 'float32'), default='json', help='推送编码')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    leads = [int(lead) for lead in args.leads.split(',')] if args.leads else None
+    full, lod, totals, stats = run(levels, leads, args.duration, args.rate, args.block, args.wire_format)
+
+    print(f"全速率: {full.bytes / args.duration / 1024:>9,.1f} KB/秒/客户端, "
+          f"编码 {totals['full'] / args.duration * 1000:>7.2f} ms/秒")
+    print(f"   LOD: {lod.bytes / args.duration / 1024:>9,.1f} KB/秒（{len(levels)} 个房间合计）, "
+          f"抽取+编码 {totals['lod'] / args.duration * 1000:>7.2f} ms/秒, "
+          f"{stats['lod_points'] / args.duration:,.0f} 点/秒")
+    print(f"LOD 房间平均带宽为全速率的 {lod.bytes / len(levels) / full.bytes:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# bench_multi_session.py
+
+"""
+多会话容量基准：一个进程能同时维持多少个 12 导联 500 Hz 监测会话
+
+通过 ecg_manager 创建 N 个会话（共用 SessionExecutor 线程池），一个发送绿线程按实时速度
+每 block-interval 秒向每个会话送入一块 8 通道数据。每个会话完整经过导联计算、滤波、
+推送（编码负载，假 SocketIO 不发送）和存储阶段（数据库写入替换为空操作）。
+
+对每个会话数报告：
+    - 处理的样本比例（处理样本数 / 送入样本数）和输入缓冲区丢弃的样本数
+    - 推送端到端延迟（每次推送中最早样本）p95
+    - 线程池调度等待 p95 和忙碌比例
+处理比例不低于 99%、没有丢弃且延迟 p95 不超过 --max-latency 时认为该会话数可以维持。
+
+用法:
+    python -m backend.benchmarks.bench_multi_session --sessions 8,16,32,64 --duration 5
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.services import ecg_manager
+import backend.services.monitoring_service as monitoring_service
+
+
+class NullSocketIO:
+    def emit(self, *args, **kwargs):
+        pass
+
+
+def run(sessions, duration, rate, block_interval, workers, wire_format):
+    monitoring_service.database_manager.store_ecg_data = lambda **kwargs: True
+    ecg_manager.init(NullSocketIO(), max_workers=workers, max_sessions=sessions)
+    systems = []
+    for _ in range(sessions):
+        system = ecg_manager.create_session()
+        system.set_wire_format(wire_format)
+        system._reset_stream()
+        system._start_processing()
+        systems.append(system)
+
+    rng = np.random.default_rng(0)
+    block = max(1, int(round(rate * block_interval)))
+    period = block / rate
+    values = rng.standard_normal((block, 8)).astype(np.float32)
+    offsets = (np.arange(block) - (block - 1)) / rate
+
+    start = time.time()
+    blocks = int(duration / period)
+    for i in range(blocks):
+        arrival = start + (i + 1) * period
+        eventlet.sleep(max(0.0, arrival - time.time()))
+        timestamps = arrival + offsets
+        for system in systems:
+            system.handle_new_block(values, timestamps)
+    elapsed = time.time() - start
+
+    executor = ecg_manager.get_executor()
+    executor_stats = executor.get_stats()
+    latencies = np.concatenate([np.array(system.latency_stats['oldest'].samples) for system in systems])
+    # 停止时各会话先处理完缓冲区中剩余的样本
+    for system in systems:
+        ecg_manager.stop_session(system.session_id)
+    executor.stop()
+    processed = [system.lead_buffer.write_count for system in systems]
+    dropped = sum(system.input_buffer.get_stats()['dropped'] for system in systems)
+
+    offered = blocks * block
+    return {
+        'processed_ratio': min(processed) / offered,
+        'dropped': dropped,
+        'latency_p95': float(np.percentile(latencies, 95)) if len(latencies) else float('inf'),
+        'schedule_p95': executor_stats['schedule_delay'].get('p95', 0.0),
+        'busy_ratio': executor_stats['busy_time'] / (elapsed * workers)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多会话容量基准')
+    parser.add_argument('--sessions', type=str, default='8,16,32,64', help='逗号分隔的会话数')
+    parser.add_argument('--duration', type=float, default=5.0, help='每档持续秒数')
+    parser.add_argument('--rate', type=int, default=500, help='采样率（Hz）')
+    parser.add_argument('--block-interval', type=float, default=0.02, help='设备数据块的到达间隔（秒）')
+    parser.add_argument('--workers', type=int, default=4, help='线程池工作线程数')
+    parser.add_argument('--wire-format', choices=('json', 'int16', 'float32'), default='int16', help='推送编码')
+    parser.add_argument('--max-latency', type=float, default=0.25, help='可维持的推送延迟 p95 上限（秒）')
+    args = parser.parse_args()
+
+    sustained = 0
+    for sessions in [int(n) for n in args.sessions.split(',')]:
+        r = run(sessions, args.duration, args.rate, args.block_interval, args.workers, args.wire_format)
+        ok = r['processed_ratio'] >= 0.99 and r['dropped'] == 0 and r['latency_p95'] <= args.max_latency
+        if ok:
+            sustained = max(sustained, sessions)
+        print(f"{sessions:>4} 个会话: 处理 {r['processed_ratio']:>6.1%}, 丢弃 {r['dropped']:>7}, "
+              f"推送延迟 p95 {r['latency_p95'] * 1000:>8.1f} ms, 调度等待 p95 {r['schedule_p95'] * 1000:>7.1f} ms, "
+              f"线程池忙碌 {r['busy_ratio']:>6.1%} {'可维持' if ok else '超载'}")
+    print(f"可维持的最大会话数: {sustained}")
+
+
+if __name__ == '__main__':
+    main()
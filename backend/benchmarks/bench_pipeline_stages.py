@@ -0,0 +1,78 @@
+# bench_pipeline_stages.py
+
+"""
+推送/存储阶段基准：数据库写入延迟对处理线程的影响
+
+用模拟的数据库写入（固定延迟）替换 database_manager.store_ecg_data，按 500 Hz
+向 ECGMonitoringSystem 的处理路径送入 8 通道数据块，比较：
+    - 同步：推送和存储在处理线程内完成（阶段未启动时的行为）
+    - 分阶段：推送和存储由各自的工作线程处理
+报告每块处理耗时（处理线程被占用的时间）以及存储阶段的批次数和队列深度。
+
+用法:
+    python -m backend.benchmarks.bench_pipeline_stages --store-latency 0.05 --duration 10
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import time
+
+import numpy as np
+
+import backend.services.monitoring_service as monitoring_service
+
+
+class NullSocketIO:
+    def emit(self, *args, **kwargs):
+        pass
+
+
+def run(staged, store_latency, duration, rate, block):
+    def store_ecg_data(**kwargs):
+        time.sleep(store_latency)
+        return True
+
+    monitoring_service.database_manager.store_ecg_data = store_ecg_data
+    system = monitoring_service.ECGMonitoringSystem(NullSocketIO())
+    system._reset_stream()
+    if staged:
+        system.emit_stage.start()
+        system.store_stage.start()
+
+    rng = np.random.default_rng(0)
+    durations = []
+    for first in range(0, int(duration * rate), block):
+        values = rng.standard_normal((block, 8)).astype(np.float32)
+        start = time.perf_counter()
+        system._process_block(values, (first + np.arange(block)) / rate)
+        durations.append(time.perf_counter() - start)
+        eventlet.sleep(0)
+
+    # 停止时存储阶段先写完队列中剩余的块
+    system._stop_processing()
+    stats = system.get_pipeline_stats()['stages']
+    durations = np.array(durations)
+    return durations, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推送/存储阶段基准')
+    parser.add_argument('--store-latency', type=float, default=0.05, help='模拟的数据库写入延迟（秒）')
+    parser.add_argument('--duration', type=float, default=10.0, help='模拟的数据时长（秒）')
+    parser.add_argument('--rate', type=int, default=500, help='采样率（Hz）')
+    parser.add_argument('--block', type=int, default=50, help='每块样本数')
+    args = parser.parse_args()
+
+    for staged in (False, True):
+        durations, stats = run(staged, args.store_latency, args.duration, args.rate, args.block)
+        label = '分阶段' if staged else '  同步'
+        store = stats['store']
+        print(f"{label}: 每块处理 平均 {durations.mean() * 1000:>7.2f} ms, "
+              f"p99 {np.percentile(durations, 99) * 1000:>7.2f} ms, 最大 {durations.max() * 1000:>7.2f} ms; "
+              f"存储 {store['batches']} 批, 队列峰值 {store['queue_high_watermark']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# bench_process_shards.py
+
+"""
+处理分片基准：单进程模式与多进程分片模式下可维持的 UDP 监测会话数
+
+每个会话监听一个回环 UDP 端口，独立的发送进程按实时速率向每个端口发送 Firewater 数据报。
+--shards 为 0 时所有会话在本进程中接收、计算导联和滤波；大于 0 时会话分配到工作进程中，
+滤波后的样本通过共享内存环形缓冲区交给本进程推送。推送使用假 SocketIO（只编码负载），
+数据库写入和 JSON 文件保存替换为空操作。
+
+对每个 分片数 × 会话数 报告：
+    - 推送的样本比例（推送样本数 / 发送样本数，取最差的会话）
+    - 推送端到端延迟（每次推送中最早样本）p95
+    - 本进程和各工作进程的 CPU 占用
+推送比例不低于 98% 且延迟 p95 不超过 --max-latency 时认为可以维持。
+
+用法:
+    python -m backend.benchmarks.bench_process_shards --shards 0,2,4 --sessions 16,32,64 --duration 5
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+
+class NullSocketIO:
+    def emit(self, *args, **kwargs):
+        pass
+
+
+def _sender(ports, rate, duration, frames_per_datagram, ready):
+    """发送进程：按实时速率向每个端口发送数据报"""
+    import socket
+    import time
+
+    from backend.devices.firewater import encode_frames
+
+    rng = np.random.default_rng(0)
+    datagrams = [encode_frames(rng.standard_normal((frames_per_datagram, 8)).astype(np.float32) * 100)
+                 for _ in range(16)]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+    interval = frames_per_datagram / rate
+    total = int(duration / interval)
+    ready.wait()
+    start = time.monotonic()
+    for i in range(total):
+        delay = start + i * interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        datagram = datagrams[i % len(datagrams)]
+        for port in ports:
+            try:
+                sock.sendto(datagram, ('127.0.0.1', port))
+            except OSError:
+                pass
+
+
+def run(shards, sessions, duration, rate, frames_per_datagram, base_port, workers, wire_format):
+    # 在函数内导入：spawn 启动的发送进程会重新导入本模块，不需要加载监测服务和数据库连接
+    from backend.services import ecg_manager
+    import backend.services.monitoring_service as monitoring_service
+
+    monitoring_service.database_manager.store_ecg_data = lambda **kwargs: True
+    ecg_manager.init(NullSocketIO(), max_workers=workers, max_sessions=sessions, process_shards=shards)
+    manager = ecg_manager.get_shard_manager()
+    if shards and manager is None:
+        raise RuntimeError("处理分片启动失败")
+
+    ports = [base_port + i for i in range(sessions)]
+    systems = []
+    for port in ports:
+        system = ecg_manager.create_session()
+        system.set_wire_format(wire_format)
+        system.data_storage.save_data = lambda *args, **kwargs: None
+        system.connect_udp(local_ip='127.0.0.1', local_port=port)
+        system.start_monitoring()
+        systems.append(system)
+
+    # 用 spawn 启动发送进程：fork 出的子进程会共享父进程 eventlet hub 的 epoll 实例
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    sender = context.Process(target=_sender, args=(ports, rate, duration, frames_per_datagram, ready))
+    sender.start()
+    eventlet.sleep(1.0)
+    cpu_start, wall_start = time.process_time(), time.time()
+    ready.set()
+    while sender.is_alive():
+        eventlet.sleep(0.05)
+    eventlet.sleep(0.5)
+    web_cpu = (time.process_time() - cpu_start) / (time.time() - wall_start)
+    shard_cpu = [shard.stats.get('cpu', 0.0) for shard in manager.shards] if manager else []
+
+    latencies = np.concatenate([np.array(system.latency_stats['oldest'].samples) for system in systems])
+    for system in systems:
+        ecg_manager.stop_session(system.session_id)
+    emitted = [system.emit_stats['samples'] for system in systems]
+    ecg_manager.get_executor().stop()
+    if manager is not None:
+        manager.stop()
+
+    offered = int(duration / (frames_per_datagram / rate)) * frames_per_datagram
+    return {
+        'emitted_ratio': min(emitted) / offered,
+        'latency_p95': float(np.percentile(latencies, 95)) if len(latencies) else float('inf'),
+        'web_cpu': web_cpu,
+        'shard_cpu': shard_cpu
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='处理分片基准')
+    parser.add_argument('--shards', type=str, default='0,2,4', help='逗号分隔的分片数，0 为单进程模式')
+    parser.add_argument('--sessions', type=str, default='16,32,64', help='逗号分隔的会话数')
+    parser.add_argument('--duration', type=float, default=5.0, help='每档发送秒数')
+    parser.add_argument('--rate', type=int, default=500, help='每个会话的采样率（Hz）')
+    parser.add_argument('--frames-per-datagram', type=int, default=10, help='每个数据报的帧数')
+    parser.add_argument('--base-port', type=int, default=6200, help='第一个会话的 UDP 端口')
+    parser.add_argument('--workers', type=int, default=4, help='本进程的处理线程数')
+    parser.add_argument('--wire-format', choices=('json', 'int16', 'float32'), default='int16', help='推送编码')
+    parser.add_argument('--max-latency', type=float, default=0.25, help='可维持的推送延迟 p95 上限（秒）')
+    args = parser.parse_args()
+
+    for shards in [int(n) for n in args.shards.split(',')]:
+        sustained = 0
+        for sessions in [int(n) for n in args.sessions.split(',')]:
+            r = run(shards, sessions, args.duration, args.rate, args.frames_per_datagram, args.base_port,
+                    args.workers, args.wire_format)
+            ok = r['emitted_ratio'] >= 0.98 and r['latency_p95'] <= args.max_latency
+            if ok:
+                sustained = max(sustained, sessions)
+            shard_cpu = ' '.join(f"{cpu:.0%}" for cpu in r['shard_cpu']) or '-'
+            print(f"分片 {shards}, {sessions:>4} 个会话: 推送 {r['emitted_ratio']:>6.1%}, "
+                  f"推送延迟 p95 {r['latency_p95'] * 1000:>8.1f} ms, 本进程 CPU {r['web_cpu']:>5.0%}, "
+                  f"分片 CPU {shard_cpu} {'可维持' if ok else '超载'}")
+        print(f"分片 {shards}: 可维持的最大会话数 {sustained}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# bench_respiration_ingest.py
+
+"""
+呼吸波形接收吞吐量基准（回环地址）：发送进程 -> RespirationUDPReceiver -> RespirationMonitoringSystem
+
+独立的发送进程按给定速率（0 表示不限速）发送 Firewater 数据报，每个数据报包含若干帧，
+最后一个通道携带帧序号。监测系统按正常流程 start / stop，报告：
+    - 接收数据报速率和帧速率
+    - 丢失的帧数（由帧序号检测）与内核接收缓冲区丢弃（/proc/net/udp）
+    - 监测系统保留的通道数（应与发送的通道数一致）
+
+用法:
+    python -m backend.benchmarks.bench_respiration_ingest --rates 1000,10000,30000,0 --channels 4
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from backend.respiration_monitoring_system import RespirationMonitoringSystem
+
+
+class NullSocketIO:
+    """只计数、不发送的SocketIO替身"""
+
+    def __init__(self):
+        self.emits = 0
+
+    def emit(self, event, data=None, **kwargs):
+        self.emits += 1
+
+
+def _sender(port, rate, duration, frames_per_datagram, channels, result):
+    """发送进程：按速率发送数据报，rate 为 0 时尽可能快地发送"""
+    import socket
+    import time
+
+    from backend.devices.firewater import encode_frames
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    values = np.zeros((frames_per_datagram, channels), dtype=np.float32)
+    offsets = np.arange(frames_per_datagram)
+    phase = np.linspace(0, 2 * np.pi, frames_per_datagram, endpoint=False)
+    sent = 0
+    start = time.monotonic()
+    end = start + duration
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        if rate and sent >= (now - start) * rate:
+            time.sleep(0.0005)
+            continue
+        values[:, 0] = np.sin(phase + sent * 0.01)
+        values[:, -1] = (sent * frames_per_datagram + offsets) % (1 << 24)
+        try:
+            sock.sendto(encode_frames(values), ('127.0.0.1', port))
+        except OSError:
+            continue
+        sent += 1
+    result.value = sent
+
+
+def run_rate(rate, duration, frames_per_datagram, channels, port):
+    system = RespirationMonitoringSystem(NullSocketIO(), host='127.0.0.1', port=port)
+    state = {'frames': 0, 'last_seq': None, 'missing': 0}
+
+    def on_block(values, timestamps):
+        # 由最后一个通道的帧序号检测丢失的帧
+        seq = values[:, -1].astype(np.int64)
+        if state['last_seq'] is not None:
+            state['missing'] += max(0, int(seq[0]) - state['last_seq'] - 1)
+        state['missing'] += int(np.count_nonzero(np.diff(seq) > 1))
+        state['last_seq'] = int(seq[-1])
+        state['frames'] += len(values)
+
+    system.udp_receiver.register_block_callback(on_block)
+    if not system.start():
+        raise RuntimeError("呼吸监测系统启动失败")
+
+    # 用 spawn 启动发送进程：fork 出的子进程会共享父进程 eventlet hub 的 epoll 实例
+    context = multiprocessing.get_context('spawn')
+    result = context.Value('q', 0)
+    sender = context.Process(target=_sender, args=(port, rate, duration, frames_per_datagram, channels, result))
+    sender.start()
+    while sender.is_alive():
+        eventlet.sleep(0.05)
+
+    # 等待接收循环处理完套接字中剩余的数据
+    eventlet.sleep(0.5)
+    stats = system.udp_receiver.get_stats()
+    kept_channels = system.channel_data.shape[1]
+    system.udp_receiver.stop()
+
+    return {
+        'rate': rate,
+        'sent': result.value,
+        'received': stats['datagrams_received'],
+        'datagram_rate': stats['datagrams_received'] / duration,
+        'frame_rate': state['frames'] / duration,
+        'missing_frames': state['missing'],
+        'kernel_drops': stats['kernel_drops'],
+        'channels': kept_channels,
+        'emits': system.socketio.emits
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='呼吸波形UDP接收吞吐量基准')
+    parser.add_argument('--rates', type=str, default='1000,10000,30000,0',
+                        help='逗号分隔的发送速率（数据报/秒），0 表示不限速')
+    parser.add_argument('--duration', type=float, default=3.0, help='每档持续秒数')
+    parser.add_argument('--frames-per-datagram', type=int, default=4, help='每个数据报包含的帧数')
+    parser.add_argument('--channels', type=int, default=4, help='每帧通道数（含帧序号通道）')
+    parser.add_argument('--port', type=int, default=11347, help='本地UDP端口')
+    args = parser.parse_args()
+
+    for rate in [int(r) for r in args.rates.split(',')]:
+        r = run_rate(rate, args.duration, args.frames_per_datagram, args.channels, args.port)
+        label = f"{rate:>6}/s" if rate else "  不限速"
+        print(f"{label}: 接收 {r['datagram_rate']:>9,.0f} 数据报/秒 ({r['frame_rate']:>10,.0f} 帧/秒), "
+              f"发送 {r['sent']}, 丢失帧 {r['missing_frames']}, 内核丢弃 {r['kernel_drops']}, "
+              f"保留通道 {r['channels']}, 推送 {r['emits']} 次")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# bench_serial_ingest.py
+
+"""
+端到端串口采集基准：伪终端模拟设备 -> SerialPortReader -> ECGMonitoringSystem
+
+对每档帧率运行模拟器，ECGMonitoringSystem 按正常流程 connect_serial / start_monitoring，
+在处理线程处理完每一块之后测量：
+    - 吞吐量（帧/秒）
+    - 丢帧率（由最后一个通道携带的帧序号检测）
+    - 每帧延迟（模拟器写入 -> 监测系统处理完该块）
+    - 读取器与处理线程之间环形缓冲区的丢弃样本数和占用峰值
+
+用法:
+    python -m backend.benchmarks.bench_serial_ingest --rates 250,500,1000,2000,4000,8000 --duration 5
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.services.monitoring_service import ECGMonitoringSystem
+from backend.tools.serial_simulator import SerialDeviceSimulator
+
+
+class NullSocketIO:
+    """只计数、不发送的SocketIO替身"""
+
+    def __init__(self):
+        self.emits = 0
+
+    def emit(self, event, data=None, **kwargs):
+        self.emits += 1
+
+
+def run_rate(rate, duration, corrupt_rate=0.0):
+    simulator = SerialDeviceSimulator(rate=rate, corrupt_rate=corrupt_rate, seed=0)
+    port = simulator.open()
+
+    socketio = NullSocketIO()
+    system = ECGMonitoringSystem(socketio)
+    system.connect_serial(port=port, baudrate=921600)
+
+    arrivals = []  # (最后一帧序号数组, 处理完成时间)
+    process_block = system._process_block
+
+    def on_block(values, timestamps):
+        process_block(values, timestamps)
+        arrivals.append((values[:, -1].astype(np.int64), time.time()))
+
+    # 包装处理线程的块处理，测得的延迟包含环形缓冲区排队和监测系统处理该块的时间
+    system._process_block = on_block
+    system.start_monitoring()
+
+    simulator.start(duration)
+    while not simulator.join(timeout=0):
+        eventlet.sleep(0.05)
+
+    deadline = time.time() + 1.0
+    while time.time() < deadline:
+        received = sum(len(seq) for seq, _ in arrivals)
+        if received >= simulator.stats['frames_sent'] - simulator.stats['frames_corrupted']:
+            break
+        eventlet.sleep(0.01)
+
+    # 不调用 system.stop()，避免把基准数据保存到 data/ 目录
+    system.data_source.close()
+    system._stop_processing()
+    buffer_stats = system.get_pipeline_stats()['input_buffer']
+    simulator.close()
+
+    sent = simulator.stats['frames_sent']
+    if not arrivals:
+        return {'rate': rate, 'sent': sent, 'received': 0}
+
+    seqs = np.concatenate([seq for seq, _ in arrivals])
+    done = np.concatenate([np.full(len(seq), t) for seq, t in arrivals])
+    latency = done - simulator.send_times(seqs)
+    elapsed = simulator.stats['end_time'] - simulator.stats['start_time']
+    unique = len(np.unique(seqs))
+    return {
+        'rate': rate,
+        'sent': sent,
+        'received': len(seqs),
+        'throughput': len(seqs) / elapsed if elapsed > 0 else 0.0,
+        'drop_rate': 1.0 - unique / sent if sent else 0.0,
+        'corrupted': simulator.stats['frames_corrupted'],
+        'latency_p50_ms': float(np.percentile(latency, 50) * 1000),
+        'latency_p99_ms': float(np.percentile(latency, 99) * 1000),
+        'emits': socketio.emits,
+        'buffer_dropped': buffer_stats['dropped'],
+        'buffer_high_watermark': buffer_stats['high_watermark']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端串口采集基准')
+    parser.add_argument('--rates', type=str, default='250,500,1000,2000,4000,8000', help='逗号分隔的帧率')
+    parser.add_argument('--duration', type=float, default=5.0, help='每档持续秒数')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='每帧注入损坏字节的概率')
+    args = parser.parse_args()
+
+    for rate in [int(r) for r in args.rates.split(',')]:
+        r = run_rate(rate, args.duration, args.corrupt)
+        if not r['received']:
+            print(f"{rate:>6} Hz: 未收到数据")
+            continue
+        print(f"{rate:>6} Hz: {r['throughput']:>9,.0f} 帧/秒, 丢帧率 {r['drop_rate'] * 100:.3f}% "
+              f"(注入损坏 {r['corrupted']}), 延迟 p50 {r['latency_p50_ms']:.1f} ms / "
+              f"p99 {r['latency_p99_ms']:.1f} ms, 前端推送 {r['emits']} 次, "
+              f"缓冲区丢弃 {r['buffer_dropped']} / 峰值 {r['buffer_high_watermark']}")
+
+
+if __name__ == '__main__':
+    main()
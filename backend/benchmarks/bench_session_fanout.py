@@ -0,0 +1,93 @@
+# bench_session_fanout.py
+
+"""
+按会话订阅推送基准：广播与按房间推送的出口流量
+
+模拟 sessions 个监测会话（500 Hz、12 导联，每 200 个样本推送一次）和 clients 个客户端，
+每个客户端随机订阅 per-client 个会话（可选导联子集）。比较：
+    - 广播：每块数据编码一次并发给所有客户端，出口数值个数 = 会话数 × 客户端数 × 12 导联
+    - 按房间：ECGStreamService 只编码有订阅的房间，出口按各房间的订阅人数统计
+推送目标是只计数的假 SocketIO，不经过网络。
+
+用法:
+    python -m backend.benchmarks.bench_session_fanout --sessions 32 --clients 16 --per-client 2
+"""
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from backend.services.stream_service import ECGStreamService, build_ecg_payload
+
+
+class CountingSocketIO:
+    def __init__(self):
+        self.events = 0
+
+    def emit(self, event, payload, to=None):
+        self.events += 1
+
+
+def run(sessions, clients, per_client, leads, duration, rate, block, wire_format):
+    rng = np.random.default_rng(0)
+    session_ids = [str(uuid.UUID(int=i + 1)) for i in range(sessions)]
+    service = ECGStreamService()
+    service.socketio = CountingSocketIO()
+    noop = lambda *args, **kwargs: None
+    for client in range(clients):
+        for session_id in rng.choice(session_ids, size=min(per_client, sessions), replace=False):
+            room, subscription = service.room_for({'session_id': str(session_id), 'leads': leads})
+            service._move_client(f"client-{client}", room, subscription, noop, noop)
+
+    values = rng.standard_normal((12, block)).astype(np.float32)
+    blocks = int(duration * rate / block)
+    broadcast_time = room_time = 0.0
+    for b in range(blocks):
+        times = (b * block + np.arange(block)) / rate
+        for seq, session_id in enumerate(session_ids):
+            start = time.perf_counter()
+            build_ecg_payload(values, times, b * block, seq, rate, wire_format, session_id=session_id)
+            broadcast_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            service.publish(session_id, values, times, b * block, rate, seq, wire_format=wire_format)
+            room_time += time.perf_counter() - start
+
+    stats = service.get_stats()
+    room_egress = sum(room['egress_values'] for room in stats['rooms'].values())
+    broadcast_egress = sessions * clients * values.size * blocks
+    return {
+        'broadcast_egress': broadcast_egress / duration,
+        'room_egress': room_egress / duration,
+        'broadcast_ms': broadcast_time / duration * 1000,
+        'room_ms': room_time / duration * 1000,
+        'rooms': len(stats['rooms']),
+        'unsubscribed': stats['blocks_unsubscribed']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按会话订阅推送基准')
+    parser.add_argument('--sessions', type=int, default=32, help='监测会话数')
+    parser.add_argument('--clients', type=int, default=16, help='客户端数')
+    parser.add_argument('--per-client', type=int, default=2, help='每个客户端订阅的会话数')
+    parser.add_argument('--leads', type=str, default='', help='逗号分隔的订阅导联下标，默认全部 12 个')
+    parser.add_argument('--duration', type=float, default=10.0, help='模拟的数据时长（秒）')
+    parser.add_argument('--rate', type=int, default=500, help='采样率（Hz）')
+    parser.add_argument('--block', type=int, default=200, help='每次推送的样本数')
+    parser.add_argument('--wire-format', choices=('json', 'int16', 'float32'), default='int16', help='推送编码')
+    args = parser.parse_args()
+
+    leads = [int(lead) for lead in args.leads.split(',')] if args.leads else None
+    r = run(args.sessions, args.clients, args.per_client, leads, args.duration, args.rate, args.block,
+            args.wire_format)
+    print(f"  广播: {r['broadcast_egress']:>12,.0f} 数值/秒出口, 编码 {r['broadcast_ms']:>7.2f} ms/秒")
+    print(f"按房间: {r['room_egress']:>12,.0f} 数值/秒出口, 编码 {r['room_ms']:>7.2f} ms/秒 "
+          f"({r['rooms']} 个房间, {r['unsubscribed']} 块无订阅未编码)")
+    print(f"出口流量为广播的 {r['room_egress'] / r['broadcast_egress']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
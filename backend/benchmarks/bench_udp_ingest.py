@@ -0,0 +1,117 @@
+# bench_udp_ingest.py
+
+"""
+UDP 接收吞吐量基准（回环地址）
+
+独立的发送进程按给定速率（0 表示不限速）向 UDPReader 发送 Firewater 数据报，
+每个数据报包含若干帧，最后一个通道携带帧序号。报告：
+    - 接收数据报速率和帧速率
+    - 应用层丢失（发送 - 接收）与内核接收缓冲区丢弃（/proc/net/udp）
+
+用法:
+    python -m backend.benchmarks.bench_udp_ingest --rates 1000,10000,50000,0 --frames-per-datagram 4
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from backend.devices.udp_reader import UDPReader
+
+_native_time = eventlet.patcher.original('time')
+
+
+def _sender(port, rate, duration, frames_per_datagram, result):
+    """发送进程：按速率发送数据报，rate 为 0 时尽可能快地发送"""
+    import socket
+    import time
+
+    from backend.devices.firewater import encode_frames
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    values = np.zeros((frames_per_datagram, 8), dtype=np.float32)
+    offsets = np.arange(frames_per_datagram)
+    sent = 0
+    start = time.monotonic()
+    end = start + duration
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        if rate and sent >= (now - start) * rate:
+            time.sleep(0.0005)
+            continue
+        values[:, -1] = (sent * frames_per_datagram + offsets) % (1 << 24)
+        try:
+            sock.sendto(encode_frames(values), ('127.0.0.1', port))
+        except OSError:
+            continue
+        sent += 1
+    result.value = sent
+
+
+def run_rate(rate, duration, frames_per_datagram, port, recv_buffer_size):
+    reader = UDPReader(local_ip='127.0.0.1', local_port=port)
+    reader.recv_buffer_size = recv_buffer_size
+    state = {'frames': 0}
+
+    def on_block(values, timestamps):
+        state['frames'] += len(values)
+
+    reader.register_block_callback(on_block)
+    reader.open()
+    reader.start_reading()
+
+    # 用 spawn 启动发送进程：fork 出的子进程会共享父进程 eventlet hub 的 epoll 实例
+    context = multiprocessing.get_context('spawn')
+    result = context.Value('q', 0)
+    sender = context.Process(target=_sender, args=(port, rate, duration, frames_per_datagram, result))
+    sender.start()
+    while sender.is_alive():
+        eventlet.sleep(0.05)
+    # 速率按发送时长计算，不包含发送进程的启动时间
+    elapsed = duration
+
+    # 等待接收循环处理完套接字中剩余的数据
+    eventlet.sleep(0.5)
+    stats = reader.get_stats()
+    reader.close()
+
+    sent = result.value
+    received = stats['datagrams_received']
+    return {
+        'rate': rate,
+        'sent': sent,
+        'received': received,
+        'datagram_rate': received / elapsed,
+        'frame_rate': state['frames'] / elapsed,
+        'lost': sent - received,
+        'kernel_drops': stats['kernel_drops'],
+        'recv_buffer_size': stats.get('recv_buffer_size')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UDP接收吞吐量基准')
+    parser.add_argument('--rates', type=str, default='1000,10000,30000,50000,0',
+                        help='逗号分隔的发送速率（数据报/秒），0 表示不限速')
+    parser.add_argument('--duration', type=float, default=3.0, help='每档持续秒数')
+    parser.add_argument('--frames-per-datagram', type=int, default=4, help='每个数据报包含的帧数')
+    parser.add_argument('--port', type=int, default=15001, help='本地UDP端口')
+    parser.add_argument('--rcvbuf', type=int, default=4 * 1024 * 1024, help='请求的SO_RCVBUF字节数')
+    args = parser.parse_args()
+
+    for rate in [int(r) for r in args.rates.split(',')]:
+        r = run_rate(rate, args.duration, args.frames_per_datagram, args.port, args.rcvbuf)
+        label = f"{rate:>6}/s" if rate else "  不限速"
+        print(f"{label}: 接收 {r['datagram_rate']:>9,.0f} 数据报/秒 ({r['frame_rate']:>10,.0f} 帧/秒), "
+              f"发送 {r['sent']}, 丢失 {r['lost']}, 内核丢弃 {r['kernel_drops']}, "
+              f"SO_RCVBUF {r['recv_buffer_size']}")
+
+
+if __name__ == '__main__':
+    main()
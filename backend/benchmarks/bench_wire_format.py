@@ -0,0 +1,102 @@
+# bench_wire_format.py
+
+"""
+ecg_data 推送格式基准：JSON 与二进制（int16 / float32）负载
+
+模拟 12 导联数据流，每 max_samples 个新样本推送一次（增量推送），对每种格式测量：
+    - 每秒数据的负载字节数
+    - 每秒数据的服务端编码 CPU 时间
+JSON 路径与监测系统相同：tolist、NaN 转 null，再用 json.dumps 编码（Socket.IO 发送前的工作）；
+二进制路径为 encode_ecg_block。同时检查二进制负载解码后与原数据一致。
+
+用法:
+    python -m backend.benchmarks.bench_wire_format --duration 60 --rate 500
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backend.utils.ecg_wire import decode_ecg_block, encode_ecg_block
+
+
+def ensure_serializable(obj):
+    # 与 ECGMonitoringSystem.process_and_send_data 中的转换相同
+    if isinstance(obj, list):
+        return [ensure_serializable(item) for item in obj]
+    elif isinstance(obj, float) and obj != obj:
+        return None
+    return obj
+
+
+def encode_json(leads, times, seq, first_index):
+    return json.dumps({
+        'leads': ensure_serializable(leads.tolist()),
+        'time_stamps': ensure_serializable(times.tolist()),
+        'seq': seq,
+        'first_sample_index': first_index,
+        'sample_count': len(times)
+    }).encode()
+
+
+def make_blocks(duration, rate, block_size, seed=0):
+    """生成 (leads[12, n], times[n]) 的块序列，模拟 ECG 幅度（数百个ADC单位）"""
+    rng = np.random.default_rng(seed)
+    blocks = []
+    for first in range(0, int(duration * rate), block_size):
+        t = (first + np.arange(block_size)) / rate
+        leads = (400 * np.sin(2 * np.pi * 1.2 * t)[None, :] + 20 * rng.standard_normal((12, block_size)))
+        blocks.append((first, leads.astype(np.float32), 1.7e9 + t))
+    return blocks
+
+
+def run(blocks, duration, rate):
+    results = {}
+    for wire_format in ('json', 'int16', 'float32'):
+        total_bytes = 0
+        max_error = 0.0
+        start = time.process_time()
+        for seq, (first, leads, times) in enumerate(blocks, 1):
+            if wire_format == 'json':
+                payload = encode_json(leads, times, seq, first)
+            else:
+                payload = encode_ecg_block(leads, times[0], rate, first_sample_index=first, seq=seq,
+                                           dtype=wire_format)
+            total_bytes += len(payload)
+        elapsed = time.process_time() - start
+
+        if wire_format != 'json':
+            # 抽查解码结果
+            first, leads, times = blocks[-1]
+            decoded = decode_ecg_block(encode_ecg_block(leads, times[0], rate, dtype=wire_format))
+            max_error = float(np.abs(decoded['leads'] - leads).max())
+        results[wire_format] = {
+            'bytes_per_second': total_bytes / duration,
+            'cpu_ms_per_second': elapsed / duration * 1000,
+            'max_error': max_error
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ecg_data 推送格式基准')
+    parser.add_argument('--duration', type=float, default=60.0, help='模拟的数据时长（秒）')
+    parser.add_argument('--rate', type=int, default=500, help='采样率（Hz）')
+    parser.add_argument('--max-samples', type=int, default=200, help='每次推送的样本数')
+    args = parser.parse_args()
+
+    blocks = make_blocks(args.duration, args.rate, args.max_samples)
+    results = run(blocks, args.duration, args.rate)
+    for wire_format, r in results.items():
+        print(f"{wire_format:>8}: {r['bytes_per_second'] / 1024:>8,.1f} KB/秒数据, "
+              f"编码 {r['cpu_ms_per_second']:>6.2f} ms CPU/秒数据, 最大误差 {r['max_error']:.3g}")
+    json_bytes = results['json']['bytes_per_second']
+    for wire_format in ('int16', 'float32'):
+        print(f"{wire_format} 相比 JSON: 负载 {results[wire_format]['bytes_per_second'] / json_bytes:.1%}, "
+              f"CPU {results[wire_format]['cpu_ms_per_second'] / results['json']['cpu_ms_per_second']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -44,6 +44,13 @@ class Config:
     ECG_INTERPOLATION_METHOD = 'cubic'
     ECG_CONTINUITY_THRESHOLD = 2.0
     ECG_INTERPOLATION_THRESHOLD = 1.5
+    ECG_MAX_SESSIONS = int(os.environ.get('ECG_MAX_SESSIONS', '64'))   # 同时监测的最大会话数
+    ECG_WORKER_THREADS = int(os.environ.get('ECG_WORKER_THREADS', '4'))  # 会话共用的处理线程数
+    ECG_PROCESS_SHARDS = int(os.environ.get('ECG_PROCESS_SHARDS', '0'))  # 采集和滤波的工作进程数，0 为单进程
+    ECG_SERIAL_MULTIPLEX = os.environ.get('ECG_SERIAL_MULTIPLEX', '1') == '1'  # 串口会话共用一个复用读取线程
+    ECG_UDP_SERVER_PORT = int(os.environ.get('ECG_UDP_SERVER_PORT', '0'))  # 多设备UDP服务器端口，0 为不启动
+    ECG_UDP_SERVER_IP = os.environ.get('ECG_UDP_SERVER_IP', '0.0.0.0')
+    ECG_UDP_DEMUX = os.environ.get('ECG_UDP_DEMUX', 'address')  # 'address' 按来源地址，'payload' 按设备ID
 
 class DevelopmentConfig(Config):
     """u5f00u53d1u73afu5883u914du7f6e"""
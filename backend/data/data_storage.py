@@ -1,53 +1,154 @@
 #data_storage.py
 
 import datetime
-import numpy as np
+import json
 import os
+import shutil
+import tempfile
+
+import numpy as np
 
 
 class DataStorage:
+    """监测记录的分块存储
+
+    样本按块写入预分配的 (chunk_samples, leads) 数组，写满一块后整块保存为临时目录中的
+    .npy 文件（溢出到磁盘），内存占用不随记录时长增加。保存 JSON / .npy 时逐块读回，
+    溢出块以只读内存映射打开。
+    """
 
-    def __init__(self):
-        self.data = {i: [] for i in range(12)}
+    def __init__(self, chunk_samples=10000, leads=12, spill_dir=None):
+        """
+        Args:
+            chunk_samples: 每块的样本数（内存中最多保留一块）
+            leads: 导联数
+            spill_dir: 溢出块的父目录，None 表示系统临时目录
+        """
+        self.chunk_samples = int(chunk_samples)
+        self.leads = int(leads)
+        self.spill_root = spill_dir
+        self._values = np.empty((self.chunk_samples, self.leads), dtype=np.float64)
+        self._times = np.empty(self.chunk_samples, dtype=np.float64)
+        self._fill = 0
+        self._spill_dir = None
+        self._spilled = []   # 已溢出块的 (时间戳文件, 导联数据文件)
+        self._count = 0
+        self.stats = {
+            'samples': 0,
+            'chunks_spilled': 0
+        }
         self.start_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
 
+    def __len__(self):
+        return self._count
+
+    def save_block(self, timestamps, lead_data):
+        """
+        保存一块样本
+
+        参数:
+            timestamps: 长度为 n 的时间戳数组
+            lead_data: (n, leads) 的导联数据数组
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        lead_data = np.asarray(lead_data, dtype=np.float64)
+        n = len(timestamps)
+        offset = 0
+        while offset < n:
+            k = min(n - offset, self.chunk_samples - self._fill)
+            self._values[self._fill:self._fill + k] = lead_data[offset:offset + k]
+            self._times[self._fill:self._fill + k] = timestamps[offset:offset + k]
+            self._fill += k
+            offset += k
+            if self._fill == self.chunk_samples:
+                self._spill()
+        self._count += n
+        self.stats['samples'] += n
+
     def save_data_point(self, timestamp, lead_data):
-        for i in range(12):
-            self.data[i].append(lead_data[i])
+        self.save_block([timestamp], np.asarray(lead_data, dtype=np.float64)[None, :])
+
+    def _spill(self):
+        """把内存中写满的块保存到临时目录并清空"""
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='ecg_storage_', dir=self.spill_root)
+        index = len(self._spilled)
+        times_path = os.path.join(self._spill_dir, f'times_{index:05d}.npy')
+        values_path = os.path.join(self._spill_dir, f'leads_{index:05d}.npy')
+        np.save(times_path, self._times[:self._fill])
+        np.save(values_path, self._values[:self._fill])
+        self._spilled.append((times_path, values_path))
+        self._fill = 0
+        self.stats['chunks_spilled'] += 1
+
+    def _chunks(self):
+        """按时间顺序逐块返回 (timestamps, lead_data)"""
+        for times_path, values_path in self._spilled:
+            yield np.load(times_path, mmap_mode='r'), np.load(values_path, mmap_mode='r')
+        if self._fill:
+            yield self._times[:self._fill], self._values[:self._fill]
+
+    def get_lead(self, lead_index):
+        """返回一个导联的全部样本"""
+        parts = [values[:, lead_index] for _, values in self._chunks()]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def get_timestamps(self):
+        """返回全部样本的时间戳"""
+        parts = [times for times, _ in self._chunks()]
+        return np.concatenate(parts) if parts else np.empty(0)
 
     def save_to_npy(self, lead_index, start_timestamp, end_timestamp):
         filename = f"lead_{lead_index}_{start_timestamp}_{end_timestamp}.npy"
-        np_data = np.array(self.data[lead_index])
-        np.save(filename, np_data)
+        np.save(filename, self.get_lead(lead_index))
 
     def save_all_leads(self, start_timestamp, end_timestamp):
-        for i in range(12):
+        for i in range(self.leads):
             self.save_to_npy(i, start_timestamp, end_timestamp)
 
+    def _discard_spill(self):
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+        self._spill_dir = None
+        self._spilled = []
+
     def reset_data(self):
-        self.data = {i: [] for i in range(12)}
+        self._discard_spill()
+        self._fill = 0
+        self._count = 0
         self.start_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
 
+    def close(self):
+        """删除溢出到磁盘的临时块"""
+        self._discard_spill()
+        self._fill = 0
+        self._count = 0
+
     def save_data(self, filename):
-        """将数据保存为JSON文件"""
-        import json
-        import os
-        
+        """将数据保存为JSON文件（逐导联、逐块写出，不把整段记录读入内存）"""
         # 创建保存目录（如果不存在）
         data_dir = 'data'
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
-            
-        # 准备保存的数据
-        save_data = {}
-        for i in range(12):
-            save_data[f'lead_{i}'] = self.data[i]
-            
-        # 保存为JSON文件
+
+        # 格式与 json.dump({'lead_0': [...], ...}) 相同
         file_path = os.path.join(data_dir, filename)
         with open(file_path, 'w') as f:
-            json.dump(save_data, f)
-            
+            f.write('{')
+            for i in range(self.leads):
+                if i:
+                    f.write(', ')
+                f.write(f'"lead_{i}": [')
+                first = True
+                for _, values in self._chunks():
+                    if not len(values):
+                        continue
+                    if not first:
+                        f.write(', ')
+                    f.write(json.dumps(values[:, i].tolist())[1:-1])
+                    first = False
+                f.write(']')
+            f.write('}')
+
         print(f'数据已保存到 {file_path}')
         return file_path
-
@@ -117,6 +117,9 @@ class DatabaseManager:
             # 为每个导联的每个数据点创建一个Point
             for i, lead_data in enumerate(leads_data):
                 for j, value in enumerate(lead_data):
+                    # 缺失样本（None 或 NaN）不写入
+                    if value is None or value != value:
+                        continue
                     if j < len(timestamps):  # 确保有对应的时间戳
                         point = Point("ecg_readings") \
                             .tag("patient_id", patient_id) \
@@ -0,0 +1,96 @@
+# block_callbacks.py
+
+import numpy as np
+
+from .packet_format import contiguous_runs
+
+
+class BlockCallbackMixin:
+    """设备读取器的块回调接口
+
+    读取器每解码出一块数据调用一次 _dispatch_block(values, timestamps)：
+        - 块回调 register_block_callback(cb) 收到 cb(values, timestamps)，
+          values 为 (n, channels) 的 ndarray，timestamps 为长度 n 的 ndarray
+        - 旧的逐样本回调 register_callback(cb) 通过适配器逐行收到
+          cb(values_list, timestamp)，与原来的调用方式保持一致
+
+    使用该混入的类需要在 __init__ 中初始化 self.callbacks 和 self.block_callbacks。
+    """
+
+    def register_callback(self, callback):
+        """注册逐样本回调，接收参数(values, timestamp)"""
+        self.callbacks.append(callback)
+
+    def register_block_callback(self, callback):
+        """注册块回调，接收参数(values[n, channels], timestamps[n])"""
+        self.block_callbacks.append(callback)
+
+    def _dispatch_block(self, values, timestamps):
+        """把一块数据分发给所有块回调和逐样本回调"""
+        if len(values) == 0:
+            return
+
+        for callback in self.block_callbacks:
+            try:
+                callback(values, timestamps)
+            except Exception as e:
+                self._on_callback_error(e)
+
+        if self.callbacks:
+            # 整块一次性转换为Python原生列表和浮点数，再逐行适配旧接口
+            rows = values.tolist()
+            stamps = timestamps.tolist()
+            for callback in self.callbacks:
+                for row, stamp in zip(rows, stamps):
+                    try:
+                        callback(row, stamp)
+                    except Exception as e:
+                        self._on_callback_error(e)
+
+    def _dispatch_sample(self, values, timestamp):
+        """分发单个样本，块回调收到只有一行的块"""
+        for callback in self.callbacks:
+            try:
+                callback(values, timestamp)
+            except Exception as e:
+                self._on_callback_error(e)
+
+        if self.block_callbacks:
+            block = np.asarray(values, dtype=np.float32).reshape(1, -1)
+            stamps = np.array([timestamp], dtype=np.float64)
+            for callback in self.block_callbacks:
+                try:
+                    callback(block, stamps)
+                except Exception as e:
+                    self._on_callback_error(e)
+
+    def _dispatch_decoded(self, blocks, arrival_time):
+        """为解码出的块计算时间戳并分发，需要宿主类有 self.sample_clock
+
+        Args:
+            blocks: [(first_index, values), ...]，first_index 为 None 表示接续上一块
+                （不带序号的数据），否则按设备样本序号计算时间戳，缺口保持时间间隔
+            arrival_time: 到达时间
+
+        Returns:
+            int: 分发的样本数
+        """
+        plain = [values for first_index, values in blocks if first_index is None and len(values)]
+        indexed = [(first_index, values) for first_index, values in blocks if first_index is not None]
+        total = 0
+
+        if plain:
+            values = plain[0] if len(plain) == 1 else np.concatenate(plain)
+            self._dispatch_block(values, self.sample_clock.stamp(len(values), arrival_time))
+            total += len(values)
+
+        for first_index, values in contiguous_runs(indexed):
+            self._dispatch_block(values, self.sample_clock.stamp(len(values), arrival_time, first_index=first_index))
+            total += len(values)
+        return total
+
+    def _on_callback_error(self, error):
+        stats = getattr(self, 'stats', None)
+        if isinstance(stats, dict) and 'errors' in stats:
+            stats['errors'] += 1
+        print(f"数据回调出错: {error}")
@@ -0,0 +1,264 @@
+# firewater.py
+
+"""
+VOFA+ Firewater 帧格式的块解码
+
+Firewater 帧由 N 个小端 float32 通道值加 4 字节帧尾 00 00 80 7F 组成。
+帧尾按小端 uint32 解释恰好是 0x7F800000（float32 的 +inf），因此当缓冲区中
+的帧连续对齐时，可以把整段字节直接视为 (n, N+1) 的数组，一次性检查帧尾列
+并取出前 N 列，而无需逐帧 find / struct.unpack。
+"""
+
+import numpy as np
+
+FRAME_TAIL = b'\x00\x00\x80\x7F'
+TAIL_WORD = 0x7F800000
+
+
+def encode_frames(values):
+    """把 (n, channels) 的采样值编码为连续的 Firewater 帧字节
+
+    Args:
+        values: (n, channels) 的数组
+
+    Returns:
+        bytes: n 个帧的字节串
+    """
+    values = np.asarray(values, dtype='<f4')
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    n, channels = values.shape
+    words = np.empty((n, channels + 1), dtype='<u4')
+    words[:, :-1] = values.view('<u4')
+    words[:, -1] = TAIL_WORD
+    return words.tobytes()
+
+
+class FirewaterDecoder:
+    """Firewater 帧的增量块解码器
+
+    解码器维护一个字节缓冲区、读偏移和扫描游标：
+        - decode() 从读偏移开始，只要帧尾出现在按帧长对齐的位置，就整段向量化
+          解码，返回 (n, channels) 的 float32 数组
+        - 对齐失败时从扫描游标处查找下一个帧尾重新同步；找不到时记住已扫描到
+          的位置，下次只扫描新到达的字节，避免残帧或垃圾数据导致重复扫描
+        - 已消费的字节只在读偏移超过 compact_threshold 时才从缓冲区头部删除
+
+    每个帧按结果计数：ok（正常）、short（负载不足）、long（负载过长或夹杂垃圾）、
+    nan（负载含 NaN）。short / long 帧被丢弃；nan 帧照常输出以保持样本序号连续，
+    下游把 NaN 当作缺失样本处理。
+
+    channels 为 None 时，根据前两个帧尾之间的距离自动确定通道数。
+    """
+
+    def __init__(self, channels=8, compact_threshold=64 * 1024, max_pending=1024 * 1024):
+        """
+        Args:
+            channels: 每帧的通道数，None 表示自动检测
+            compact_threshold: 读偏移超过该字节数时压缩缓冲区
+            max_pending: 未消费字节的上限，超过时丢弃最旧的字节
+        """
+        self.channels = None
+        self.payload_size = None
+        self.frame_size = None
+        if channels is not None:
+            self._set_channels(channels)
+        self.compact_threshold = compact_threshold
+        self.max_pending = max_pending
+        self.buffer = bytearray()
+        self.read_offset = 0
+        self.scan_cursor = 0
+        self.counters = {
+            'ok': 0,
+            'short': 0,
+            'long': 0,
+            'nan': 0,
+            'resyncs': 0,
+            'bytes_discarded': 0,
+            'compactions': 0,
+            'fast_packets': 0
+        }
+
+    def _set_channels(self, channels):
+        self.channels = channels
+        self.payload_size = 4 * channels
+        self.frame_size = self.payload_size + len(FRAME_TAIL)
+
+    def feed(self, data):
+        """追加接收到的原始字节"""
+        self.buffer.extend(data)
+
+    def pending_bytes(self):
+        """尚未消费的字节数"""
+        return len(self.buffer) - self.read_offset
+
+    def reset(self):
+        self.buffer = bytearray()
+        self.read_offset = 0
+        self.scan_cursor = 0
+
+    def decode(self):
+        """解码缓冲区中全部完整帧
+
+        Returns:
+            np.ndarray: (n, channels) 的 float32 数组，没有完整帧时 n 为 0
+        """
+        if self.channels is None and not self._detect_channels():
+            self._limit_pending()
+            return np.empty((0, 0), dtype=np.float32)
+
+        blocks = []
+        buffer = self.buffer
+        offset = self.read_offset
+
+        while len(buffer) - offset >= self.frame_size:
+            tail_end = offset + self.frame_size
+            if buffer[tail_end - len(FRAME_TAIL):tail_end] == FRAME_TAIL:
+                # 帧尾在预期位置：按帧长对齐整段解码。先检查对齐位置而不是直接 find，
+                # 是因为负载中可能出现与帧尾相同的字节序列（例如 0 后接 1022.0）
+                values, n = self._decode_aligned(buffer, offset)
+                blocks.append(values)
+                offset += n * self.frame_size
+                continue
+
+            # 失去对齐：从扫描游标处查找下一个帧尾重新同步
+            tail_index = buffer.find(FRAME_TAIL, max(offset, self.scan_cursor))
+            if tail_index == -1:
+                # 帧尾可能跨越缓冲区末尾，保留最后 3 个字节重新扫描
+                self.scan_cursor = max(offset, len(buffer) - len(FRAME_TAIL) + 1)
+                break
+
+            gap = tail_index - offset
+            self.counters['short' if gap < self.payload_size else 'long'] += 1
+            self.counters['resyncs'] += 1
+            self.counters['bytes_discarded'] += gap + len(FRAME_TAIL)
+            offset = tail_index + len(FRAME_TAIL)
+
+        self.read_offset = offset
+        self.scan_cursor = max(self.scan_cursor, offset)
+        self._limit_pending()
+        self._compact()
+
+        if not blocks:
+            return np.empty((0, self.channels), dtype=np.float32)
+        values = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+        self._count_frames(values)
+        return values
+
+    def decode_packet(self, data):
+        """解码一个数据报（UDP）
+
+        没有残留字节且数据报恰好由整数个帧组成、每个帧尾都在对齐位置时，
+        直接用一次 np.frombuffer 解码，不经过字节缓冲区；否则（帧被拆分到
+        多个数据报、数据报内有损坏）退回 feed() + decode()。
+
+        Args:
+            data: 数据报内容（bytes、bytearray 或 memoryview）
+
+        Returns:
+            np.ndarray: (n, channels) 的 float32 数组
+        """
+        if self.read_offset == len(self.buffer):
+            values = self.decode_whole(data)
+            if values is not None:
+                return values
+        self.feed(data)
+        return self.decode()
+
+    def decode_whole(self, data):
+        """解码恰好由整数个帧组成的数据，不使用也不改变字节缓冲区
+
+        Returns:
+            np.ndarray: (n, channels) 的 float32 数组；数据不是整数个对齐的帧时返回 None
+        """
+        if self.channels is None and not self._detect_channels_whole(data):
+            return None
+        if not len(data) or len(data) % self.frame_size != 0:
+            return None
+        words = np.frombuffer(data, dtype='<u4').reshape(-1, self.channels + 1)
+        if not (words[:, -1] == TAIL_WORD).all():
+            return None
+        # 拷贝一份，调用方可以立即复用接收缓冲区
+        values = words[:, :-1].view('<f4').astype(np.float32)
+        self.counters['fast_packets'] += 1
+        self._count_frames(values)
+        return values
+
+    def _count_frames(self, values):
+        nan_rows = int(np.count_nonzero(np.isnan(values).any(axis=1)))
+        self.counters['nan'] += nan_rows
+        self.counters['ok'] += len(values) - nan_rows
+
+    def _detect_channels(self):
+        """根据相邻两个帧尾之间的距离确定通道数，成功返回 True"""
+        buffer = self.buffer
+        while True:
+            first = buffer.find(FRAME_TAIL, self.read_offset)
+            if first == -1:
+                return False
+            second = buffer.find(FRAME_TAIL, first + len(FRAME_TAIL))
+            if second == -1:
+                return False
+            width = second - first - len(FRAME_TAIL)
+            if width > 0 and width % 4 == 0:
+                self._set_channels(width // 4)
+                if first - self.read_offset != width:
+                    # 第一个帧尾之前不是完整的一帧（从帧中间开始接收），丢弃
+                    self.counters['bytes_discarded'] += first + len(FRAME_TAIL) - self.read_offset
+                    self.read_offset = first + len(FRAME_TAIL)
+                self.scan_cursor = self.read_offset
+                return True
+            self.counters['bytes_discarded'] += first + len(FRAME_TAIL) - self.read_offset
+            self.read_offset = first + len(FRAME_TAIL)
+
+    def _detect_channels_whole(self, data):
+        # 整帧数据：第一个帧尾的位置即负载长度
+        width = bytes(data).find(FRAME_TAIL)
+        if width <= 0 or width % 4 != 0 or len(data) % (width + len(FRAME_TAIL)) != 0:
+            return False
+        self._set_channels(width // 4)
+        return True
+
+    def _decode_aligned(self, buffer, frame_start):
+        # 从 frame_start 开始按帧长对齐，检查连续多少帧的帧尾都在预期位置。
+        # numpy 视图会锁定 bytearray 的大小，这里只返回拷贝，视图随函数返回释放
+        n_max = (len(buffer) - frame_start) // self.frame_size
+        words = np.frombuffer(buffer, dtype='<u4', count=n_max * (self.channels + 1),
+                              offset=frame_start).reshape(n_max, self.channels + 1)
+        aligned = words[:, -1] == TAIL_WORD
+        n = n_max if aligned.all() else int(np.argmin(aligned))
+        return words[:n, :-1].view('<f4').astype(np.float32), n
+
+    def _limit_pending(self):
+        # 长时间收不到帧尾（设备发送垃圾数据）时，限制缓冲区增长
+        excess = self.pending_bytes() - self.max_pending
+        if excess > 0:
+            self.counters['bytes_discarded'] += excess
+            self.read_offset += excess
+            self.scan_cursor = max(self.scan_cursor, self.read_offset)
+
+    def _compact(self):
+        # 仅在读偏移足够大或缓冲区已全部消费时删除已消费的字节
+        if self.read_offset >= len(self.buffer):
+            self.buffer.clear()
+            self.scan_cursor = 0
+            self.read_offset = 0
+        elif self.read_offset >= self.compact_threshold:
+            del self.buffer[:self.read_offset]
+            self.scan_cursor -= self.read_offset
+            self.read_offset = 0
+            self.counters['compactions'] += 1
+
+    def get_stats(self):
+        """返回链路质量统计
+
+        Returns:
+            dict: 各结果的帧计数、丢弃字节数、重同步次数和待处理字节数
+        """
+        stats = dict(self.counters)
+        stats['frames_total'] = stats['ok'] + stats['nan'] + stats['short'] + stats['long']
+        stats['error_rate'] = ((stats['short'] + stats['long']) / stats['frames_total']
+                               if stats['frames_total'] else 0.0)
+        stats['pending_bytes'] = self.pending_bytes()
+        stats['channels'] = self.channels
+        return stats
@@ -0,0 +1,238 @@
+# packet_format.py
+
+"""
+带序号的UDP数据包格式及乱序/丢包处理
+
+可选的包头放在 Firewater 帧之前（小端）：
+
+    偏移  长度  字段
+    0     4     magic               b'FWSQ'
+    4     4     stream_id           uint32，设备/数据流ID
+    8     4     seq                 uint32，数据包序号，每包加 1（按 2^32 回绕）
+    12    8     first_sample_index  uint64，包内第一个样本的序号
+    20    ...   整数个 Firewater 帧（每包内的帧不跨包）
+
+不带包头的数据报按原来的 Firewater 字节流处理，两种格式可以共存。
+
+PacketSequencer 按序号在一个小的重排窗口内恢复包的顺序：
+    - 重复包（序号已释放或已在窗口内）丢弃并计数
+    - 晚到但仍在窗口内的包按序插入，计为乱序
+    - 窗口满或最早的包等待超过 max_hold 秒时，认为缺口内的包已丢失，
+      按样本序号用 NaN 行填补缺口，保证时间轴不被压缩；下游把 NaN 视为缺失样本
+    - 样本序号跳变超过 max_gap_samples（设备重启等）时不填补，重新同步
+"""
+
+import struct
+from collections import deque
+
+import numpy as np
+
+PACKET_MAGIC = b'FWSQ'
+PACKET_HEADER = struct.Struct('<4sIIQ')
+SEQ_MODULUS = 1 << 32
+
+
+def encode_packet(stream_id, seq, first_sample_index, frames):
+    """为已编码的 Firewater 帧字节加上包头
+
+    Args:
+        stream_id: 设备/数据流ID
+        seq: 数据包序号
+        first_sample_index: 包内第一个样本的序号
+        frames: Firewater 帧字节（见 firewater.encode_frames）
+
+    Returns:
+        bytes: 完整的数据包
+    """
+    return PACKET_HEADER.pack(PACKET_MAGIC, stream_id, seq % SEQ_MODULUS, first_sample_index) + bytes(frames)
+
+
+def parse_packet(data):
+    """解析包头
+
+    Args:
+        data: 数据报内容（bytes、bytearray 或 memoryview）
+
+    Returns:
+        tuple: (stream_id, seq, first_sample_index, payload)；没有包头时返回 None
+    """
+    if len(data) < PACKET_HEADER.size or bytes(data[:4]) != PACKET_MAGIC:
+        return None
+    _, stream_id, seq, first_index = PACKET_HEADER.unpack_from(data)
+    return stream_id, seq, first_index, data[PACKET_HEADER.size:]
+
+
+class PacketSequencer:
+    """单个数据流的重排窗口和缺口填补"""
+
+    def __init__(self, reorder_window=8, max_hold=0.05, max_gap_samples=5000):
+        """
+        Args:
+            reorder_window: 最多暂存的乱序包数
+            max_hold: 缺口前的包最长等待秒数，超时后按丢包处理
+            max_gap_samples: 可以用 NaN 填补的最大样本缺口，超过则重新同步
+        """
+        self.reorder_window = reorder_window
+        self.max_hold = max_hold
+        self.max_gap_samples = max_gap_samples
+
+        self.stats = {
+            'packets': 0,
+            'lost': 0,
+            'duplicated': 0,
+            'reordered': 0,
+            'late': 0,
+            'resyncs': 0,
+            'gap_samples': 0
+        }
+        self.reset()
+
+    def reset(self):
+        self.next_seq = None        # 下一个应释放的包序号
+        self.next_index = None      # 下一个应释放的样本序号
+        self.pending = {}           # seq -> (first_index, values, arrival)
+        self.skipped = deque(maxlen=256)  # 最近按丢包跳过的序号，用于识别迟到包
+
+    def _seq_offset(self, seq):
+        # 相对 next_seq 的带符号距离，处理 32 位回绕
+        offset = (seq - self.next_seq) % SEQ_MODULUS
+        return offset - SEQ_MODULUS if offset >= SEQ_MODULUS // 2 else offset
+
+    def push(self, seq, first_index, values, now):
+        """加入一个数据包，返回可以按顺序释放的块
+
+        Args:
+            seq: 包序号
+            first_index: 包内第一个样本的序号
+            values: (n, channels) 的采样值
+            now: 到达时间
+
+        Returns:
+            list: [(first_index, values), ...]，按样本序号连续，缺口已用 NaN 填补
+        """
+        self.stats['packets'] += 1
+        if self.next_seq is None:
+            self.next_seq = seq
+            self.next_index = first_index
+
+        offset = self._seq_offset(seq)
+        if offset < 0 or seq in self.pending:
+            if offset < -self.reorder_window * 4:
+                # 序号大幅回退：设备重启，重新同步
+                self.stats['resyncs'] += 1
+                released = self._flush_all()
+                self.reset()
+                return released + self.push(seq, first_index, values, now)
+            if seq in self.skipped:
+                # 缺口已按丢包填补后才到达的包，不再插回
+                self.stats['late'] += 1
+            else:
+                self.stats['duplicated'] += 1
+            return []
+
+        if any(self._seq_offset(s) > offset for s in self.pending):
+            self.stats['reordered'] += 1
+        self.pending[seq] = (first_index, values, now)
+        return self._release(now)
+
+    def flush(self, now):
+        """释放等待超时的包（没有新包到达时由接收循环定期调用）"""
+        if not self.pending:
+            return []
+        return self._release(now)
+
+    def _release(self, now):
+        released = []
+        while self.pending:
+            if self.next_seq in self.pending:
+                released.extend(self._emit(self.next_seq))
+                continue
+
+            # 缺少 next_seq：窗口已满或最早的包等待超时，则跳过缺口
+            oldest = min(arrival for _, _, arrival in self.pending.values())
+            if len(self.pending) < self.reorder_window and now - oldest < self.max_hold:
+                break
+            self._skip_to(min(self.pending, key=self._seq_offset))
+        return released
+
+    def _skip_to(self, seq):
+        # next_seq 到 seq 之间的包按丢失处理
+        lost = self._seq_offset(seq)
+        self.stats['lost'] += lost
+        self.skipped.extend((self.next_seq + i) % SEQ_MODULUS for i in range(min(lost, self.skipped.maxlen)))
+        self.next_seq = seq
+
+    def _emit(self, seq):
+        first_index, values, _ = self.pending.pop(seq)
+        self.next_seq = (seq + 1) % SEQ_MODULUS
+        blocks = []
+
+        gap = first_index - self.next_index
+        if 0 < gap <= self.max_gap_samples:
+            blocks.append((self.next_index, np.full((gap, values.shape[1]), np.nan, dtype=np.float32)))
+            self.stats['gap_samples'] += gap
+        elif gap != 0:
+            # 样本序号跳变过大或回退：不填补，从该包重新开始计数
+            self.stats['resyncs'] += 1
+
+        blocks.append((first_index, values))
+        self.next_index = first_index + len(values)
+        return blocks
+
+    def _flush_all(self):
+        released = []
+        while self.pending:
+            following = min(self.pending, key=self._seq_offset)
+            self._skip_to(following)
+            released.extend(self._emit(following))
+        return released
+
+    def get_stats(self):
+        """返回丢包、重复、乱序计数
+
+        Returns:
+            dict: 各计数以及丢包率
+        """
+        stats = dict(self.stats)
+        # 迟到包已计入丢失，不再计为收到
+        expected = stats['packets'] - stats['duplicated'] - stats['late'] + stats['lost']
+        stats['loss_ratio'] = stats['lost'] / expected if expected else 0.0
+        stats['pending'] = len(self.pending)
+        return stats
+
+
+def contiguous_runs(blocks):
+    """把 [(first_index, values), ...] 中样本序号连续的相邻块合并
+
+    Returns:
+        list: [(first_index, values), ...]，每一项内部样本序号连续
+    """
+    runs = []
+    for first_index, values in blocks:
+        if runs and runs[-1][0] + sum(len(v) for v in runs[-1][1]) == first_index:
+            runs[-1][1].append(values)
+        else:
+            runs.append((first_index, [values]))
+    return [(first_index, parts[0] if len(parts) == 1 else np.concatenate(parts)) for first_index, parts in runs]
+
+
+def decode_datagram(decoder, sequencer, data, now):
+    """解码一个数据报：带包头的经重排窗口，不带包头的按 Firewater 字节流
+
+    Args:
+        decoder: FirewaterDecoder
+        sequencer: PacketSequencer
+        data: 数据报内容
+        now: 到达时间
+
+    Returns:
+        list: [(first_index, values), ...]；不带包头的块 first_index 为 None
+    """
+    packet = parse_packet(data)
+    if packet is None:
+        return [(None, decoder.decode_packet(data))]
+    _, seq, first_index, payload = packet
+    values = decoder.decode_whole(payload)
+    if values is None:
+        raise ValueError(f"数据包 {seq} 的负载不是整数个Firewater帧 ({len(payload)} 字节)")
+    return sequencer.push(seq, first_index, values, now)
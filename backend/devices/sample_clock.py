@@ -0,0 +1,182 @@
+# sample_clock.py
+
+from collections import deque
+
+import numpy as np
+
+
+class SampleClock:
+    """设备数据流的采样时钟模型
+
+    设备按自己的晶振以接近标称采样率的频率采样，数据块到达主机的时间则带有
+    传输和调度抖动。本模型对每个数据流维护 "样本序号 -> 墙钟时间" 的线性拟合：
+
+        t(i) = t_ref + intercept + period * i
+
+    每到达一块数据，用块内最后一个样本的序号和到达时间作为锚点更新拟合：
+        - 斜率 period 由滑动窗口内锚点的最小二乘拟合得到，即设备时钟相对
+          主机时钟的漂移校正，并限制在标称周期的 ±max_drift_ppm 范围内
+        - 残差超过 outlier_threshold 倍鲁棒抖动估计的锚点视为离群点，不参与拟合；
+          连续出现过多离群点说明时钟发生了阶跃（设备重启、长时间停顿），此时重置模型
+        - 残差超过 reset_threshold 秒时直接重置模型
+
+    块内每个样本的时间戳由拟合直线按样本序号向量化计算，保证严格递增。
+    """
+
+    def __init__(self, nominal_rate=500.0, window=256, anchor_spacing=0.1,
+                 outlier_threshold=4.0, max_consecutive_outliers=8,
+                 reset_threshold=1.0, max_drift_ppm=20000, min_jitter=0.0005):
+        """
+        Args:
+            nominal_rate: 标称采样率（Hz）
+            window: 参与拟合的最大锚点数
+            anchor_spacing: 相邻锚点之间的最小时间间隔（秒，按标称采样率换算为样本数）
+            outlier_threshold: 离群判定阈值（鲁棒抖动估计的倍数）
+            max_consecutive_outliers: 连续离群点超过该数量时重置模型
+            reset_threshold: 残差超过该秒数时重置模型
+            max_drift_ppm: 允许的最大时钟漂移（ppm）
+            min_jitter: 抖动估计的下限（秒），避免抖动极小时误判离群
+        """
+        self.nominal_rate = float(nominal_rate)
+        self.nominal_period = 1.0 / self.nominal_rate
+        self.window = window
+        self.anchor_spacing = max(1, int(round(anchor_spacing * self.nominal_rate)))
+        self.outlier_threshold = outlier_threshold
+        self.max_consecutive_outliers = max_consecutive_outliers
+        self.reset_threshold = reset_threshold
+        self.max_drift = max_drift_ppm * 1e-6
+        self.min_jitter = min_jitter
+
+        self.stats = {
+            'blocks': 0,
+            'samples': 0,
+            'anchors': 0,
+            'outliers': 0,
+            'resets': 0,
+            'max_residual': 0.0
+        }
+        self.reset()
+
+    def reset(self):
+        """清除拟合状态，下一块数据重新建立模型"""
+        self.next_index = 0
+        self.t_ref = None
+        self.intercept = 0.0
+        self.period = self.nominal_period
+        self.anchors = deque(maxlen=self.window)
+        self.residuals = deque(maxlen=self.window)
+        self.last_anchor_index = None
+        self.last_timestamp = None
+        self.consecutive_outliers = 0
+
+    def predict(self, indices):
+        """按当前拟合计算样本序号对应的墙钟时间"""
+        return self.t_ref + self.intercept + self.period * np.asarray(indices, dtype=np.float64)
+
+    def stamp(self, n, arrival_time, first_index=None):
+        """为一块 n 个样本生成时间戳
+
+        Args:
+            n: 块内样本数
+            arrival_time: 该块到达主机的时间（time.time()）
+            first_index: 块内第一个样本的序号；为 None 时接续上一块
+
+        Returns:
+            np.ndarray: 长度为 n 的 float64 时间戳数组
+        """
+        if n <= 0:
+            return np.empty(0, dtype=np.float64)
+
+        if first_index is None:
+            first_index = self.next_index
+        last_index = first_index + n - 1
+
+        if self.t_ref is None:
+            self._restart(last_index, arrival_time)
+        else:
+            self._update(last_index, arrival_time)
+
+        timestamps = self.predict(np.arange(first_index, last_index + 1))
+
+        # 模型修正可能使新块的起点早于上一块的终点，整体平移以保持严格递增
+        if self.last_timestamp is not None and timestamps[0] <= self.last_timestamp:
+            timestamps += self.last_timestamp - timestamps[0] + self.period * 1e-3
+
+        self.last_timestamp = timestamps[-1]
+        self.next_index = last_index + 1
+        self.stats['blocks'] += 1
+        self.stats['samples'] += n
+        return timestamps
+
+    def _restart(self, index, arrival_time):
+        # 以当前锚点重新建立模型，斜率回到标称周期
+        self.t_ref = arrival_time - self.nominal_period * index
+        self.intercept = 0.0
+        self.period = self.nominal_period
+        self.anchors.clear()
+        self.residuals.clear()
+        self.anchors.append((index, self.nominal_period * index))
+        self.last_anchor_index = index
+        self.consecutive_outliers = 0
+
+    def _jitter(self):
+        # 残差的中位数绝对偏差，换算为标准差量级
+        if len(self.residuals) < 4:
+            return self.min_jitter
+        res = np.fromiter(self.residuals, dtype=np.float64)
+        mad = np.median(np.abs(res - np.median(res)))
+        return max(self.min_jitter, float(1.4826 * mad))
+
+    def _update(self, index, arrival_time):
+        residual = arrival_time - float(self.predict(index))
+        self.stats['max_residual'] = max(self.stats['max_residual'], abs(residual))
+
+        if abs(residual) > self.reset_threshold:
+            self.stats['resets'] += 1
+            self._restart(index, arrival_time)
+            return
+
+        if len(self.residuals) >= 4 and abs(residual) > self.outlier_threshold * self._jitter():
+            self.stats['outliers'] += 1
+            self.consecutive_outliers += 1
+            if self.consecutive_outliers > self.max_consecutive_outliers:
+                self.stats['resets'] += 1
+                self._restart(index, arrival_time)
+            return
+
+        self.consecutive_outliers = 0
+        self.residuals.append(residual)
+
+        # 锚点按最小间隔抽取，使拟合窗口覆盖足够长的时间以准确估计漂移
+        if index - self.last_anchor_index < self.anchor_spacing:
+            return
+        self.anchors.append((index, arrival_time - self.t_ref))
+        self.last_anchor_index = index
+        self.stats['anchors'] += 1
+        self._fit()
+
+    def _fit(self):
+        data = np.array(self.anchors, dtype=np.float64)
+        x, y = data[:, 0], data[:, 1]
+        x_mean, y_mean = x.mean(), y.mean()
+        dx = x - x_mean
+        denom = float(np.dot(dx, dx))
+        if len(x) >= 3 and denom > 0:
+            period = float(np.dot(dx, y - y_mean)) / denom
+            low = self.nominal_period * (1 - self.max_drift)
+            high = self.nominal_period * (1 + self.max_drift)
+            self.period = min(max(period, low), high)
+        self.intercept = y_mean - self.period * x_mean
+
+    def get_stats(self):
+        """返回抖动与漂移统计
+
+        Returns:
+            dict: 包含有效采样率、漂移（ppm）、抖动（毫秒）等
+        """
+        stats = dict(self.stats)
+        stats['effective_rate'] = 1.0 / self.period
+        stats['drift_ppm'] = (self.period / self.nominal_period - 1.0) * 1e6
+        stats['jitter_ms'] = self._jitter() * 1000.0
+        stats['max_residual_ms'] = stats.pop('max_residual') * 1000.0
+        return stats
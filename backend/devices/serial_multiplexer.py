@@ -0,0 +1,328 @@
+# serial_multiplexer.py
+
+"""
+多串口单线程复用采集
+
+一台主机通过多个 USB 串口适配器接入多台床旁设备时，每个 SerialPortReader
+各自占用一个读取线程和一个解析绿线程。SerialAcquisitionManager 改为：
+    - 一个原生线程在 epoll（无 epoll 的平台用 poll）上等待所有串口的文件描述符，
+      哪个串口可读就读哪个，没有数据时完全阻塞，不按端口数和轮询频率消耗CPU
+    - 读到的 (读取器, 字节块) 经一个有界队列交给一个解析绿线程；读取线程通过
+      管道唤醒解析绿线程，解析绿线程由 eventlet hub 按管道可读调度，同样不轮询
+    - 解析绿线程按读取器合并字节块，交给各自的解码器、采样时钟和块回调，
+      因此每个串口的数据进入自己的处理流水线（例如各自的 ECGMonitoringSystem）
+
+MultiplexedSerialReader 与 SerialPortReader 接口一致（open / start_reading /
+close / register_block_callback / get_stats），可以直接作为监测系统的数据源。
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import time
+
+from eventlet.hubs import trampoline
+
+from .serial_reader import SerialPortReader
+
+# 原生（未被eventlet替换的）线程、队列和select模块，供复用读取线程使用
+_native_threading = eventlet.patcher.original('threading')
+_native_queue = eventlet.patcher.original('queue')
+_native_select = eventlet.patcher.original('select')
+
+_READ_EVENTS = _native_select.POLLIN | _native_select.POLLPRI
+_ERROR_EVENTS = _native_select.POLLERR | _native_select.POLLHUP | _native_select.POLLNVAL
+
+
+class MultiplexedSerialReader(SerialPortReader):
+    """由 SerialAcquisitionManager 统一读取的串口读取器
+
+    打开串口、解码、时间戳和回调分发与 SerialPortReader 相同，只是字节读取
+    交给管理器的复用线程完成。串口不支持文件描述符（非 POSIX 平台）时，
+    退回 SerialPortReader 自己的阻塞读取线程模式。
+    """
+
+    def __init__(self, manager, port='COM7', baudrate=921600):
+        super().__init__(port=port, baudrate=baudrate)
+        self.manager = manager
+        self.multiplexed = False
+
+    def start_reading(self):
+        """开始读取数据：把串口登记到管理器的复用循环"""
+        if not self.serial_conn or not self.serial_conn.is_open:
+            raise Exception("串口未打开，无法开始读取数据")
+
+        try:
+            fd = self.serial_conn.fileno()
+        except Exception:
+            fd = None
+
+        if fd is None:
+            print(f"串口 {self.port} 不支持文件描述符，使用独立读取线程")
+            super().start_reading()
+            return
+
+        self.is_running = True
+        self.sample_clock.reset()
+        self.stats['start_time'] = time.time()
+        self.multiplexed = True
+        self.manager.add_reader(self, fd)
+        print(f"Started reading from serial port {self.port} with acquisition manager")
+
+    def close(self):
+        if self.multiplexed:
+            self.is_running = False
+            self.manager.remove_reader(self)
+            self.multiplexed = False
+        super().close()
+
+
+class SerialAcquisitionManager:
+    """多串口复用采集管理器"""
+
+    def __init__(self, read_chunk_size=64 * 1024, queue_max_chunks=1024, poll_timeout=0.5,
+                 coalesce_interval=0.002):
+        """
+        Args:
+            read_chunk_size: 单次读取的最大字节数
+            queue_max_chunks: 读取线程与解析绿线程之间的队列容量（块数）
+            poll_timeout: 复用线程等待的超时（秒），只用于检查停止标志
+            coalesce_interval: 解析绿线程被唤醒后等待其他串口数据的时间（秒），
+                使多个串口的数据合并为一次解析，0 表示立即解析
+        """
+        self.read_chunk_size = read_chunk_size
+        self.queue_max_chunks = queue_max_chunks
+        self.poll_timeout = poll_timeout
+        self.coalesce_interval = coalesce_interval
+
+        self.readers = {}            # fd -> 读取器
+        self.is_running = False
+        self._poller = None
+        self._commands = []          # 待复用线程执行的登记/注销操作
+        self._commands_lock = _native_threading.Lock()
+        self._wakeup_r = None        # 唤醒复用线程的管道
+        self._wakeup_w = None
+        self._notify_r = None        # 唤醒解析绿线程的管道
+        self._notify_w = None
+        self._notified = False
+        self._chunk_queue = None
+        self._thread = None
+        self._consumer = None
+
+        self.stats = {
+            'polls': 0,
+            'reads': 0,
+            'bytes_received': 0,
+            'chunks_dropped': 0,
+            'bytes_dropped': 0,
+            'wakeups': 0,
+            'queue_high_watermark': 0,
+            'errors': 0
+        }
+
+    def create_reader(self, port, baudrate=921600):
+        """创建一个由本管理器读取的串口读取器（尚未打开）"""
+        return MultiplexedSerialReader(self, port=port, baudrate=baudrate)
+
+    def start(self):
+        """启动复用读取线程和解析绿线程，重复调用无副作用"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._poller = _native_select.epoll() if hasattr(_native_select, 'epoll') else _native_select.poll()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._notify_r, self._notify_w = os.pipe()
+        for fd in (self._wakeup_r, self._wakeup_w, self._notify_r, self._notify_w):
+            os.set_blocking(fd, False)
+        self._poller.register(self._wakeup_r, _READ_EVENTS)
+        self._chunk_queue = _native_queue.Queue(maxsize=self.queue_max_chunks)
+
+        self._thread = _native_threading.Thread(target=self._poll_loop, name="serial-multiplexer", daemon=True)
+        self._thread.start()
+        self._consumer = eventlet.spawn(self._consume_chunks)
+        print("Serial acquisition manager started")
+
+    def stop(self):
+        """停止复用循环并关闭所有读取器"""
+        for reader in list(self.readers.values()):
+            reader.close()
+        self.is_running = False
+        self._wake_poller()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=max(1.0, self.poll_timeout * 4))
+        self._thread = None
+        self._signal_consumer()
+        if self._consumer is not None:
+            self._consumer.wait()
+            self._consumer = None
+        for fd in (self._wakeup_r, self._wakeup_w, self._notify_r, self._notify_w):
+            if fd is not None:
+                os.close(fd)
+        self._wakeup_r = self._wakeup_w = self._notify_r = self._notify_w = None
+        if self._poller is not None:
+            self._poller.close()
+            self._poller = None
+        print("Serial acquisition manager stopped")
+
+    def add_reader(self, reader, fd):
+        """登记一个读取器，由复用线程开始等待其文件描述符"""
+        self.start()
+        with self._commands_lock:
+            self._commands.append(('add', fd, reader))
+        self._wake_poller()
+
+    def remove_reader(self, reader):
+        """注销一个读取器"""
+        with self._commands_lock:
+            for fd, registered in list(self.readers.items()):
+                if registered is reader:
+                    self._commands.append(('remove', fd, reader))
+        self._wake_poller()
+
+    def _wake_poller(self):
+        if self._wakeup_w is None:
+            return
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            pass  # 管道已满说明复用线程已有待处理的唤醒
+
+    def _signal_consumer(self):
+        if self._notified or self._notify_w is None:
+            return
+        self._notified = True
+        try:
+            os.write(self._notify_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def _apply_commands(self):
+        with self._commands_lock:
+            commands, self._commands = self._commands, []
+        for action, fd, reader in commands:
+            if action == 'add':
+                self.readers[fd] = reader
+                self._poller.register(fd, _READ_EVENTS)
+            elif self.readers.get(fd) is reader:
+                self._unregister(fd)
+
+    def _unregister(self, fd):
+        self.readers.pop(fd, None)
+        try:
+            self._poller.unregister(fd)
+        except (OSError, KeyError, ValueError):
+            pass  # 文件描述符已关闭时内核已自动移除
+
+    def _poll(self):
+        if hasattr(_native_select, 'epoll') and isinstance(self._poller, _native_select.epoll):
+            return self._poller.poll(self.poll_timeout)
+        return self._poller.poll(self.poll_timeout * 1000)
+
+    def _poll_loop(self):
+        """原生线程：等待任一串口可读，读取后放入队列"""
+        while self.is_running:
+            try:
+                events = self._poll()
+            except InterruptedError:
+                continue
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"复用读取线程等待出错: {e}")
+                break
+            self.stats['polls'] += 1
+
+            for fd, mask in events:
+                if fd == self._wakeup_r:
+                    self.stats['wakeups'] += 1
+                    try:
+                        os.read(fd, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+
+                reader = self.readers.get(fd)
+                if reader is None or not reader.is_running:
+                    continue
+                self._read_ready(fd, mask, reader)
+
+            self._apply_commands()
+
+    def _read_ready(self, fd, mask, reader):
+        try:
+            data = os.read(fd, self.read_chunk_size)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            data = None
+            error = e
+        else:
+            error = None if data or not mask & _ERROR_EVENTS else "设备已断开"
+
+        if error is not None or data is None:
+            # 设备拔出或串口被关闭：停止等待该串口，由上层决定是否重新连接
+            self.stats['errors'] += 1
+            reader.stats['errors'] += 1
+            print(f"串口 {reader.port} 读取失败: {error}，已停止复用读取")
+            self._unregister(fd)
+            return
+        if not data:
+            return
+
+        self.stats['reads'] += 1
+        self.stats['bytes_received'] += len(data)
+        reader.stats['bytes_received'] += len(data)
+        try:
+            self._chunk_queue.put_nowait((reader, data))
+        except _native_queue.Full:
+            # 解析跟不上时丢弃该块并计数，不阻塞其他串口的读取
+            self.stats['chunks_dropped'] += 1
+            self.stats['bytes_dropped'] += len(data)
+            reader.stats['chunks_dropped'] += 1
+            reader.stats['bytes_dropped'] += len(data)
+        self._signal_consumer()
+
+    def _consume_chunks(self):
+        """绿线程：被唤醒后取出队列中所有字节块，按读取器合并后解析"""
+        chunk_queue = self._chunk_queue
+        while self.is_running or not chunk_queue.empty():
+            try:
+                trampoline(self._notify_r, read=True, timeout=self.poll_timeout)
+                os.read(self._notify_r, 4096)
+            except (BlockingIOError, eventlet.Timeout):
+                pass
+            except OSError:
+                break
+            if self.coalesce_interval > 0:
+                eventlet.sleep(self.coalesce_interval)
+            # 先清除通知标志再取数据，保证之后放入的数据一定会再次唤醒
+            self._notified = False
+
+            pending = {}
+            count = 0
+            try:
+                while True:
+                    reader, data = chunk_queue.get_nowait()
+                    pending.setdefault(reader, []).append(data)
+                    count += 1
+            except _native_queue.Empty:
+                pass
+            if not count:
+                continue
+
+            self.stats['queue_high_watermark'] = max(self.stats['queue_high_watermark'], count)
+            for reader, chunks in pending.items():
+                reader.stats['chunks_received'] += len(chunks)
+                reader.stats['queue_high_watermark'] = max(reader.stats['queue_high_watermark'], len(chunks))
+                try:
+                    reader._handle_bytes(b''.join(chunks))
+                except Exception as e:
+                    reader.stats['errors'] += 1
+                    print(f"解析串口 {reader.port} 数据块时出错: {e}")
+            eventlet.sleep(0)
+
+    def get_stats(self):
+        """返回复用循环统计以及每个串口的读取统计"""
+        stats = dict(self.stats)
+        stats['ports'] = {reader.port: reader.get_stats() for reader in list(self.readers.values())}
+        return stats
@@ -4,11 +4,24 @@ import time
 import eventlet
 eventlet.monkey_patch()
 
+import os
 import serial
 import struct
 import threading
+import numpy as np
+from eventlet.hubs import trampoline
 
-class SerialPortReader:
+# 原生（未被eventlet替换的）线程、队列、select和time模块，供阻塞读取线程使用
+_native_threading = eventlet.patcher.original('threading')
+_native_queue = eventlet.patcher.original('queue')
+_native_select = eventlet.patcher.original('select')
+_native_time = eventlet.patcher.original('time')
+
+from .firewater import FirewaterDecoder
+from .block_callbacks import BlockCallbackMixin
+from .sample_clock import SampleClock
+
+class SerialPortReader(BlockCallbackMixin):
     FRAME_TAIL = b'\x00\x00\x80\x7F'
 
     def __init__(self, port='COM7', baudrate=921600):
@@ -16,9 +29,27 @@ class SerialPortReader:
         self.baudrate = baudrate
         self.serial_conn = None
         self.is_running = False
-        self.callbacks = []
+        self.callbacks = []          # 逐样本回调 (values, timestamp)
+        self.block_callbacks = []    # 块回调 (values[n, 8], timestamps[n])
         self.buffer = bytearray()
         
+        # 块解码模式：一次解码缓冲区内全部完整帧，关闭时退回逐帧解析
+        self.block_decoding = True
+        self.decoder = FirewaterDecoder(channels=8)
+        
+        # 阻塞读取线程模式：原生线程做带超时的大块阻塞读取，
+        # 字节块经有界队列交给绿线程解析，读取不受标称采样率节流
+        self.threaded_reading = True
+        self.read_chunk_size = 64 * 1024   # 单次读取的最大字节数
+        self.read_timeout = 0.05           # 阻塞读取超时（秒）
+        self.queue_max_chunks = 256        # 读取线程与解析之间的队列容量（块数）
+        self.consumer_poll_timeout = 0.5   # 解析绿线程等待唤醒的超时（秒），只用于检查停止标志
+        self._chunk_queue = None
+        self._reader_thread = None
+        self._notify_r = None              # 读取线程唤醒解析绿线程的管道
+        self._notify_w = None
+        self._notified = False
+        
         # 添加固定采样率机制相关参数
         self.fixed_sampling_rate = True     # 是否启用固定采样率
         self.target_sampling_rate = 500     # 目标采样率（Hz）
@@ -27,13 +58,21 @@ class SerialPortReader:
         self.sample_count = 0              # 采样计数器
         self.time_correction_factor = 1.0  # 时间校正因子
         
+        # 采样时钟模型：样本序号到墙钟时间的漂移校正线性拟合
+        self.sample_clock = SampleClock(nominal_rate=self.target_sampling_rate)
+        
         # 数据统计参数
         self.stats = {
             'frames_received': 0,
             'frames_processed': 0,
+            'chunks_received': 0,
             'errors': 0,
             'start_time': None,
-            'actual_sampling_rate': 0
+            'actual_sampling_rate': 0,
+            'bytes_received': 0,
+            'chunks_dropped': 0,
+            'bytes_dropped': 0,
+            'queue_high_watermark': 0
         }
 
     def open(self):
@@ -72,6 +111,11 @@ class SerialPortReader:
             raise Exception("串口未打开，无法开始读取数据")
             
         self.is_running = True
+        self.sample_clock.reset()
+        
+        if self.threaded_reading:
+            self._start_threaded_reading()
+            return
         
         # 只使用一种线程方式，避免冲突
         if hasattr(eventlet, 'spawn'):
@@ -85,9 +129,146 @@ class SerialPortReader:
 
     def close(self):
         self.is_running = False
+        if self._reader_thread and self._reader_thread.is_alive():
+            self._reader_thread.join(timeout=max(1.0, self.read_timeout * 4))
+        self._reader_thread = None
+        # 唤醒解析绿线程，使其处理完剩余字节块后退出并关闭管道
+        self._signal_consumer()
         if self.serial_conn and self.serial_conn.is_open:
             self.serial_conn.close()
 
+    def _start_threaded_reading(self):
+        """启动原生阻塞读取线程和解析绿线程"""
+        self.stats['start_time'] = time.time()
+        self.serial_conn.timeout = self.read_timeout
+        self._chunk_queue = _native_queue.Queue(maxsize=self.queue_max_chunks)
+        self._notify_r, self._notify_w = os.pipe()
+        os.set_blocking(self._notify_r, False)
+        os.set_blocking(self._notify_w, False)
+        self._notified = False
+        self._reader_thread = _native_threading.Thread(
+            target=self._blocking_read_loop,
+            name=f"serial-reader-{self.port}",
+            daemon=True
+        )
+        self._reader_thread.start()
+        eventlet.spawn(self._consume_chunks)
+        print(f"Started reading from serial port {self.port} with native reader thread")
+
+    def _read_chunk(self):
+        """带超时的阻塞读取，返回读到的字节（超时返回空）"""
+        conn = self.serial_conn
+        try:
+            fd = conn.fileno()
+        except Exception:
+            fd = None
+
+        if fd is not None:
+            # POSIX：直接在文件描述符上等待，避开被eventlet替换的select
+            readable, _, _ = _native_select.select([fd], [], [], self.read_timeout)
+            if not readable:
+                return b''
+            return os.read(fd, self.read_chunk_size)
+
+        # 其他平台：阻塞等待至少一个字节（超时为read_timeout），再取走已到达的全部字节
+        waiting = conn.in_waiting
+        return conn.read(min(max(1, waiting), self.read_chunk_size))
+
+    def _blocking_read_loop(self):
+        """原生线程：持续阻塞读取并把字节块放入有界队列"""
+        consecutive_errors = 0
+        max_errors = 5
+
+        while self.is_running:
+            try:
+                data = self._read_chunk()
+                consecutive_errors = 0
+            except Exception as e:
+                if not self.is_running:
+                    break
+                consecutive_errors += 1
+                self.stats['errors'] += 1
+                print(f"读取线程发生异常: {e}. 错误计数: {consecutive_errors}")
+                if consecutive_errors >= max_errors:
+                    print(f"连续错误过多 ({consecutive_errors})，正在重新连接...")
+                    try:
+                        if self.serial_conn:
+                            self.serial_conn.close()
+                        _native_time.sleep(1)
+                        self.open()
+                        # open() 使用 1 秒的超时，恢复读取线程的读取超时
+                        self.serial_conn.timeout = self.read_timeout
+                        consecutive_errors = 0
+                    except Exception as e:
+                        print(f"重新连接失败: {e}")
+                else:
+                    _native_time.sleep(0.1)
+                continue
+
+            if not data:
+                continue
+
+            self.stats['bytes_received'] += len(data)
+            try:
+                self._chunk_queue.put(data, timeout=self.read_timeout)
+            except _native_queue.Full:
+                # 解析跟不上时丢弃该块并计数，而不是让内核缓冲区静默溢出
+                self.stats['chunks_dropped'] += 1
+                self.stats['bytes_dropped'] += len(data)
+                continue
+            self._signal_consumer()
+
+    def _signal_consumer(self):
+        # 读取线程放入数据后通过管道唤醒解析绿线程，已有未处理的唤醒时不重复写入
+        if self._notified or self._notify_w is None:
+            return
+        self._notified = True
+        try:
+            os.write(self._notify_w, b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _consume_chunks(self):
+        """绿线程：被管道唤醒后取出队列中所有已到达的字节块，合并后一次解析
+
+        由 eventlet hub 按管道可读调度，队列为空时不轮询
+        """
+        chunk_queue = self._chunk_queue
+        notify_r = self._notify_r
+        while self.is_running or not chunk_queue.empty():
+            try:
+                trampoline(notify_r, read=True, timeout=self.consumer_poll_timeout)
+                os.read(notify_r, 4096)
+            except (BlockingIOError, eventlet.Timeout):
+                pass
+            except OSError:
+                break
+            # 先清除通知标志再取数据，保证之后放入的数据一定会再次唤醒
+            self._notified = False
+
+            chunks = []
+            try:
+                while True:
+                    chunks.append(chunk_queue.get_nowait())
+            except _native_queue.Empty:
+                pass
+            if not chunks:
+                continue
+
+            self.stats['queue_high_watermark'] = max(self.stats['queue_high_watermark'], len(chunks))
+            self.stats['chunks_received'] += len(chunks)
+            try:
+                self._handle_bytes(b''.join(chunks))
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"解析数据块时出错: {e}")
+            eventlet.sleep(0)
+
+        notify_w, self._notify_r, self._notify_w = self._notify_w, None, None
+        for fd in (notify_r, notify_w):
+            if fd is not None:
+                os.close(fd)
+
     def read_data(self):
         """
         改进的数据读取方法，实现固定采样率机制和时间戳精确控制
@@ -143,9 +324,8 @@ class SerialPortReader:
                     # 读取数据
                     data = self.serial_conn.read(in_waiting)
                     if data:
-                        self.stats['frames_received'] += 1
-                        self.buffer.extend(data)
-                        self._parse_frames()
+                        self.stats['chunks_received'] += 1
+                        self._handle_bytes(data)
                         consecutive_errors = 0  # 重置错误计数
                         
                         # 计算实际采样率并调整时间校正因子
@@ -177,9 +357,8 @@ class SerialPortReader:
                         if data:
                             self.last_sample_time = time.time()
                             self.sample_count += 1
-                            self.stats['frames_received'] += 1
-                            self.buffer.extend(data)
-                            self._parse_frames()
+                            self.stats['chunks_received'] += 1
+                            self._handle_bytes(data)
                             consecutive_errors = 0  # 重置错误计数
                     except serial.SerialException as e:
                         consecutive_errors += 1
@@ -214,35 +393,57 @@ class SerialPortReader:
                 print(f"read_data中发生意外错误: {e}. 错误计数: {consecutive_errors}")
                 eventlet.sleep(0.5)  # 出错后等待一段时间
 
+    def _handle_bytes(self, data):
+        """把读到的字节交给当前解码模式"""
+        if self.block_decoding:
+            self.decoder.feed(data)
+        else:
+            self.buffer.extend(data)
+        self._parse_frames()
+
     def _parse_frames(self):
+        if self.block_decoding:
+            self._parse_frame_block()
+        else:
+            self._parse_frames_per_frame()
+
+    def _parse_frame_block(self):
         """
-        解析数据帧并应用时间戳精确控制
+        块解码：一次取出缓冲区内全部完整帧，时间戳按块向量化计算
+        """
+        try:
+            values = self.decoder.decode()
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"解析帧时出错: {e}")
+            return
+
+        n = len(values)
+        if n == 0:
+            return
+
+        # 由采样时钟模型按样本序号计算整块时间戳
+        timestamps = self.sample_clock.stamp(n, time.time())
+
+        self.stats['frames_received'] += n
+        self.stats['frames_processed'] += n
+
+        self._dispatch_block(values, timestamps)
+
+    def _parse_frames_per_frame(self):
+        """
+        逐帧解析数据帧并应用时间戳精确控制
         """
-        frames_processed = 0
-        
         while True:
             tail_index = self.buffer.find(self.FRAME_TAIL)
             if tail_index != -1:
                 frame_end = tail_index + len(self.FRAME_TAIL)
+                self.stats['frames_received'] += 1
                 if tail_index > 0:
                     frame_data = self.buffer[:tail_index]
                     try:
-                        # 获取当前时间戳并应用校正因子
-                        current_time = time.time()
-                        
-                        # 如果启用了固定采样率，使用计算的时间戳
-                        if self.fixed_sampling_rate and self.stats['start_time'] is not None:
-                            # 计算基于采样计数的理论时间戳
-                            frames_processed += 1
-                            theoretical_time = self.stats['start_time'] + (frames_processed / self.target_sampling_rate)
-                            
-                            # 应用校正因子来调整时间戳
-                            # 使用加权平均来平滑时间戳变化
-                            weight = 0.8  # 理论时间的权重
-                            adjusted_time = (theoretical_time * weight) + (current_time * (1 - weight))
-                            
-                            # 确保时间戳不会大于当前时间
-                            current_time = min(adjusted_time, current_time)
+                        # 由采样时钟模型计算该帧的时间戳
+                        current_time = float(self.sample_clock.stamp(1, time.time())[0])
                         
                         # 解析数据帧
                         values = self.parse_frame(frame_data)
@@ -264,8 +465,7 @@ class SerialPortReader:
                         values = convert_numpy_to_list(values)
                         
                         # 回调函数传递解析的值和精确时间戳
-                        for callback in self.callbacks:
-                            callback(values, current_time)
+                        self._dispatch_sample(values, current_time)
                     except Exception as e:
                         self.stats['errors'] += 1
                         print(f"解析帧时出错: {e}")
@@ -273,6 +473,13 @@ class SerialPortReader:
             else:
                 break
 
+    def get_stats(self):
+        """返回读取统计、链路质量统计以及采样时钟的抖动与漂移统计"""
+        stats = dict(self.stats)
+        stats['link'] = self.decoder.get_stats()
+        stats['clock'] = self.sample_clock.get_stats()
+        return stats
+
     def parse_frame(self, data):
         expected_length = 4 * 8
         if len(data) != expected_length:
@@ -283,6 +490,3 @@ class SerialPortReader:
             value = struct.unpack('<f', bytes_)[0]
             values.append(value)
         return values
-
-    def register_callback(self, callback):
-        self.callbacks.append(callback)
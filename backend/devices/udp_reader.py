@@ -1,33 +1,81 @@
 # udp_reader.py
 
+import os
+import select
 import socket
 import threading
 import eventlet
 import time
+import numpy as np
 
-class UDPReader:
-    def __init__(self, local_ip='0.0.0.0', local_port=5001, remote_ip=None, remote_port=None):
+from .block_callbacks import BlockCallbackMixin
+from .firewater import FirewaterDecoder
+from .packet_format import PacketSequencer, decode_datagram
+from .sample_clock import SampleClock
+
+def read_kernel_drops(inode):
+    """按套接字 inode 从 /proc/net/udp 读取内核丢弃的数据报数（仅 Linux），不可用时返回 None"""
+    if inode is None:
+        return None
+    for path in ('/proc/net/udp', '/proc/net/udp6'):
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    # 第 10 列是套接字 inode，最后一列是丢弃计数
+                    if len(fields) >= 13 and fields[9] == str(inode):
+                        return int(fields[-1])
+        except (OSError, StopIteration, ValueError):
+            continue
+    return None
+
+
+class UDPReader(BlockCallbackMixin):
+    def __init__(self, local_ip='0.0.0.0', local_port=5001, remote_ip=None, remote_port=None,
+                 sampling_rate=500, channels=8):
         self.local_ip = local_ip
         self.local_port = local_port
         self.remote_ip = remote_ip
         self.remote_port = remote_port
         self.socket = None
         self.is_running = False
-        self.callbacks = []
-        self.buffer = bytearray()
+        self.callbacks = []          # 逐样本回调 (values, timestamp)
+        self.block_callbacks = []    # 块回调 (values[n, channels], timestamps[n])
+        
+        # 与串口相同的Firewater帧解码器；整帧数据报走快速路径，跨数据报的帧由解码器缓冲拼接
+        self.decoder = FirewaterDecoder(channels=channels)
+        # 带序号包头的数据报经重排窗口恢复顺序，丢失的包以 NaN 填补
+        self.sequencer = PacketSequencer()
+        
+        # 采样时钟模型：样本序号到墙钟时间的漂移校正线性拟合
+        self.sampling_rate = sampling_rate
+        self.sample_clock = SampleClock(nominal_rate=sampling_rate)
+        
+        # 接收参数
+        self.recv_buffer_size = 4 * 1024 * 1024   # 请求的内核接收缓冲区（SO_RCVBUF）字节数，None 表示系统默认
+        self.max_datagram_size = 65536            # 预分配接收缓冲区大小
+        self.max_batch_datagrams = 1024           # 单批最多读取的数据报数，之后让出控制权
+        self.wait_timeout = 0.5                   # select 等待超时（秒），用于检查停止标志
+        self._socket_inode = None
+        self._rejected_sources = set()
+        
+        self.stats = {
+            'datagrams_received': 0,
+            'datagrams_rejected': 0,
+            'bytes_received': 0,
+            'frames_processed': 0,
+            'batches': 0,
+            'errors': 0,
+            'start_time': None
+        }
         
     def open(self):
         try:
-            # 创建UDP套接字
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket = self._create_socket()
             
-            # 设置超时，避免阻塞
-            self.socket.settimeout(0.5)
-            
-            # 绑定到本地地址和端口
-            self.socket.bind((self.local_ip, self.local_port))
-            
-            print(f"UDP socket bound to {self.local_ip}:{self.local_port}")
+            print(f"UDP socket bound to {self.local_ip}:{self.local_port}, "
+                  f"SO_RCVBUF={self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)}")
             
             # 如果指定了远程地址，可以设置为连接模式（可选）
             if self.remote_ip and self.remote_port:
@@ -39,12 +87,34 @@ class UDPReader:
             print(f"Failed to open UDP socket: {e}")
             raise
     
+    def _create_socket(self):
+        """创建并绑定非阻塞UDP套接字，按配置设置内核接收缓冲区"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.recv_buffer_size:
+            try:
+                # Linux 实际分配的大小为请求值的两倍，并受 net.core.rmem_max 限制
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+            except OSError as e:
+                print(f"设置SO_RCVBUF失败: {e}")
+        # 非阻塞：读取循环用 select 等待可读，然后一直读到 EAGAIN
+        sock.setblocking(False)
+        sock.bind((self.local_ip, self.local_port))
+        self._socket_inode = None
+        try:
+            self._socket_inode = os.fstat(sock.fileno()).st_ino
+        except OSError:
+            pass
+        return sock
+    
     def start_reading(self):
         """开始读取数据"""
         if not self.socket:
             raise Exception("UDP套接字未创建，无法开始读取数据")
             
         self.is_running = True
+        self.sample_clock.reset()
+        self.decoder.reset()
+        self.sequencer.reset()
         
         # 使用eventlet绿线程启动数据接收
         if hasattr(eventlet, 'spawn'):
@@ -62,34 +132,61 @@ class UDPReader:
             self.socket = None
     
     def read_data(self):
+        """
+        接收循环：select 等待套接字可读后，用 recvfrom_into 把数据报读入预分配的
+        缓冲区，一直读到 EAGAIN（或达到单批上限），整批解码后只分发一次
+        """
         consecutive_errors = 0
         max_errors = 5
+        recv_buffer = bytearray(self.max_datagram_size)
+        recv_view = memoryview(recv_buffer)
+        self.stats['start_time'] = time.time()
         
         while self.is_running:
             try:
-                # 尝试接收数据
-                try:
-                    data, addr = self.socket.recvfrom(4096)  # 缓冲区大小
+                sock = self.socket
+                # 重排窗口中有等待的包时缩短等待，以便按时释放
+                timeout = self.sequencer.max_hold if self.sequencer.pending else self.wait_timeout
+                readable, _, _ = select.select([sock], [], [], timeout)
+                if not readable:
+                    self._dispatch_values(self.sequencer.flush(time.time()))
+                    continue
+                
+                # 已确认可读且套接字为非阻塞，直接在底层套接字上读取，绕过eventlet的包装
+                raw = getattr(sock, 'fd', sock)
+                now = time.time()
+                blocks = []
+                for _ in range(self.max_batch_datagrams):
+                    try:
+                        nbytes, addr = raw.recvfrom_into(recv_buffer)
+                    except (BlockingIOError, InterruptedError):
+                        break
                     
-                    # 如果设置了远程端点，检查数据是否来自预期的源
+                    # 如果设置了远程端点，丢弃来自其他来源的数据
                     if self.remote_ip and self.remote_port:
                         if addr[0] != self.remote_ip or addr[1] != self.remote_port:
-                            print(f"Received data from unexpected source: {addr}, expected {self.remote_ip}:{self.remote_port}")
+                            self._reject_source(addr)
                             continue
                     
-                    if data:
-                        print(f"Received {len(data)} bytes from {addr}")
-                        # 处理接收到的数据
-                        self._handle_data(data)
-                        consecutive_errors = 0  # 重置错误计数
+                    self.stats['datagrams_received'] += 1
+                    self.stats['bytes_received'] += nbytes
+                    if nbytes:
+                        blocks.extend(self._decode_datagram(recv_view[:nbytes], now))
                 
-                except socket.timeout:
-                    # 超时是正常的，不计入错误
-                    pass
-                    
-                except socket.error as e:
-                    consecutive_errors += 1
-                    print(f"Socket error: {e}. Error count: {consecutive_errors}")
+                self.stats['batches'] += 1
+                consecutive_errors = 0
+                blocks.extend(self.sequencer.flush(now))
+                self._dispatch_values(blocks, now)
+                
+                # 一批读完后让出控制权，使处理和推送绿线程得到调度
+                eventlet.sleep(0)
+                
+            except (socket.error, ValueError) as e:
+                if not self.is_running:
+                    break
+                consecutive_errors += 1
+                self.stats['errors'] += 1
+                print(f"Socket error: {e}. Error count: {consecutive_errors}")
                 
                 # 如果连续错误超过限制，重新创建套接字
                 if consecutive_errors >= max_errors:
@@ -97,62 +194,58 @@ class UDPReader:
                     try:
                         if self.socket:
                             self.socket.close()
-                        
-                        # 重新创建套接字
-                        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                        self.socket.settimeout(0.5)
-                        self.socket.bind((self.local_ip, self.local_port))
+                        self.socket = self._create_socket()
                         consecutive_errors = 0
                     except Exception as e:
                         print(f"Failed to reconnect: {e}")
-                
-                # 让出控制权
-                eventlet.sleep(0.01)
+                eventlet.sleep(0.1)
                 
             except Exception as e:
                 consecutive_errors += 1
+                self.stats['errors'] += 1
                 print(f"Unexpected error in read_data: {e}. Error count: {consecutive_errors}")
                 eventlet.sleep(0.5)
     
-    def _handle_data(self, data):
-        # 将数据添加到缓冲区
-        self.buffer.extend(data)
-        
-        # 解析数据帧 - 这里需要根据实际协议进行调整
-        self._parse_frames()
-        
-        # 通知回调函数
-        for callback in self.callbacks:
-            callback(data)
+    def _reject_source(self, addr):
+        self.stats['datagrams_rejected'] += 1
+        if addr not in self._rejected_sources:
+            # 每个意外来源只提示一次
+            self._rejected_sources.add(addr)
+            print(f"Received data from unexpected source: {addr}, expected {self.remote_ip}:{self.remote_port}")
     
-    def _parse_frames(self):
-        # 这里需要根据实际的数据格式实现帧解析
-        # 例如，如果数据是按照某种帧格式发送的，需要在这里解析
-        # 简单示例：假设每个帧以特定字节结束
-        frame_end = bytes([0xFF, 0xFF])  # 示例帧结束标记
-        
-        while True:
-            end_index = self.buffer.find(frame_end)
-            if end_index != -1:
-                # 找到一个完整的帧
-                frame = self.buffer[:end_index + len(frame_end)]
-                # 处理帧数据 - 这里只是示例，需要根据实际协议调整
-                self._process_frame(frame)
-                # 从缓冲区中移除已处理的帧
-                self.buffer = self.buffer[end_index + len(frame_end):]
-            else:
-                # 没有找到完整的帧，等待更多数据
-                break
+    def _decode_datagram(self, data, now):
+        """解码一个数据报，返回 [(first_index, values), ...]"""
+        try:
+            return decode_datagram(self.decoder, self.sequencer, data, now)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"解析UDP数据报时出错: {e}")
+            return []
+    
+    def _dispatch_values(self, blocks, now=None):
+        # 由采样时钟模型按样本序号计算整块时间戳
+        if blocks:
+            self.stats['frames_processed'] += self._dispatch_decoded(blocks, now or time.time())
     
-    def _process_frame(self, frame):
-        # 处理单个数据帧 - 需要根据实际协议实现
-        # 这里只是一个示例
-        print(f"Processing frame: {len(frame)} bytes")
-        # 实际处理逻辑...
+    def kernel_drops(self):
+        """返回内核因接收缓冲区满丢弃的数据报数，不可用时返回 None"""
+        return read_kernel_drops(self._socket_inode)
     
-    def register_callback(self, callback):
-        """注册一个回调函数，当接收到新数据时调用"""
-        self.callbacks.append(callback)
+    def _handle_data(self, data):
+        """解码一个数据报并以块回调分发"""
+        now = time.time()
+        self._dispatch_values(self._decode_datagram(data, now) + self.sequencer.flush(now), now)
+    
+    def get_stats(self):
+        """返回接收统计、链路质量统计以及采样时钟的抖动与漂移统计"""
+        stats = dict(self.stats)
+        stats['kernel_drops'] = self.kernel_drops()
+        if self.socket:
+            stats['recv_buffer_size'] = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        stats['link'] = self.decoder.get_stats()
+        stats['packets'] = self.sequencer.get_stats()
+        stats['clock'] = self.sample_clock.get_stats()
+        return stats
     
     def send_data(self, data):
         """向远程端点发送数据"""
@@ -0,0 +1,373 @@
+# udp_server.py
+
+"""
+多设备UDP服务器
+
+一个 UDP 端口接收整个病区所有无线 ECG 贴片的数据，按来源地址（或数据报中的
+设备ID）把数据报分发到各设备的会话。每个会话有自己的 Firewater 解码器、采样
+时钟和块回调，对上层与 UDPReader 一样是一个数据源，可以直接交给各自的
+ECGMonitoringSystem（见 ECGMonitoringSystem.connect_source）。
+
+    - 新设备第一次发来数据时自动创建会话，并通知 on_session_created 回调；回调抛出异常（例如
+      会话数已达上限）时不登记会话，reject_interval 秒内该设备的数据报被丢弃
+    - 超过 idle_timeout 没有数据的会话被移除，并通知 on_session_evicted 回调
+    - get_stats() 报告每个设备的接收速率、链路错误率和空闲时间
+
+设备ID模式（demux='payload'）下，带序号包头（见 packet_format）的数据报以包头中的
+stream_id 为设备ID；不带包头的数据报以 4 字节小端 uint32 设备ID 开头，其后是
+Firewater 帧。适用于设备经 NAT 或 DHCP 导致来源地址不稳定的场景。
+"""
+
+import os
+import select
+import socket
+import struct
+import time
+
+import eventlet
+
+from .block_callbacks import BlockCallbackMixin
+from .firewater import FirewaterDecoder
+from .packet_format import PacketSequencer, decode_datagram, parse_packet
+from .sample_clock import SampleClock
+from .udp_reader import read_kernel_drops
+
+DEVICE_ID = struct.Struct('<I')
+
+
+class UDPDeviceSession(BlockCallbackMixin):
+    """单个设备的解码状态和数据源接口"""
+
+    def __init__(self, device_key, address, sampling_rate=500, channels=8):
+        """
+        Args:
+            device_key: 设备标识（来源地址元组或设备ID）
+            address: 最近一次数据报的来源地址
+            sampling_rate: 标称采样率
+            channels: 每帧通道数
+        """
+        self.device_key = device_key
+        self.address = address
+        self.label = f"{device_key[0]}:{device_key[1]}" if isinstance(device_key, tuple) else str(device_key)
+        self.is_running = True
+        self.callbacks = []          # 逐样本回调 (values, timestamp)
+        self.block_callbacks = []    # 块回调 (values[n, channels], timestamps[n])
+        self.decoder = FirewaterDecoder(channels=channels)
+        self.sequencer = PacketSequencer()
+        self.sample_clock = SampleClock(nominal_rate=sampling_rate)
+
+        now = time.time()
+        self.created_at = now
+        self.last_seen = now
+        self._rate_window_start = now
+        self._rate_window_frames = 0
+        self.stats = {
+            'datagrams_received': 0,
+            'bytes_received': 0,
+            'frames_processed': 0,
+            'errors': 0,
+            'rate': 0.0
+        }
+
+    # 数据源接口：会话由服务器创建和驱动，open / start_reading / close 只切换状态
+    def open(self):
+        return True
+
+    def start_reading(self):
+        self.is_running = True
+
+    def close(self):
+        self.is_running = False
+
+    def _receive(self, data, address, now):
+        """解码一个数据报，返回 [(first_index, values), ...]"""
+        self.address = address
+        self.last_seen = now
+        self.stats['datagrams_received'] += 1
+        self.stats['bytes_received'] += len(data)
+        try:
+            return decode_datagram(self.decoder, self.sequencer, data, now)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"解析设备 {self.label} 的数据报时出错: {e}")
+            return []
+
+    def _dispatch_values(self, blocks, now):
+        n = sum(len(values) for _, values in blocks)
+        self.stats['frames_processed'] += n
+        self._update_rate(n, now)
+        if self.is_running:
+            self._dispatch_decoded(blocks, now)
+
+    def _update_rate(self, n, now):
+        # 按约 1 秒的窗口统计接收速率
+        self._rate_window_frames += n
+        elapsed = now - self._rate_window_start
+        if elapsed >= 1.0:
+            self.stats['rate'] = self._rate_window_frames / elapsed
+            self._rate_window_start = now
+            self._rate_window_frames = 0
+
+    def get_stats(self):
+        """返回接收统计、链路质量统计以及采样时钟统计"""
+        stats = dict(self.stats)
+        stats['address'] = f"{self.address[0]}:{self.address[1]}" if self.address else None
+        stats['idle_seconds'] = time.time() - self.last_seen
+        stats['link'] = self.decoder.get_stats()
+        stats['packets'] = self.sequencer.get_stats()
+        # 带序号的数据流按丢包率，否则按帧错误率
+        stats['loss_ratio'] = (stats['packets']['loss_ratio'] if stats['packets']['packets']
+                               else stats['link']['error_rate'])
+        stats['clock'] = self.sample_clock.get_stats()
+        return stats
+
+
+class UDPDeviceServer:
+    """单端口多设备UDP服务器"""
+
+    DEMUX_MODES = ('address', 'payload')
+
+    def __init__(self, local_ip='0.0.0.0', local_port=5001, demux='address', sampling_rate=500,
+                 channels=8, idle_timeout=10.0, max_sessions=256):
+        """
+        Args:
+            local_ip: 绑定地址
+            local_port: 绑定端口
+            demux: 设备区分方式，'address' 按来源地址，'payload' 按数据报开头的设备ID
+            sampling_rate: 设备的标称采样率
+            channels: 每帧通道数
+            idle_timeout: 会话空闲超过该秒数后被移除
+            max_sessions: 最大会话数，超过后新设备的数据报被丢弃
+        """
+        if demux not in self.DEMUX_MODES:
+            raise ValueError(f"不支持的设备区分方式: {demux}")
+        self.local_ip = local_ip
+        self.local_port = local_port
+        self.demux = demux
+        self.sampling_rate = sampling_rate
+        self.channels = channels
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+
+        # 接收参数，与 UDPReader 相同
+        self.recv_buffer_size = 8 * 1024 * 1024
+        self.max_datagram_size = 65536
+        self.max_batch_datagrams = 1024
+        self.wait_timeout = 0.5
+        self.eviction_interval = 1.0
+        self.reject_interval = 5.0
+
+        self.socket = None
+        self.is_running = False
+        self.sessions = {}
+        self.session_created_callbacks = []
+        self.session_evicted_callbacks = []
+        self.rejected = {}   # 被拒绝的设备标识 -> 重新接受的时间
+        self._socket_inode = None
+        self._last_eviction = 0.0
+
+        self.stats = {
+            'datagrams_received': 0,
+            'datagrams_rejected': 0,
+            'bytes_received': 0,
+            'sessions_created': 0,
+            'sessions_evicted': 0,
+            'sessions_rejected': 0,
+            'batches': 0,
+            'errors': 0
+        }
+
+    def on_session_created(self, callback):
+        """注册新设备回调，接收参数(session)，可在回调中为会话注册处理流水线；抛出异常表示拒绝该设备"""
+        self.session_created_callbacks.append(callback)
+
+    def on_session_evicted(self, callback):
+        """注册会话移除回调，接收参数(session)"""
+        self.session_evicted_callbacks.append(callback)
+
+    def open(self):
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.recv_buffer_size:
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+                except OSError as e:
+                    print(f"设置SO_RCVBUF失败: {e}")
+            sock.setblocking(False)
+            sock.bind((self.local_ip, self.local_port))
+            self._socket_inode = os.fstat(sock.fileno()).st_ino
+            self.socket = sock
+            print(f"UDP device server bound to {self.local_ip}:{self.local_port} (demux={self.demux})")
+            return True
+        except Exception as e:
+            print(f"Failed to open UDP device server: {e}")
+            raise
+
+    def start(self):
+        """打开套接字（如尚未打开）并启动接收绿线程"""
+        if not self.socket:
+            self.open()
+        self.is_running = True
+        eventlet.spawn(self._receive_loop)
+
+    def stop(self):
+        self.is_running = False
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+        for key in list(self.sessions):
+            self._evict(key)
+
+    def _device_key(self, data, address):
+        """返回 (设备标识, 数据报负载)，无法识别时返回 (None, None)
+
+        payload 模式下带序号包头的数据报以包头中的 stream_id 为设备ID，负载保持完整交给会话解码
+        """
+        if self.demux == 'address':
+            return address, data
+        packet = parse_packet(data)
+        if packet is not None:
+            return packet[0], data
+        if len(data) < DEVICE_ID.size:
+            return None, None
+        return DEVICE_ID.unpack_from(data)[0], data[DEVICE_ID.size:]
+
+    def _session_for(self, key, address, now):
+        session = self.sessions.get(key)
+        if session is not None:
+            return session
+        if len(self.sessions) >= self.max_sessions:
+            return None
+        if key in self.rejected:
+            if now < self.rejected[key]:
+                return None
+            del self.rejected[key]
+        session = UDPDeviceSession(key, address, sampling_rate=self.sampling_rate, channels=self.channels)
+        for callback in self.session_created_callbacks:
+            try:
+                callback(session)
+            except Exception as e:
+                # 回调拒绝了新设备：不登记会话，丢弃该设备的数据报直到 reject_interval 之后再试
+                print(f"拒绝新设备 {session.label}: {e}")
+                self._reject(key, now)
+                return None
+        self.sessions[key] = session
+        self.stats['sessions_created'] += 1
+        print(f"新设备接入: {session.label} ({address[0]}:{address[1]})")
+        return session
+
+    def _reject(self, key, now):
+        self.rejected[key] = now + self.reject_interval
+        self.stats['sessions_rejected'] += 1
+
+    def reject_session(self, key):
+        """
+        移除设备会话（不通知 on_session_evicted 回调），reject_interval 秒内丢弃该设备的数据报；
+        用于新设备回调之后才失败的情况，例如为设备异步创建处理流水线失败
+        """
+        session = self.sessions.pop(key, None)
+        if session is not None:
+            session.close()
+            print(f"已拒绝设备会话: {session.label}")
+        self._reject(key, time.time())
+
+    def _evict(self, key):
+        session = self.sessions.pop(key, None)
+        if session is None:
+            return
+        session.close()
+        self.stats['sessions_evicted'] += 1
+        print(f"设备空闲超时，已移除会话: {session.label}")
+        for callback in self.session_evicted_callbacks:
+            try:
+                callback(session)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"会话移除回调出错: {e}")
+
+    def _evict_idle(self, now):
+        if now - self._last_eviction < self.eviction_interval:
+            return
+        self._last_eviction = now
+        for key, session in list(self.sessions.items()):
+            if now - session.last_seen > self.idle_timeout:
+                self._evict(key)
+        for key, until in list(self.rejected.items()):
+            if now >= until:
+                del self.rejected[key]
+
+    def _wait_timeout(self):
+        # 有会话的重排窗口中有等待的包时缩短等待，以便按时释放
+        for session in self.sessions.values():
+            if session.sequencer.pending:
+                return session.sequencer.max_hold
+        return self.wait_timeout
+
+    def _receive_loop(self):
+        """select 等待可读后读到 EAGAIN，同一批内每个设备的数据合并后分发一次"""
+        recv_buffer = bytearray(self.max_datagram_size)
+        recv_view = memoryview(recv_buffer)
+
+        while self.is_running:
+            try:
+                sock = self.socket
+                readable, _, _ = select.select([sock], [], [], self._wait_timeout())
+                now = time.time()
+                if readable:
+                    self._drain(getattr(sock, 'fd', sock), recv_buffer, recv_view, now)
+                else:
+                    self._flush_sessions(now)
+                self._evict_idle(now)
+                eventlet.sleep(0)
+            except (socket.error, ValueError) as e:
+                if not self.is_running:
+                    break
+                self.stats['errors'] += 1
+                print(f"UDP device server socket error: {e}")
+                eventlet.sleep(0.1)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Unexpected error in UDP device server: {e}")
+                eventlet.sleep(0.5)
+
+    def _drain(self, raw, recv_buffer, recv_view, now):
+        pending = {}
+        for _ in range(self.max_batch_datagrams):
+            try:
+                nbytes, address = raw.recvfrom_into(recv_buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            self.stats['datagrams_received'] += 1
+            self.stats['bytes_received'] += nbytes
+
+            key, payload = self._device_key(recv_view[:nbytes], address)
+            session = self._session_for(key, address, now) if key is not None else None
+            if session is None:
+                self.stats['datagrams_rejected'] += 1
+                continue
+            blocks = session._receive(payload, address, now)
+            if blocks:
+                pending.setdefault(session, []).extend(blocks)
+
+        self.stats['batches'] += 1
+        self._flush_sessions(now, pending)
+
+    def _flush_sessions(self, now, pending=None):
+        # 释放各会话重排窗口中等待超时的包，与本批数据一起分发
+        pending = pending if pending is not None else {}
+        for session in list(self.sessions.values()):
+            if session.sequencer.pending:
+                released = session.sequencer.flush(now)
+                if released:
+                    pending.setdefault(session, []).extend(released)
+        for session, blocks in pending.items():
+            session._dispatch_values(blocks, now)
+
+    def get_stats(self):
+        """返回服务器统计以及每个设备的接收速率和链路错误率"""
+        stats = dict(self.stats)
+        stats['active_sessions'] = len(self.sessions)
+        stats['rejected_devices'] = len(self.rejected)
+        stats['kernel_drops'] = read_kernel_drops(self._socket_inode)
+        stats['devices'] = {session.label: session.get_stats() for session in list(self.sessions.values())}
+        return stats
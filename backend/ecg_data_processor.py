@@ -10,7 +10,7 @@ class ECGDataProcessor:
         I, II, V1, V2, V3, V4, V5, V6 = leads
         III = II - I
         aVR = -(I + II) / 2
-        aVL = (I - II) / 2
+        aVL = (I - III) / 2
         aVF = (II + III) / 2
         return [I, II, III, aVR, aVL, aVF, V1, V2, V3, V4, V5, V6]
         
@@ -0,0 +1,90 @@
+#decimation.py
+
+import numpy as np
+
+
+class MinMaxDecimator:
+    """
+    多导联流式最小/最大值包络抽取
+    
+    按样本序号把数据划分为长度 factor 的桶（桶边界为 sample_index % factor == 0，与块边界无关），
+    每个桶输出两个点：桶内的最小值和最大值，按它们在桶内出现的先后顺序排列，
+    因此 QRS 波群等尖峰在抽取后仍然保留完整幅度。
+    输出点在时间上均匀分布，点率为 2 * 采样率 / factor。
+    
+    不足一个桶的尾部样本保留到下一块；样本序号不连续时丢弃未完成的桶并重新对齐。
+    """
+    
+    def __init__(self, factor, leads=12):
+        """
+        参数:
+            factor: 每个桶的样本数（抽取倍数）
+            leads: 导联数
+        """
+        self.factor = max(1, int(factor))
+        self.leads = leads
+        self.reset()
+    
+    def reset(self):
+        self._values = np.empty((self.leads, 0), dtype=np.float32)
+        self._times = np.empty(0, dtype=np.float64)
+        self._next_index = None  # 下一个期望的样本序号
+        self._start_index = None  # 未完成桶中第一个样本的序号
+    
+    def process(self, values, times, first_index):
+        """
+        抽取一块新数据
+        
+        参数:
+            values: (leads, n) 的导联数据
+            times: 长度为 n 的时间戳
+            first_index: 第一个样本的序号
+        
+        返回:
+            (points, point_times, first_point_index)：
+                points: (leads, 2 * m) 的 float32 包络点，全为 NaN 的桶输出 NaN
+                point_times: 长度 2 * m 的时间戳（每个桶的起点和中点）
+                first_point_index: 第一个输出点的序号（= 桶序号 * 2），没有完整的桶时为 None
+        """
+        if self.factor == 1:
+            return np.asarray(values, dtype=np.float32), np.asarray(times), first_index
+        
+        if self._next_index != first_index:
+            # 序号不连续（丢包、重新开始）：丢弃未完成的桶，从下一个桶边界开始
+            skip = (-first_index) % self.factor
+            values, times, first_index = values[:, skip:], times[skip:], first_index + skip
+            self._values = self._values[:, :0]
+            self._times = self._times[:0]
+            self._start_index = first_index
+        self._next_index = first_index + values.shape[1] if values.shape[1] else first_index
+        
+        if self._values.shape[1]:
+            values = np.concatenate((self._values, values), axis=1)
+            times = np.concatenate((self._times, times))
+        start_index = self._start_index
+        
+        buckets = values.shape[1] // self.factor
+        used = buckets * self.factor
+        self._values = values[:, used:].copy()
+        self._times = np.asarray(times[used:], dtype=np.float64).copy()
+        self._start_index = start_index + used
+        if buckets == 0:
+            return np.empty((self.leads, 0), dtype=np.float32), np.empty(0), None
+        
+        blocks = values[:, :used].reshape(self.leads, buckets, self.factor)
+        # NaN 不参与比较；全为 NaN 的桶结果为 NaN
+        low = np.fmin.reduce(blocks, axis=2)
+        high = np.fmax.reduce(blocks, axis=2)
+        low_pos = np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=2)
+        high_pos = np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=2)
+        min_first = low_pos <= high_pos
+        
+        points = np.empty((self.leads, buckets, 2), dtype=np.float32)
+        points[:, :, 0] = np.where(min_first, low, high)
+        points[:, :, 1] = np.where(min_first, high, low)
+        
+        bucket_times = np.asarray(times[:used], dtype=np.float64).reshape(buckets, self.factor)
+        point_times = np.empty((buckets, 2))
+        point_times[:, 0] = bucket_times[:, 0]
+        point_times[:, 1] = bucket_times[:, self.factor // 2]
+        return points.reshape(self.leads, 2 * buckets), point_times.reshape(-1), (start_index // self.factor) * 2
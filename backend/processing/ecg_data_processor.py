@@ -5,14 +5,111 @@ import numpy as np
 from scipy import interpolate
 #定义ECGDataProcessor类，负责计算12导联、信号预处理等功能
 
+# 输出的12导联顺序
+LEAD_NAMES = ('I', 'II', 'III', 'aVR', 'aVL', 'aVF', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6')
+
+# 默认设备通道：I, II, V1..V6（与 compute_12_leads 的输入顺序相同）
+DEFAULT_CHANNEL_MAP = ('I', 'II', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6')
+
+# 各导联在独立导联基 (I, II, V1..V6) 上的系数，与 compute_12_leads 的公式一致
+_BASIS = ('I', 'II', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6')
+_LEAD_COEFFICIENTS = {
+    'I': {'I': 1.0},
+    'II': {'II': 1.0},
+    'III': {'I': -1.0, 'II': 1.0},
+    'aVR': {'I': -0.5, 'II': -0.5},
+    'aVL': {'I': 1.0, 'II': -0.5},
+    'aVF': {'I': -0.5, 'II': 1.0},
+    **{name: {name: 1.0} for name in _BASIS[2:]}
+}
+
+
+def _lead_vector(name):
+    vector = np.zeros(len(_BASIS))
+    for base, coefficient in _LEAD_COEFFICIENTS[name].items():
+        vector[_BASIS.index(base)] = coefficient
+    return vector
+
+
+def derivation_matrix(channel_map=DEFAULT_CHANNEL_MAP):
+    """计算从设备通道到12导联的导出矩阵
+
+    参数:
+        channel_map: 每个设备通道对应的导联名（LEAD_NAMES 之一），None 表示该通道不是导联
+            （例如呼吸、帧序号），例如只有 II、III 的设备可以写成 ('II', 'III', 'V1', ...)
+
+    返回:
+        (matrix, channels, missing):
+            matrix: (len(channels), 12) 的 float32 导出矩阵
+            channels: 参与导出的设备通道下标
+            missing: 由这些通道无法导出的导联下标
+    """
+    unknown = [name for name in channel_map if name is not None and name not in _LEAD_COEFFICIENTS]
+    if unknown:
+        raise ValueError(f"不支持的导联名: {unknown}")
+    channels = [i for i, name in enumerate(channel_map) if name is not None]
+    if not channels:
+        raise ValueError("通道映射中没有导联")
+
+    # 设备通道 = 导联基 @ source.T，需要求 matrix 使 source.T @ matrix = target.T
+    source = np.array([_lead_vector(channel_map[i]) for i in channels])
+    target = np.array([_lead_vector(name) for name in LEAD_NAMES])
+    matrix, _, _, _ = np.linalg.lstsq(source.T, target.T, rcond=None)
+
+    # 目标导联不在设备通道张成的空间内时无法导出
+    residual = np.abs(source.T @ matrix - target.T).max(axis=0)
+    missing = np.flatnonzero(residual > 1e-6)
+    matrix[:, missing] = 0.0
+    matrix[np.abs(matrix) < 1e-12] = 0.0
+    return matrix.astype(np.float32), channels, missing
+
+
 class ECGDataProcessor:
+    def __init__(self, channel_map=DEFAULT_CHANNEL_MAP):
+        self.set_channel_map(channel_map)
+
+    def set_channel_map(self, channel_map):
+        """
+        设置设备通道映射，重新计算导出矩阵
+        
+        参数:
+            channel_map: 每个设备通道对应的导联名，None 表示该通道不是导联
+        """
+        self.channel_map = tuple(channel_map)
+        self.derivation_matrix, self.lead_channels, self.missing_leads = derivation_matrix(self.channel_map)
+        if len(self.missing_leads):
+            print(f"通道映射无法导出导联: {[LEAD_NAMES[i] for i in self.missing_leads]}，以 NaN 填充")
+
     def compute_12_leads(self, leads):
         I, II, V1, V2, V3, V4, V5, V6 = leads
         III = II - I
         aVR = -(I + II) / 2
-        aVL = (I - II) / 2
+        aVL = (I - III) / 2
         aVF = (II + III) / 2
         return [I, II, III, aVR, aVL, aVF, V1, V2, V3, V4, V5, V6]
+    
+    def compute_12_leads_block(self, values):
+        """
+        按块计算12导联：(n, channels) 的设备数据乘以导出矩阵
+        
+        参数:
+            values: (n, channels) 的设备数据，多于通道映射的通道被忽略
+        
+        返回:
+            (n, 12) 的 float32 数组，导联顺序见 LEAD_NAMES；缺失样本（NaN 行）仍为 NaN
+        """
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim != 2 or values.shape[1] < len(self.channel_map):
+            raise ValueError(f"设备数据通道数不足: 通道映射需要 {len(self.channel_map)} 个通道, 实际 {values.shape}")
+        if self.lead_channels == list(range(len(self.lead_channels))):
+            # 导联通道在前且连续时直接取切片，避免拷贝
+            source = values[:, :len(self.lead_channels)]
+        else:
+            source = values[:, self.lead_channels]
+        leads = source @ self.derivation_matrix
+        if len(self.missing_leads):
+            leads[:, self.missing_leads] = np.nan
+        return leads
         
     def advanced_interpolate(self, times, values, method='cubic'):
         """
@@ -0,0 +1,100 @@
+#stream_filter.py
+
+import numpy as np
+from scipy import signal as sps
+
+
+class StreamingLeadFilter:
+    """
+    多导联因果流式滤波器
+    
+    带通（Butterworth，高通截止频率同时去除基线漂移）与可选的工频陷波串联为一组二阶节，
+    对 (leads, n) 的整块数据用 sosfilt 沿时间轴一次滤波，每个导联的滤波器状态在块之间保留。
+    因此每个样本只被滤波一次，块边界处没有边缘效应，输出长度等于输入长度。
+    
+    缺失样本（NaN）以该导联最近的有效值送入滤波器，使状态保持有限，输出中对应位置仍为 NaN。
+    """
+    
+    def __init__(self, sampling_rate=500, leads=12, low_cut=0.5, high_cut=40.0, order=2, notch_freq=50.0,
+                 notch_quality=30.0):
+        """
+        参数:
+            sampling_rate: 采样率（Hz）
+            leads: 导联数
+            low_cut: 带通下限（Hz），去除基线漂移
+            high_cut: 带通上限（Hz），高于奈奎斯特频率时只做高通
+            order: Butterworth 阶数
+            notch_freq: 工频陷波频率（Hz），None 表示不做陷波
+            notch_quality: 陷波器品质因数
+        """
+        self.sampling_rate = sampling_rate
+        self.leads = leads
+        self.sos = self._design(sampling_rate, low_cut, high_cut, order, notch_freq, notch_quality)
+        # 单位阶跃输入的稳态状态，首块按各导联首个样本缩放，避免启动瞬态
+        self._zi_unit = sps.sosfilt_zi(self.sos)
+        self.reset()
+    
+    @staticmethod
+    def _design(sampling_rate, low_cut, high_cut, order, notch_freq, notch_quality):
+        nyquist = sampling_rate / 2.0
+        if high_cut is not None and high_cut < nyquist:
+            sos = sps.butter(order, [low_cut, high_cut], btype='bandpass', fs=sampling_rate, output='sos')
+        else:
+            sos = sps.butter(order, low_cut, btype='highpass', fs=sampling_rate, output='sos')
+        if notch_freq is not None and notch_freq < nyquist:
+            b, a = sps.iirnotch(notch_freq, notch_quality, fs=sampling_rate)
+            sos = np.vstack([sos, sps.tf2sos(b, a)])
+        return sos
+    
+    def reset(self):
+        """清除滤波器状态（数据源切换或时间轴不连续时调用）"""
+        self.zi = None
+        self.last_valid = np.zeros(self.leads)
+        self.samples_processed = 0
+    
+    def _fill_missing(self, block, missing):
+        # 每个导联的缺失样本用其前面最近的有效值（块首缺失时用上一块的最后有效值）代替
+        n = block.shape[1]
+        index = np.where(missing, -1, np.arange(n))
+        index = np.maximum.accumulate(index, axis=1)
+        filled = np.take_along_axis(block, np.maximum(index, 0), axis=1)
+        return np.where(index < 0, self.last_valid[:, None], filled)
+    
+    def process(self, block):
+        """
+        滤波一块新数据
+        
+        参数:
+            block: (leads, n) 的导联数据
+        
+        返回:
+            (leads, n) 的 float32 滤波输出，缺失样本位置为 NaN
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.shape[1] == 0:
+            return block.astype(np.float32)
+        
+        missing = np.isnan(block)
+        has_missing = missing.any()
+        if has_missing:
+            if self.zi is None and missing.all():
+                # 还没有任何有效样本，无法初始化状态
+                return np.full(block.shape, np.nan, dtype=np.float32)
+            if self.zi is None:
+                # 以各导联第一个有效样本作为初始值
+                first = np.argmax(~missing, axis=1)
+                self.last_valid = np.nan_to_num(block[np.arange(self.leads), first])
+            block = self._fill_missing(block, missing)
+        
+        if self.zi is None:
+            # zi 形状 (sections, leads, 2)
+            self.zi = self._zi_unit[:, None, :] * block[:, 0][None, :, None]
+        
+        output, self.zi = sps.sosfilt(self.sos, block, axis=1, zi=self.zi)
+        self.last_valid = block[:, -1].copy()
+        self.samples_processed += block.shape[1]
+        
+        output = output.astype(np.float32)
+        if has_missing:
+            output[missing] = np.nan
+        return output
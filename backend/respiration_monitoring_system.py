@@ -5,11 +5,12 @@ import numpy as np
 from .respiration_udp_receiver import RespirationUDPReceiver
 from .respiration_processor import RespirationProcessor
 from .data_storage import DataStorage
+from .services.stream_service import emit_session_event
 
 class RespirationMonitoringSystem:
     """呼吸波形数据监测系统"""
     
-    def __init__(self, socketio, host='127.0.0.1', port=1347, sampling_rate=100):
+    def __init__(self, socketio, host='127.0.0.1', port=1347, sampling_rate=100, session_id=None):
         """初始化呼吸波形数据监测系统
         
         Args:
@@ -17,20 +18,27 @@ class RespirationMonitoringSystem:
             host: UDPu670du52a1u5668u4e3bu673au5730u5740
             port: UDPu670du52a1u5668u7aefu53e3
             sampling_rate: u547cu5438u6ce2u5f62u91c7u6837u7387
+            session_id: 呼吸数据所属的监测会话ID（同一患者的 ECG 会话），respiration_data 只发送到该会话的房间；
+                None 表示主监测会话，ECG 管理器未初始化时广播给所有客户端
         """
         self.socketio = socketio
-        self.udp_receiver = RespirationUDPReceiver(host, port)
-        self.udp_receiver.register_callback(self.handle_new_data)
+        self.session_id = session_id
+        self.udp_receiver = RespirationUDPReceiver(host, port, sampling_rate=sampling_rate)
+        self.udp_receiver.register_block_callback(self.handle_new_block)
         self.processor = RespirationProcessor(sampling_rate=sampling_rate)
         
         # u521du59cbu5316u6570u636eu5b58u50a8
         self.data_storage = DataStorage()
         self.storage_key = 'respiration'
         
-        # 初始化数据累积
-        self.accumulated_data = []  # u5b58u50a8 (timestamp, value) u5bf9
+        # 初始化数据累积：所有通道保存在预分配的数组中，保留最近 max_length 个样本
         self.sample_counter = 0
         self.max_samples = 500  # u6bcfu6b21u53d1u9001u7684u6570u636eu70b9u6570u91cf
+        self.max_length = self.max_samples * 10
+        self.respiration_channel = 0  # 作为呼吸信号分析和显示的通道
+        self._times = None      # (2 * max_length,) 时间戳
+        self._values = None     # (2 * max_length, channels) 各通道样本
+        self._length = 0        # 已写入的样本数
         self.start_timestamp = None
         self.end_timestamp = None
     
@@ -39,7 +47,7 @@ class RespirationMonitoringSystem:
         print("RespirationMonitoringSystem starting...")
         self.start_timestamp = time.time()
         # u91cdu7f6eu6570u636e
-        self.accumulated_data = []
+        self._reset_buffer()
         self.sample_counter = 0
         # u542fu52a8UDPu63a5u6536u5668
         success = self.udp_receiver.start()
@@ -58,9 +66,8 @@ class RespirationMonitoringSystem:
         self.udp_receiver.stop()
         
         # u5982u679cu6709u6570u636euff0cu4fddu5b58u5230u6587u4ef6
-        if len(self.accumulated_data) > 0:
-            times, values = zip(*self.accumulated_data)
-            np_values = np.array(values)
+        if self._length > 0:
+            np_values = self.channel_data.copy()
             # u4fddu5b58u6570u636e
             self.data_storage.save_data('respiration', np_values, 
                                        self.start_timestamp, 
@@ -70,44 +77,107 @@ class RespirationMonitoringSystem:
         return True
     
     def handle_new_data(self, values, timestamp):
-        """u5904u7406u65b0u63a5u6536u5230u7684u547cu5438u6570u636e
+        """处理单个呼吸样本，适配到块接口
         
         Args:
-            values: u89e3u6790u540eu7684u6d6eu70b9u6570u503cu5217u8868
-            timestamp: u6570u636eu63a5u6536u65f6u95f4u6233
+            values: 解析后的浮点数值列表
+            timestamp: 数据接收时间戳
         """
-        # u5982u679cu6709u591au4e2au901au9053uff0cu6211u4eecu53eau53d6u7b2cu4e00u4e2au4f5cu4e3au547cu5438u4fe1u53f7
-        # u8fd9u91ccu53efu4ee5u6839u636eu5b9eu9645u60c5u51b5u4feeu6539
         if len(values) > 0:
-            respiration_value = values[0]
-            
-            # u5c06u65b0u6570u636eu6dfbu52a0u5230u7d2fu79efu6570u636eu4e2d
-            self.accumulated_data.append((timestamp, respiration_value))
-            self.sample_counter += 1
-            
-            # u5f53u79efu7d2fu4e86u8db3u591fu7684u6570u636eu70b9u540eu8fdbu884cu5904u7406u548cu53d1u9001
-            if self.sample_counter >= self.max_samples:
-                self.process_and_send_data()
-                self.sample_counter = 0
+            self.handle_new_block(np.asarray([values], dtype=np.float32), np.array([timestamp]))
+    
+    def handle_new_block(self, values, timestamps):
+        """处理一块新接收到的呼吸数据
+        
+        Args:
+            values: (n, channels) 的浮点数组
+            timestamps: 长度为 n 的时间戳数组
+        """
+        if len(values) == 0 or values.shape[1] == 0:
+            return
+        
+        # 保留所有通道，分析和显示使用 respiration_channel
+        self._append(values, timestamps)
+        self.sample_counter += len(values)
+        
+        # 当积累了足够的数据点后进行处理和发送
+        if self.sample_counter >= self.max_samples:
+            self.process_and_send_data()
+            self.sample_counter = 0
+    
+    def _reset_buffer(self):
+        self._times = None
+        self._values = None
+        self._length = 0
+    
+    def _append(self, values, timestamps):
+        """把一块样本追加到累积数组
+        
+        数组容量为 2 * max_length，写满时把最近 max_length 个样本移到开头，
+        每个样本平均只拷贝常数次，不随块大小和块数增长。
+        """
+        channels = values.shape[1]
+        if self._values is None or self._values.shape[1] != channels:
+            # 首块或通道数变化（设备更换）时重新分配
+            self._times = np.zeros(2 * self.max_length, dtype=np.float64)
+            self._values = np.zeros((2 * self.max_length, channels), dtype=np.float32)
+            self._length = 0
+        
+        if len(values) > self.max_length:
+            values, timestamps = values[-self.max_length:], timestamps[-self.max_length:]
+        n = len(values)
+        if self._length + n > len(self._times):
+            keep = self.max_length - n
+            self._times[:keep] = self._times[self._length - keep:self._length]
+            self._values[:keep] = self._values[self._length - keep:self._length]
+            self._length = keep
+        self._times[self._length:self._length + n] = timestamps
+        self._values[self._length:self._length + n] = values
+        self._length += n
+    
+    @property
+    def time_stamps(self):
+        """最近 max_length 个样本的时间戳数组"""
+        if self._times is None:
+            return np.empty(0, dtype=np.float64)
+        return self._times[max(0, self._length - self.max_length):self._length]
+    
+    @property
+    def channel_data(self):
+        """最近 max_length 个样本的 (n, channels) 数组"""
+        if self._values is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._values[max(0, self._length - self.max_length):self._length]
+    
+    @property
+    def accumulated_data(self):
+        """呼吸通道的累积信号（一维数组）"""
+        data = self.channel_data
+        if data.shape[1] <= self.respiration_channel:
+            return np.empty(0, dtype=np.float32)
+        return data[:, self.respiration_channel]
+    
+    @staticmethod
+    def _to_json_list(values):
+        # NaN（丢包填补的样本）转换为 None，前端显示为断点
+        values = np.asarray(values, dtype=np.float64)
+        return np.where(np.isnan(values), None, values).tolist()
     
     def process_and_send_data(self):
         """u5904u7406u5e76u53d1u9001u6570u636eu5230u524du7aef"""
         if len(self.accumulated_data) >= 20:  # u786eu4fddu6709u8db3u591fu7684u6570u636eu8fdbu884cu5904u7406
             # u83b7u53d6u6700u65b0u7684 max_samples u4e2au6570u636eu70b9
-            recent_data = self.accumulated_data[-self.max_samples:]
-            times, values = zip(*recent_data)
-            
-            # u5c06u65f6u95f4u548cu503cu8f6cu6362u4e3au5217u8868
-            times_list = list(times)
-            values_list = list(values)
+            times_list = self.time_stamps[-self.max_samples:].tolist()
+            recent_channels = self.channel_data[-self.max_samples:]
+            values_list = recent_channels[:, self.respiration_channel].tolist()
             
             # u9884u5904u7406u6570u636e
             try:
                 cleaned_signal = self.processor.preprocess(values_list)
-                processed_values = cleaned_signal.tolist()
+                processed_values = self._to_json_list(cleaned_signal)
             except Exception as e:
                 print(f"Error preprocessing respiration data: {e}")
-                processed_values = values_list
+                processed_values = self._to_json_list(values_list)
             
             # u8ba1u7b97u547cu5438u7387uff08u5982u679cu6709u8db3u591fu6570u636euff09
             try:
@@ -118,17 +188,23 @@ class RespirationMonitoringSystem:
                 respiration_rate = None
             
             # u53d1u9001u6570u636eu5230u524du7aef
-            self.socketio.emit('respiration_data', {
+            emit_session_event(self.socketio, self._target_session(), 'respiration_data', {
                 'values': processed_values,
                 'time_stamps': times_list,
-                'respiration_rate': respiration_rate
+                'respiration_rate': respiration_rate,
+                # 所有通道的原始数据，按通道排列
+                'channels': [self._to_json_list(channel) for channel in recent_channels.T]
             })
             print(f"Respiration data emitted to frontend with {len(processed_values)} samples")
-            
-            # u4fddu6301u7d2fu8ba1u6570u636eu7684u957fu5ea6uff0cu9632u6b62u5185u5b58u5360u7528u8fc7u5927
-            max_length = self.max_samples * 10  # u4fddu7559u6700u65b0u7684u6570u636e
-            if len(self.accumulated_data) > max_length:
-                self.accumulated_data = self.accumulated_data[-max_length:]
+
+    
+    def _target_session(self):
+        # 未指定会话时发送到主监测会话的房间，导入放在函数内部避免循环导入
+        if self.session_id is not None:
+            return self.session_id
+        from .services.ecg_manager import get_ecg_system
+        system = get_ecg_system()
+        return system.session_id if system is not None else None
     
     def analyze_respiration(self, data=None):
         """u5206u6790u547cu5438u6570u636eu5e76u8fd4u56deu7ed3u679c
@@ -144,8 +220,7 @@ class RespirationMonitoringSystem:
             if len(self.accumulated_data) < 100:
                 return {"error": "u6570u636eu4e0du8db3uff0cu65e0u6cd5u5206u6790"}
             
-            _, values = zip(*self.accumulated_data[-500:])  # u53d6u6700u8fd1500u4e2au6570u636eu70b9
-            data = np.array(values)
+            data = self.accumulated_data[-500:].copy()  # u53d6u6700u8fd1500u4e2au6570u636eu70b9
         
         # u7528u5904u7406u5668u5206u6790u547cu5438u6570u636e
         try:
@@ -168,7 +243,15 @@ class RespirationMonitoringSystem:
             return [], []
         
         # u83b7u53d6u6700u65b0u7684n_samplesu4e2au6570u636eu70b9
-        recent_data = self.accumulated_data[-n_samples:]
-        times, values = zip(*recent_data)
+        return self.time_stamps[-n_samples:].tolist(), self.accumulated_data[-n_samples:].tolist()
+    
+    def get_latest_block(self, n_samples=500):
+        """获取所有通道最新的数据
         
-        return list(times), list(values)
+        Args:
+            n_samples: 要返回的样本数
+            
+        Returns:
+            tuple: (timestamps[n], values[n, channels]) 数组拷贝
+        """
+        return self.time_stamps[-n_samples:].copy(), self.channel_data[-n_samples:].copy()
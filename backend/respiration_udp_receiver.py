@@ -1,43 +1,86 @@
 # respiration_udp_receiver.py
 
+import os
+import select
 import socket
-import struct
 import time
-import threading
 import eventlet
+import numpy as np
 
 eventlet.monkey_patch()
 
-class RespirationUDPReceiver:
-    """接收呼吸波形数据的UDP接收器，适用于VOFA+的Firewater格式"""
+from .devices.block_callbacks import BlockCallbackMixin
+from .devices.firewater import FirewaterDecoder
+from .devices.packet_format import PacketSequencer, decode_datagram
+from .devices.sample_clock import SampleClock
+from .devices.udp_reader import read_kernel_drops
+
+class RespirationUDPReceiver(BlockCallbackMixin):
+    """接收呼吸波形数据的UDP接收器，适用于VOFA+的Firewater格式
+
+    只有一个接收绿线程读取套接字：select 等待可读后一直读到 EAGAIN，
+    整批数据报由 numpy 解码为 (n, channels) 的块，所有通道一次分发给块回调。
+    """
     
-    def __init__(self, host='127.0.0.1', port=1347):
+    def __init__(self, host='127.0.0.1', port=1347, sampling_rate=100):
         """初始化UDP接收器
         
         Args:
             host: UDP服务器主机地址
             port: UDP服务器端口
+            sampling_rate: 标称采样率，用于采样时钟模型
         """
         self.host = host
         self.port = port
         self.sock = None
         self.is_running = False
-        self.callbacks = []
-        self.buffer = bytearray()
-        # Firewater格式的帧尾标识
-        self.FRAME_TAIL = b'\x00\x00\x80\x7F'
+        self.callbacks = []          # 逐样本回调 (values, timestamp)
+        self.block_callbacks = []    # 块回调 (values[n, channels], timestamps[n])
+        # Firewater帧解码器，通道数由前两个帧尾之间的距离自动确定
+        self.decoder = FirewaterDecoder(channels=None)
+        # 带序号包头的数据报经重排窗口恢复顺序，丢失的包以 NaN 填补
+        self.sequencer = PacketSequencer()
+        # 采样时钟模型：样本序号到墙钟时间的漂移校正线性拟合
+        self.sample_clock = SampleClock(nominal_rate=sampling_rate)
+        
+        # 接收参数，与 UDPReader 相同
+        self.recv_buffer_size = 1024 * 1024      # 请求的内核接收缓冲区（SO_RCVBUF）字节数，None 表示系统默认
+        self.max_datagram_size = 65536           # 预分配接收缓冲区大小
+        self.max_batch_datagrams = 1024          # 单批最多读取的数据报数，之后让出控制权
+        self.wait_timeout = 0.5                  # select 等待超时（秒），用于检查停止标志
+        self._socket_inode = None
+        self._consumer = None
+        
+        self.stats = {
+            'datagrams_received': 0,
+            'bytes_received': 0,
+            'frames_processed': 0,
+            'batches': 0,
+            'errors': 0
+        }
         
     def start(self):
-        """启动UDP接收器"""
+        """启动UDP接收器（重复调用无副作用）"""
+        if self.is_running:
+            return True
         try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.sock.bind((self.host, self.port))
-            self.sock.settimeout(0.5) # 设置超时，便于优雅退出
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.recv_buffer_size:
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+                except OSError as e:
+                    print(f"设置SO_RCVBUF失败: {e}")
+            # 非阻塞：接收循环用 select 等待可读，然后一直读到 EAGAIN
+            sock.setblocking(False)
+            sock.bind((self.host, self.port))
+            self._socket_inode = os.fstat(sock.fileno()).st_ino
+            self.sock = sock
             self.is_running = True
-            # 使用Eventlet的绿线程
-            eventlet.spawn(self.receive_data)
-            # 同时使用传统线程作为备份
-            threading.Thread(target=self.receive_data, daemon=True).start()
+            self.sample_clock.reset()
+            self.decoder.reset()
+            self.sequencer.reset()
+            # 单个接收绿线程，解码器、重排窗口和采样时钟只被它访问
+            self._consumer = eventlet.spawn(self.receive_data)
             print(f"UDP receiver started on {self.host}:{self.port}")
             return True
         except Exception as e:
@@ -45,52 +88,83 @@ class RespirationUDPReceiver:
             return False
     
     def stop(self):
-        """停止UDP接收器"""
+        """停止UDP接收器，等待接收绿线程退出"""
         self.is_running = False
+        consumer, self._consumer = self._consumer, None
+        if consumer is not None and consumer is not eventlet.getcurrent():
+            consumer.wait()
         if self.sock:
             self.sock.close()
             self.sock = None
         print("UDP receiver stopped")
     
     def receive_data(self):
-        """接收UDP数据的主循环"""
+        """接收循环：select 等待可读后用 recvfrom_into 读到 EAGAIN，整批解码后只分发一次"""
+        recv_buffer = bytearray(self.max_datagram_size)
+        recv_view = memoryview(recv_buffer)
+        
         while self.is_running and self.sock:
             try:
-                data, addr = self.sock.recvfrom(4096)
-                if data:
-                    self.buffer.extend(data)
-                    self._parse_frames()
-                eventlet.sleep(0)  # 让出控制权
-            except socket.timeout:
-                # 超时是正常的，继续循环
-                pass
+                sock = self.sock
+                # 重排窗口中有等待的包时缩短等待，以便按时释放
+                timeout = self.sequencer.max_hold if self.sequencer.pending else self.wait_timeout
+                readable, _, _ = select.select([sock], [], [], timeout)
+                now = time.time()
+                if not readable:
+                    self._dispatch_released(self.sequencer.flush(now), now)
+                    continue
+                
+                # 已确认可读且套接字为非阻塞，直接在底层套接字上读取
+                raw = getattr(sock, 'fd', sock)
+                blocks = []
+                for _ in range(self.max_batch_datagrams):
+                    try:
+                        nbytes, addr = raw.recvfrom_into(recv_buffer)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    self.stats['datagrams_received'] += 1
+                    self.stats['bytes_received'] += nbytes
+                    if nbytes:
+                        blocks.extend(self._parse_frames(recv_view[:nbytes], now))
+                
+                self.stats['batches'] += 1
+                self._dispatch_released(blocks + self.sequencer.flush(now), now)
+                eventlet.sleep(0)  # 一批读完后让出控制权
+            except (socket.error, ValueError) as e:
+                if not self.is_running:
+                    break
+                self.stats['errors'] += 1
+                print(f"Error receiving UDP data: {e}")
+                eventlet.sleep(0.1)
             except Exception as e:
+                self.stats['errors'] += 1
                 print(f"Error receiving UDP data: {e}")
                 if not self.is_running:
                     break
+                eventlet.sleep(0.5)
     
-    def _parse_frames(self):
-        """解析Firewater格式的数据帧"""
-        while True:
-            tail_index = self.buffer.find(self.FRAME_TAIL)
-            if tail_index != -1:
-                frame_end = tail_index + len(self.FRAME_TAIL)
-                if tail_index > 0:
-                    frame_data = self.buffer[:tail_index]
-                    try:
-                        # 获取当前时间戳
-                        current_time = time.time()
-                        # 解析浮点数据
-                        values = self.parse_frame(frame_data)
-                        # 调用回调函数，传递解析后的值和时间戳
-                        for callback in self.callbacks:
-                            callback(values, current_time)
-                    except Exception as e:
-                        print(f"Error parsing frame: {e}")
-                # 移除已处理的数据
-                self.buffer = self.buffer[frame_end:]
-            else:
-                break
+    def _parse_frames(self, data, now=None):
+        """解码一个数据报中的Firewater帧（可带序号包头），返回 [(first_index, values), ...]"""
+        try:
+            return decode_datagram(self.decoder, self.sequencer, data, now or time.time())
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Error parsing frame: {e}")
+            return []
+    
+    def _dispatch_released(self, blocks, now):
+        # 由采样时钟模型计算整块时间戳，带序号的块按设备样本序号计算
+        if blocks:
+            self.stats['frames_processed'] += self._dispatch_decoded(blocks, now)
+    
+    def get_stats(self):
+        """返回接收统计、链路质量、丢包乱序统计以及采样时钟的抖动与漂移统计"""
+        stats = dict(self.stats)
+        stats['kernel_drops'] = read_kernel_drops(self._socket_inode)
+        stats['link'] = self.decoder.get_stats()
+        stats['packets'] = self.sequencer.get_stats()
+        stats['clock'] = self.sample_clock.get_stats()
+        return stats
     
     def parse_frame(self, data):
         """解析Firewater格式的数据帧内容
@@ -101,24 +175,7 @@ class RespirationUDPReceiver:
         Returns:
             list: 解析出的浮点数值列表
         """
-        # 确保数据长度是4的倍数（每个浮点数占4字节）
         if len(data) % 4 != 0:
             raise ValueError(f"Invalid frame length: {len(data)}")
-        
-        values = []
-        # 每4个字节解析一个浮点数
-        for i in range(0, len(data), 4):
-            if i + 4 <= len(data):
-                bytes_ = data[i:i+4]
-                value = struct.unpack('<f', bytes_)[0]  # 小端格式浮点数
-                values.append(value)
-        
-        return values
-    
-    def register_callback(self, callback):
-        """注册数据回调函数
-        
-        Args:
-            callback: 回调函数，接收参数(values, timestamp)
-        """
-        self.callbacks.append(callback)
+        # 小端 float32，一次转换整帧
+        return np.frombuffer(data, dtype='<f4').tolist()
@@ -1,36 +1,256 @@
 # ecg_manager.py
 
 """
-管理ECG监控系统的单例模块
-这个模块提供了一个全局的ECG监控系统实例，避免循环导入问题
+管理ECG监控会话的模块
+每个监测会话是一个 ECGMonitoringSystem，按会话ID登记在注册表中，一个服务器可以同时监测多个患者。
+所有会话共用一个 SessionExecutor 处理线程池（导联计算、滤波和分析任务），线程数不随会话数增加。
+get_ecg_system() 不带参数时返回主会话（延迟创建），兼容只监测一个患者的接口。
+串口会话共用一个 SerialAcquisitionManager 复用读取线程（serial_multiplex=True 时），
+读取线程数不随串口数增加。
+process_shards 大于 0 时新建的会话放到工作进程中采集和滤波（见 process_shards），
+主会话和分片不可用时创建的会话仍在 web 进程中处理。
+udp_server_port 非 0 时启动单端口多设备 UDP 服务器（见 UDPDeviceServer），每个新接入的设备
+自动创建一个监测会话并开始监测，设备空闲超时后会话被移除；会话的创建和移除在绿线程中进行，
+不阻塞服务器接收其他设备的数据。
+这个模块避免了循环导入问题
 """
 
-# 全局变量，用于存储ECG监控系统实例
-_ecg_system = None
+import threading
+
+import eventlet
+
+from .session_executor import SessionExecutor
+
+# 全局变量
 _socketio = None
+_executor = None
+_shards = None        # ShardManager，未启用分片时为 None
+_acquisition = None   # SerialAcquisitionManager，未启用串口复用时为 None
+_udp_server = None    # UDPDeviceServer，未启用时为 None
+_device_sessions = {} # UDP 设备标识 -> 会话ID（None 表示会话正在创建）
+_sessions = {}        # 会话ID -> ECGMonitoringSystem
+_primary_id = None    # 主会话ID
+_max_sessions = 64
+_lock = threading.Lock()
 
-def init(socketio_instance):
+def init(socketio_instance, max_workers=4, max_sessions=64, process_shards=0, serial_multiplex=True,
+         udp_server_port=0, udp_server_ip='0.0.0.0', udp_demux='address'):
     """
     初始化ECG管理器
-    
+
     Args:
         socketio_instance: SocketIO实例
+        max_workers: 会话共用的处理线程数
+        max_sessions: 最多同时存在的会话数
+        process_shards: 处理分片（工作进程）数，0 表示单进程模式
+        serial_multiplex: 串口会话是否共用一个复用读取线程
+        udp_server_port: 多设备 UDP 服务器端口，0 表示不启动
+        udp_server_ip: 多设备 UDP 服务器绑定地址
+        udp_demux: 设备区分方式，'address' 按来源地址，'payload' 按数据报中的设备ID
     """
-    global _socketio
+    global _socketio, _executor, _max_sessions, _shards, _acquisition, _udp_server
     _socketio = socketio_instance
+    _executor = SessionExecutor(max_workers=max_workers)
+    _max_sessions = max_sessions
+    _acquisition = None
+    if serial_multiplex:
+        # 复用线程在第一个串口开始读取时才启动
+        from ..devices.serial_multiplexer import SerialAcquisitionManager
+        _acquisition = SerialAcquisitionManager()
+    _shards = None
+    if process_shards > 0:
+        try:
+            from .process_shards import ShardManager
+            _shards = ShardManager(shards=process_shards)
+            _shards.start()
+        except Exception as e:
+            print(f"启动处理分片失败，使用单进程模式: {e}")
+            _shards = None
+    _udp_server = None
+    _device_sessions.clear()
+    if udp_server_port:
+        try:
+            from ..devices.udp_server import UDPDeviceServer
+            _udp_server = UDPDeviceServer(local_ip=udp_server_ip, local_port=udp_server_port, demux=udp_demux,
+                                          max_sessions=max_sessions)
+            _udp_server.on_session_created(_on_device_connected)
+            _udp_server.on_session_evicted(_on_device_evicted)
+            _udp_server.start()
+        except Exception as e:
+            print(f"启动多设备UDP服务器失败: {e}")
+            _udp_server = None
+
+def _on_device_connected(device):
+    """
+    新设备接入（在服务器接收线程中调用）：会话数已达上限时抛出 RuntimeError，服务器拒绝该设备；
+    否则在绿线程中创建会话、连接并开始监测
+    """
+    with _lock:
+        starting = sum(1 for session_id in _device_sessions.values() if session_id is None)
+        if len(_sessions) + starting >= _max_sessions:
+            raise RuntimeError(f"会话数已达上限 {_max_sessions}")
+    _device_sessions[device.device_key] = None
+    eventlet.spawn(_start_device_session, device)
 
-def get_ecg_system():
+def _start_device_session(device):
+    """
+    为新设备创建单进程会话（设备会话的解码在服务器接收线程中完成，不能放到分片），连接并开始监测；
+    创建失败时服务器拒绝该设备
+    """
+    key = device.device_key
+    try:
+        system = create_session(sharded=False)
+    except Exception as e:
+        print(f"为设备 {device.label} 创建监测会话失败: {e}")
+        _device_sessions.pop(key, None)
+        if _udp_server is not None:
+            _udp_server.reject_session(key)
+        return
+    if _udp_server is None or _udp_server.sessions.get(key) is not device:
+        # 创建期间设备已被移除
+        stop_session(system.session_id)
+        return
+    _device_sessions[key] = system.session_id
+    system.connect_source(device, source_type='udp')
+    system.start_monitoring()
+
+def _on_device_evicted(device):
+    """
+    设备空闲超时（在服务器接收线程中调用）：在绿线程中停止并移除对应的会话，
+    停止时的推送/存储收尾和记录保存不阻塞数据接收
+    """
+    session_id = _device_sessions.pop(device.device_key, None)
+    if session_id is not None:
+        eventlet.spawn(stop_session, session_id)
+
+def get_executor():
+    """
+    获取会话共用的处理线程池
     """
-    获取ECG监控系统实例（延迟初始化）
-    
+    return _executor
+
+def get_acquisition_manager():
+    """
+    获取串口会话共用的复用采集管理器，未启用串口复用时为 None
+    """
+    return _acquisition
+
+def get_udp_server():
+    """
+    获取多设备UDP服务器，未启用时为 None
+    """
+    return _udp_server
+
+def get_shard_manager():
+    """
+    获取处理分片管理器，未启用分片时为 None
+    """
+    return _shards
+
+def create_session(patient_id=None, sharded=None):
+    """
+    创建并登记一个新的监测会话
+
+    Args:
+        patient_id: 可选的患者ID
+        sharded: 是否放到处理分片中，None 表示启用了分片时放到分片中；
+            分片不可用时创建单进程会话
+
     Returns:
         ECGMonitoringSystem实例
     """
-    global _ecg_system, _socketio
-    
-    if _ecg_system is None and _socketio is not None:
-        # 导入放在函数内部避免循环导入
-        from .monitoring_service import ECGMonitoringSystem
-        _ecg_system = ECGMonitoringSystem(_socketio)
-        
-    return _ecg_system
+    if _socketio is None:
+        raise RuntimeError("ECG管理器未初始化")
+    # 导入放在函数内部避免循环导入
+    from .monitoring_service import ECGMonitoringSystem
+    with _lock:
+        if len(_sessions) >= _max_sessions:
+            raise RuntimeError(f"会话数已达上限 {_max_sessions}")
+        system = None
+        if _shards is not None and sharded is not False:
+            try:
+                system = _shards.create_session(_socketio, executor=_executor)
+            except Exception as e:
+                print(f"创建分片会话失败，使用单进程会话: {e}")
+        if system is None:
+            system = ECGMonitoringSystem(_socketio, executor=_executor)
+        _sessions[system.session_id] = system
+    if patient_id:
+        system.set_patient_id(patient_id)
+    print(f"已创建监测会话: {system.session_id}")
+    return system
+
+def get_ecg_system(session_id=None):
+    """
+    获取监测会话
+
+    Args:
+        session_id: 会话ID，为 None 时返回主会话（首次调用时创建）
+
+    Returns:
+        ECGMonitoringSystem实例；会话不存在时返回 None
+    """
+    global _primary_id
+
+    if session_id is not None:
+        return _sessions.get(session_id)
+
+    if _primary_id is None and _socketio is not None:
+        with _lock:
+            if _primary_id is None:
+                from .monitoring_service import ECGMonitoringSystem
+                system = ECGMonitoringSystem(_socketio, executor=_executor)
+                _sessions[system.session_id] = system
+                _primary_id = system.session_id
+
+    return _sessions.get(_primary_id) if _primary_id else None
+
+def list_sessions():
+    """
+    列出所有会话的状态
+
+    Returns:
+        list: 每个会话的ID、患者、数据源、是否正在监测、推送次数和端到端延迟
+    """
+    with _lock:
+        systems = list(_sessions.values())
+    return [session_info(system) for system in systems]
+
+def session_info(system):
+    """
+    返回一个会话的状态摘要
+    """
+    latency = system.latency_stats['oldest'].get_stats()
+    return {
+        'session_id': system.session_id,
+        'primary': system.session_id == _primary_id,
+        'shard': system.shard.shard_id if hasattr(system, 'shard') else None,
+        'patient_id': system.patient_id,
+        'data_source_type': system.data_source_type,
+        'monitoring': system.processing_running,
+        'start_timestamp': system.start_timestamp,
+        'emit_events': system.emit_stats['events'],
+        'emit_samples': system.emit_stats['samples'],
+        'latency_p95': latency.get('p95')
+    }
+
+def stop_session(session_id):
+    """
+    停止一个会话并断开其数据源；主会话停止后保留在注册表中，其他会话被移除并释放记录临时文件（分片会话同时释放共享内存）
+
+    Args:
+        session_id: 会话ID
+
+    Returns:
+        bool: 会话是否存在
+    """
+    system = _sessions.get(session_id)
+    if system is None:
+        return False
+    system.disconnect()
+    if session_id != _primary_id:
+        with _lock:
+            _sessions.pop(session_id, None)
+        system.close()
+        print(f"已移除监测会话: {session_id}")
+    return True
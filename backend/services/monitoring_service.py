@@ -2,27 +2,66 @@
 
 import time
 import uuid
+import threading
 from datetime import datetime
 from ..processing.ecg_data_processor import ECGDataProcessor
+from ..processing.stream_filter import StreamingLeadFilter
 from ..devices.serial_reader import SerialPortReader
 from ..data.data_storage import DataStorage  # 导入DataStorage
 from ..data.database_manager import database_manager  # 导入数据库管理器
+from ..utils.ecg_wire import WIRE_FORMATS
+from .stream_service import build_ecg_payload, emit_session_event, get_stream_service
+from ..utils.pipeline_stage import LatencyStats, PipelineStage
+from ..utils.ring_buffer import LeadRingBuffer, SampleRingBuffer
 import numpy as np  # 导入 NumPy
 
 class ECGMonitoringSystem:
-    def __init__(self, socketio):
+    # 能否接入本进程中的数据源（文件回放、connect_source 传入的数据源对象）
+    local_sources = True
+    
+    def __init__(self, socketio, executor=None):
+        """
+        参数:
+            socketio: SocketIO实例
+            executor: 可选的 SessionExecutor，多个会话共用其处理线程池；为 None 时使用自己的处理线程
+        """
         self.socketio = socketio
+        self.executor = executor
         self.data_processor = ECGDataProcessor()
         self.data_storage = DataStorage()  # 实例DataStorage
-        self.accumulated_data = {i: [] for i in range(12)}  # 存储12个导联的数据，包含 (timestamp, value)
         
         # 会话和患者相关字段
         self.session_id = str(uuid.uuid4())  # 生成唯一会话ID
         self.patient_id = None  # 当前患者ID，可以通过set_patient_id方法设置
         self.sample_counter = 0  # 数据计数器
         
-        # 降低批处理大小，提高数据发送频率
-        self.max_samples = 200   # 每次发送的数据点数量，从500降低到200
+        # 推送策略：按延迟目标定时推送，与设备采样率无关；累积到 max_samples 个样本时立即推送
+        self.latency_target = 0.04   # 新样本最长等待推送的时间（秒）
+        self.max_samples = 200       # 每次推送的最大样本数
+        self.pending_since = None    # 第一个未推送样本进入处理阶段的时间
+        self.flush_stats = {
+            'timer': 0,   # 达到延迟目标
+            'size': 0,    # 达到最大样本数
+            'final': 0    # 停止监测时推送剩余样本
+        }
+        # 端到端延迟：样本时间戳（采样时钟按到达时间校准）到推送完成
+        # oldest 为每次推送中最早样本的延迟（含等待推送的时间），newest 为最新样本的延迟
+        self.latency_stats = {'oldest': LatencyStats(), 'newest': LatencyStats()}
+        
+        # 滤波器、12导联缓冲区和输入环形缓冲区由 _create_buffers 分配
+        self.sampling_rate = 500
+        self._create_buffers()
+        self.emitted_count = 0  # 已推送到前端的样本数（lead_buffer.write_count 的位置）
+        
+        # 增量推送：每个 ecg_data 事件只包含上次推送之后的样本，并带有事件序号和首个样本序号，
+        # 前端据此检测缺口并拼接
+        self.emit_seq = 0
+        self.wire_format = 'json'  # 'json'，或二进制负载 'int16' / 'float32'（见 utils.ecg_wire）
+        self.emit_stats = {
+            'events': 0,
+            'samples': 0,
+            'samples_skipped': 0  # 推送跟不上、已被环形缓冲区覆盖而未推送的样本
+        }
         
         # 数据处理参数
         self.interpolation_method = 'cubic'  # 插值方法：'linear', 'cubic', 'akima'
@@ -32,6 +71,21 @@ class ECGMonitoringSystem:
         # 数据缓冲参数
         self.buffer_multiplier = 5          # 缓冲区大小为批处理大小的倍数
         
+        self.processing_thread = None
+        self.processing_running = False
+        self.run_lock = threading.Lock()  # 共享线程池的处理与停止时的最后一次处理互斥
+        # 处理未启动（未开始监测或已停止）时到达的数据块直接丢弃
+        self.ingest_stats = {
+            'blocks_dropped': 0,
+            'samples_dropped': 0
+        }
+        
+        # 推送和存储阶段：各有工作线程和有界队列，数据库写入延迟不影响采集和处理。
+        # 推送落后时丢弃最旧的块（前端按序号检测缺口），存储落后时把排队的块合并为一次写入
+        self.emit_stage = PipelineStage('emit', self._emit_block, max_queue=16, policy='drop_oldest')
+        self.store_stage = PipelineStage('store', self._store_blocks, max_queue=256, policy='drop_oldest',
+                                         batch=True, max_batch=32)
+        
         self.start_timestamp = None
         self.end_timestamp = None
         
@@ -45,8 +99,28 @@ class ECGMonitoringSystem:
         self.last_data_time = None
         self.fixed_sampling_interval = None  # 固定采样间隔，毫秒，自动计算
 
+    def _create_buffers(self):
+        """分配本进程处理需要的滤波器和缓冲区（分片会话在工作进程中处理，替换为共享环形缓冲区）"""
+        # 实时清洗：带通 + 基线去除的因果流式滤波，各导联的滤波器状态在块之间保留
+        self.stream_filter = StreamingLeadFilter(sampling_rate=self.sampling_rate, leads=12)
+        
+        # 滤波后的12导联数据：预分配的 (12, N) float32 环形缓冲区，时间戳和样本序号为共享列
+        self.lead_buffer = LeadRingBuffer(capacity=self.max_samples * 10, leads=12)
+        
+        # 读取器与处理阶段之间的环形缓冲区：读取器回调只写入缓冲区，
+        # 处理线程（或共享线程池）负责导联计算、存储和推送，慢处理不再阻塞设备读取
+        self.input_buffer = SampleRingBuffer(capacity=8192, channels=8, policy='drop_oldest')
+
     # 连接串口设备
-    def connect_serial(self, port='COM7', baudrate=921600):
+    def connect_serial(self, port='COM7', baudrate=921600, acquisition_manager=None):
+        """
+        连接串口设备
+        
+        参数:
+            port: 串口名
+            baudrate: 波特率
+            acquisition_manager: 可选的 SerialAcquisitionManager，多台设备共用一个复用读取线程
+        """
         print(f"Connecting to serial port {port} at {baudrate} baud")
         
         # 如果已经有连接，先断开
@@ -54,22 +128,25 @@ class ECGMonitoringSystem:
         
         try:
             # 创建并配置串口读取器
-            self.data_source = SerialPortReader(port=port, baudrate=baudrate)
-            self.data_source.register_callback(self.handle_new_data)
+            if acquisition_manager is not None:
+                self.data_source = acquisition_manager.create_reader(port, baudrate=baudrate)
+            else:
+                self.data_source = SerialPortReader(port=port, baudrate=baudrate)
+            self.data_source.register_block_callback(self.handle_new_block)
             
             # 只连接串口，不开始读取数据
             self.data_source.open()
             self.data_source_type = 'serial'
             
             # 发送连接状态通知
-            self.socketio.emit('connection_status', {'status': 'connected', 'type': 'serial', 'port': port, 'baudrate': baudrate})
-            self.socketio.emit('notification', {'message': f'已连接到串口 {port}，波特率 {baudrate}'})
+            self._notify('connection_status', {'status': 'connected', 'type': 'serial', 'port': port, 'baudrate': baudrate})
+            self._notify('notification', {'message': f'已连接到串口 {port}，波特率 {baudrate}'})
             return True
         except Exception as e:
             error_msg = f"串口连接失败: {str(e)}"
             print(error_msg)
-            self.socketio.emit('notification', {'message': error_msg, 'type': 'error'})
-            self.socketio.emit('connection_status', {'status': 'disconnected'})
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
+            self._notify('connection_status', {'status': 'disconnected'})
             raise
     
     # 连接UDP设备
@@ -94,7 +171,7 @@ class ECGMonitoringSystem:
             )
             
             # 注册数据回调
-            self.data_source.register_callback(self.handle_new_data)
+            self.data_source.register_block_callback(self.handle_new_block)
             
             # 只打开UDP连接，不开始读取数据
             self.data_source.open()
@@ -112,23 +189,44 @@ class ECGMonitoringSystem:
                 connection_info['remote_ip'] = remote_ip
                 connection_info['remote_port'] = remote_port
             
-            self.socketio.emit('connection_status', connection_info)
+            self._notify('connection_status', connection_info)
             
             # 发送通知
             message = f'已连接到UDP，监听 {local_ip}:{local_port}'
             if remote_ip and remote_port:
                 message += f'，远程端点 {remote_ip}:{remote_port}'
                 
-            self.socketio.emit('notification', {'message': message})
+            self._notify('notification', {'message': message})
             return True
             
         except Exception as e:
             error_msg = f"UDP连接失败: {str(e)}"
             print(error_msg)
-            self.socketio.emit('notification', {'message': error_msg, 'type': 'error'})
-            self.socketio.emit('connection_status', {'status': 'disconnected'})
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
+            self._notify('connection_status', {'status': 'disconnected'})
             raise
     
+    # 连接已有的数据源
+    def connect_source(self, source, source_type='udp'):
+        """
+        把已创建的数据源（例如 UDPDeviceServer 为某台设备创建的会话）接入本监测系统
+        
+        参数:
+            source: 实现 register_block_callback / open / start_reading / close 的数据源
+            source_type: 数据源类型，决定 start_monitoring 的启动方式
+        """
+        if not self.local_sources:
+            raise ValueError("该会话不能接入本进程中的数据源，请创建单进程会话（sharded=false）")
+        if self.data_source_type:
+            # 新创建的会话（例如 UDPDeviceServer 的设备会话）没有数据源，不需要断开，也不发送断开通知
+            self.disconnect()
+        source.register_block_callback(self.handle_new_block)
+        source.open()
+        self.data_source = source
+        self.data_source_type = source_type
+        self._notify('connection_status', {'status': 'connected', 'type': source_type})
+        return True
+    
     # 连接蓝牙设备
     def connect_bluetooth(self, port, baudrate=921600):
         print(f"Connecting to bluetooth device on port {port} at {baudrate} baud")
@@ -141,8 +239,8 @@ class ECGMonitoringSystem:
             # 使用模拟数据源
             print("Using mock data source for Bluetooth")
             self.data_source_type = 'bluetooth_mock'
-            self.socketio.emit('connection_status', {'status': 'connected', 'type': 'bluetooth', 'port': 'mock', 'baudrate': baudrate})
-            self.socketio.emit('notification', {'message': f'已连接到模拟蓝牙设备'})
+            self._notify('connection_status', {'status': 'connected', 'type': 'bluetooth', 'port': 'mock', 'baudrate': baudrate})
+            self._notify('notification', {'message': f'已连接到模拟蓝牙设备'})
             return True
         
         try:
@@ -154,27 +252,29 @@ class ECGMonitoringSystem:
                 
             # 创建串口读取器并注册回调
             self.data_source = SerialPortReader(port=port, baudrate=baudrate_int)
-            self.data_source.register_callback(self.handle_new_data)
+            self.data_source.register_block_callback(self.handle_new_block)
             
             # 只打开连接，不开始读取数据
             self.data_source.open()
             self.data_source_type = 'bluetooth'
             
             # 发送连接状态和通知
-            self.socketio.emit('connection_status', {'status': 'connected', 'type': 'bluetooth', 'port': port, 'baudrate': baudrate_int})
-            self.socketio.emit('notification', {'message': f'已连接到蓝牙设备 {port}，波特率 {baudrate_int}'})
+            self._notify('connection_status', {'status': 'connected', 'type': 'bluetooth', 'port': port, 'baudrate': baudrate_int})
+            self._notify('notification', {'message': f'已连接到蓝牙设备 {port}，波特率 {baudrate_int}'})
             return True
             
         except Exception as e:
             error_msg = f"蓝牙连接失败: {str(e)}"
             print(error_msg)
-            self.socketio.emit('notification', {'message': error_msg, 'type': 'error'})
-            self.socketio.emit('connection_status', {'status': 'disconnected'})
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
+            self._notify('connection_status', {'status': 'disconnected'})
             raise
     
     # 连接文件数据源
     def connect_file(self, file_name):
         print(f"Connecting to file data source: {file_name}")
+        if not self.local_sources:
+            raise ValueError("该会话不支持文件回放，请创建单进程会话（sharded=false）")
         
         # 如果已经有连接，先断开
         self.disconnect()
@@ -190,14 +290,14 @@ class ECGMonitoringSystem:
             self.file_name = file_name
             
             # 发送连接状态
-            self.socketio.emit('connection_status', {'status': 'connected', 'type': 'file', 'fileName': file_name})
-            self.socketio.emit('notification', {'message': f'已连接到文件数据源: {file_name}'})
+            self._notify('connection_status', {'status': 'connected', 'type': 'file', 'fileName': file_name})
+            self._notify('notification', {'message': f'已连接到文件数据源: {file_name}'})
             return True
         except Exception as e:
             error_msg = f"文件连接失败: {str(e)}"
             print(error_msg)
-            self.socketio.emit('notification', {'message': error_msg, 'type': 'error'})
-            self.socketio.emit('connection_status', {'status': 'disconnected'})
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
+            self._notify('connection_status', {'status': 'disconnected'})
             raise
     
     # 断开当前连接
@@ -222,8 +322,16 @@ class ECGMonitoringSystem:
         self.data_source_type = None
         
         # 发送断开连接状态
-        self.socketio.emit('connection_status', {'status': 'disconnected'})
-        self.socketio.emit('notification', {'message': '已断开数据源连接'})
+        self._notify('connection_status', {'status': 'disconnected'})
+        self._notify('notification', {'message': '已断开数据源连接'})
+    
+    def close(self):
+        """会话被移除时调用：删除记录溢出到磁盘的临时块"""
+        self.data_storage.close()
+    
+    def _notify(self, event, data):
+        # connection_status / notification 只发送到订阅了本会话的客户端（会话房间）
+        emit_session_event(self.socketio, self.session_id, event, data)
     
     # 开始监测（连接后调用）
     def start_monitoring(self, speed=1.0):
@@ -232,18 +340,21 @@ class ECGMonitoringSystem:
         if not self.data_source_type:
             error_msg = "没有连接数据源，无法开始监测"
             print(error_msg)
-            self.socketio.emit('notification', {'message': error_msg, 'type': 'error'})
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
             return False
             
         self.start_timestamp = time.time()
         self.data_storage.reset_data()
+        self._reset_stream()
         
         try:
+            self._start_processing()
+            
             # 根据数据源类型启动监测
             if self.data_source_type == 'file':
                 # 文件回放模式需要特殊处理
                 self._start_file_replay(speed)
-                self.socketio.emit('notification', {'message': f'文件回放已开始: {self.file_name}, 速度 {speed}x'})
+                self._notify('notification', {'message': f'文件回放已开始: {self.file_name}, 速度 {speed}x'})
             elif self.data_source_type in ['serial', 'bluetooth', 'bluetooth_mock']:
                 # 串口和蓝牙模式使用SerialPortReader
                 if hasattr(self.data_source, 'start_reading'):
@@ -269,13 +380,13 @@ class ECGMonitoringSystem:
             }
             
             source_type_name = source_type_names.get(self.data_source_type, self.data_source_type)
-            self.socketio.emit('notification', {'message': f'{source_type_name}数据监测已开始'})
+            self._notify('notification', {'message': f'{source_type_name}数据监测已开始'})
             return True
             
         except Exception as e:
             error_msg = f"启动监测失败: {str(e)}"
             print(error_msg)
-            self.socketio.emit('notification', {'message': error_msg, 'type': 'error'})
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
             return False
             
     # 启动文件回放
@@ -306,7 +417,7 @@ class ECGMonitoringSystem:
             file_path = os.path.join('.', file_name)
             if not os.path.exists(file_path):
                 print(f"File not found: {file_path}")
-                self.socketio.emit('notification', {'message': f'文件不存在: {file_path}', 'type': 'error'})
+                self._notify('notification', {'message': f'文件不存在: {file_path}', 'type': 'error'})
                 return
             
             # 加载数据（根据文件类型选择不同的加载方式）
@@ -348,7 +459,7 @@ class ECGMonitoringSystem:
                 
         except Exception as e:
             print(f"Error in file replay: {e}")
-            self.socketio.emit('notification', {'message': f'文件回放错误: {str(e)}', 'type': 'error'})
+            self._notify('notification', {'message': f'文件回放错误: {str(e)}', 'type': 'error'})
         finally:
             self.file_replay_running = False
             print("File replay finished")
@@ -368,63 +479,242 @@ class ECGMonitoringSystem:
         if self.data_source and hasattr(self.data_source, 'is_running'):
             self.data_source.is_running = False
         
+        # 处理完缓冲区中剩余的数据后停止处理线程
+        self._stop_processing()
+        
         # 保存数据
         if self.start_timestamp and self.end_timestamp:
             duration = self.end_timestamp - self.start_timestamp
             if duration > 5:  # 只保存超过5秒的记录
+                # 多个会话可能在同一秒停止（批量停止、UDP 设备同时超时），文件名带会话ID避免互相覆盖
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
-                self.data_storage.save_data(f"ecg_data_{timestamp}.json")
+                self.data_storage.save_data(f"ecg_data_{timestamp}_{self.session_id}.json")
         
-        self.socketio.emit('notification', {'message': '数据监测已停止'})
+        self._notify('notification', {'message': '数据监测已停止'})
         return {'status': 'stopped'}
     
     # 处理新数据
     def handle_new_data(self, values, timestamp):
         """
-        处理新数据，增强了时间戳精确性和采样率控制
+        处理单个样本，适配到块接口
         
         参数:
             values: 原始数据值
             timestamp: 数据时间戳
         """
-        # 使用传递过来的时间戳
-        current_time = timestamp
-        
-        # 计算采样间隔，用于检测采样率
-        if self.last_data_time is not None:
-            interval = current_time - self.last_data_time
-            
-            # 如果还没有计算固定采样间隔，则计算
-            if self.fixed_sampling_interval is None and interval > 0:
-                # 使用前10个数据点的平均间隔作为固定采样间隔
-                if len(self.accumulated_data[0]) >= 10:
-                    times = [t for t, _ in self.accumulated_data[0][-10:]]
-                    intervals = [times[i+1] - times[i] for i in range(len(times)-1)]
-                    if intervals:
-                        self.fixed_sampling_interval = sum(intervals) / len(intervals)
-                        print(f"固定采样间隔设置为: {self.fixed_sampling_interval:.6f} 秒")
-        
-        # 更新最后一次数据时间
-        self.last_data_time = current_time
-
-        # 计算12导联数据
-        leads_12 = self.data_processor.compute_12_leads(values)
+        self.handle_new_block(np.asarray([values], dtype=np.float32), np.array([timestamp], dtype=np.float64))
+    
+    def handle_new_block(self, values, timestamps):
+        """
+        读取器块回调：把一块新数据写入环形缓冲区，由处理线程处理；未开始监测时丢弃
         
-        # 保存数据点
-        self.data_storage.save_data_point(current_time, leads_12)
-
-        # 将数据添加到累积缓冲区
-        for i in range(12):
-            self.accumulated_data[i].append((current_time, leads_12[i]))
+        参数:
+            values: (n, 8) 的原始数据数组
+            timestamps: 长度为 n 的时间戳数组
+        """
+        if not self.processing_running:
+            # 未开始监测或正在停止：不在读取器线程中处理，丢弃这块数据
+            self.ingest_stats['blocks_dropped'] += 1
+            self.ingest_stats['samples_dropped'] += len(values)
+            return
+        self.input_buffer.write(values, timestamps)
+        if self.executor is not None:
+            self.executor.schedule(self)
+    
+    def _start_processing(self):
+        """启动处理线程"""
+        self._stop_processing()
+        if self.input_buffer is not None:
+            self.input_buffer.reset()
+        self.emit_stage.start()
+        self.store_stage.start()
+        self.processing_running = True
+        if self.executor is not None:
+            # 由共享线程池处理，不创建自己的处理线程
+            self.executor.register(self)
+            return
+        self.processing_thread = threading.Thread(target=self._processing_loop, daemon=True)
+        self.processing_thread.start()
+    
+    def _stop_processing(self):
+        """停止处理线程和推送/存储阶段，缓冲区和队列中已有的数据会先处理完"""
+        if self.executor is not None and self.processing_running:
+            self.processing_running = False
+            self.executor.unregister(self)
+            # 注销等待超时时工作线程可能仍在处理本会话，持有 run_lock 保证不并发处理
+            with self.run_lock:
+                self._run_pending()
+                self._flush('final')
+        if self.processing_thread:
+            self.processing_running = False
+            self.input_buffer.close()
+            if self.processing_thread is not threading.current_thread():
+                self.processing_thread.join(timeout=2.0)
+            self.processing_thread = None
+        self.emit_stage.stop()
+        self.store_stage.stop()
+    
+    def _processing_loop(self):
+        """处理线程：从环形缓冲区取出全部已到达的样本作为一块处理，等待数据的超时即推送定时器"""
+        buffer = self.input_buffer
+        while self.processing_running or buffer.occupancy() > 0:
+            try:
+                buffer.wait_readable(timeout=self._flush_timeout())
+                self._run_pending()
+            except Exception as e:
+                print(f"处理数据块时出错: {e}")
+        self._flush('final')
+    
+    def has_new_samples(self):
+        """输入缓冲区中是否有尚未处理的样本"""
+        return self.input_buffer.occupancy() > 0
+    
+    def _run_pending(self):
+        """处理输入缓冲区中全部已到达的样本；没有新样本时（设备变慢或停顿）也按延迟目标推送
         
-        # 增加计数器
-        self.sample_counter += 1
-
-        # 当累积足够数据点时处理并发送
+        每次最多取出使未推送样本达到 max_samples 的样本数，达到即推送，积压的样本按最大样本数分批推送，
+        不会在推送前被12导联缓冲区覆盖
+        """
+        processed = False
+        while True:
+            values, timestamps = self.input_buffer.read(self.max_samples - self.sample_counter)
+            if not len(values):
+                break
+            self._process_block(values, timestamps)
+            processed = True
+        if not processed:
+            self._maybe_flush()
+    
+    def _flush_due(self, now):
+        # 由共享线程池的定时线程调用：未推送样本是否已达到延迟目标
+        pending_since = self.pending_since
+        return pending_since is not None and now - pending_since >= self.latency_target
+    
+    def _flush_timeout(self):
+        # 有未推送样本时等到延迟目标到期，否则只用于检查停止标志
+        if self.pending_since is None:
+            return 0.1
+        return max(0.0, self.pending_since + self.latency_target - time.time())
+    
+    def _maybe_flush(self):
+        """未推送样本达到最大样本数或等待超过延迟目标时推送"""
+        if not self.sample_counter:
+            return
         if self.sample_counter >= self.max_samples:
-            self.process_and_send_data()
-            self.sample_counter = 0
-            
+            self._flush('size')
+        elif time.time() - self.pending_since >= self.latency_target:
+            self._flush('timer')
+    
+    def _flush(self, reason):
+        if not self.sample_counter:
+            return
+        self.process_and_send_data()
+        self.sample_counter = 0
+        self.pending_since = None
+        self.flush_stats[reason] += 1
+    
+    def set_flush_policy(self, latency_target=None, max_samples=None):
+        """设置推送策略
+        
+        Args:
+            latency_target (float): 新样本最长等待推送的时间（秒）
+            max_samples (int): 每次推送的最大样本数，不超过12导联缓冲区容量
+        """
+        if latency_target is not None:
+            latency_target = float(latency_target)
+            if latency_target <= 0:
+                raise ValueError("latency_target 必须大于 0")
+            self.latency_target = latency_target
+        if max_samples is not None:
+            max_samples = int(max_samples)
+            if not 0 < max_samples <= self.lead_buffer.capacity:
+                raise ValueError(f"max_samples 必须在 1 到 {self.lead_buffer.capacity} 之间")
+            self.max_samples = max_samples
+        print(f"推送策略设置为: 延迟目标 {self.latency_target * 1000:.0f} ms, 最大 {self.max_samples} 个样本")
+    
+    def get_pipeline_stats(self):
+        """返回输入缓冲区的占用率和丢弃样本统计、未监测时丢弃的数据块、推送统计以及推送/存储阶段的队列深度和处理耗时"""
+        return {
+            'input_buffer': self.input_buffer.get_stats() if self.input_buffer is not None else None,
+            'ingest': dict(self.ingest_stats),
+            'emit': dict(self.emit_stats, seq=self.emit_seq),
+            'stages': {stage.name: stage.get_stats() for stage in (self.emit_stage, self.store_stage)},
+            'flush': dict(self.flush_stats, latency_target=self.latency_target, max_samples=self.max_samples),
+            'latency': {name: stats.get_stats() for name, stats in self.latency_stats.items()}
+        }
+    
+    def _process_block(self, values, timestamps):
+        """
+        处理一块新数据，采样间隔检测和发送判断按块进行
+        
+        参数:
+            values: (n, 8) 的原始数据数组
+            timestamps: 长度为 n 的时间戳数组
+        """
+        n = len(values)
+        if n == 0:
+            return
+        
+        # 如果还没有计算固定采样间隔，则使用前10个数据点的平均间隔
+        if self.fixed_sampling_interval is None and self.last_data_time is not None:
+            if len(self.lead_buffer) >= 10:
+                times, _ = self.lead_buffer.latest(10)
+                intervals = np.diff(times)
+                if intervals.sum() > 0:
+                    self.fixed_sampling_interval = float(intervals.mean())
+                    print(f"固定采样间隔设置为: {self.fixed_sampling_interval:.6f} 秒")
+        
+        # 更新最后一次数据时间
+        self.last_data_time = float(timestamps[-1])
+        
+        # 整块乘以导出矩阵计算12导联数据，得到 (n, 12) 数组
+        leads_12 = self.data_processor.compute_12_leads_block(values)
+        
+        # 丢包填补的 NaN 行表示缺失样本：照常进入12导联缓冲区以保持时间轴，但不保存
+        missing = np.isnan(values).any(axis=1)
+        if missing.any():
+            self.data_storage.save_block(timestamps[~missing], leads_12[~missing])
+        else:
+            self.data_storage.save_block(timestamps, leads_12)
+        
+        # 整块滤波（每个样本只滤波一次）后追加到12导联环形缓冲区（按导联存放）
+        self.lead_buffer.append(self.stream_filter.process(leads_12.T), timestamps)
+        
+        # 增加计数器，记录第一个未推送样本的时间
+        self.sample_counter += n
+        if self.pending_since is None:
+            self.pending_since = time.time()
+        
+        # 达到最大样本数或延迟目标时推送
+        self._maybe_flush()
+            
+    def _reset_stream(self):
+        """清除滤波器状态和12导联缓冲区（开始新的监测时调用）"""
+        # 数据源有采样时钟时按其标称采样率设计滤波器
+        clock = getattr(self.data_source, 'sample_clock', None)
+        rate = getattr(clock, 'nominal_rate', None) or self.sampling_rate
+        if rate != self.stream_filter.sampling_rate:
+            self.stream_filter = StreamingLeadFilter(sampling_rate=rate, leads=12)
+        self.stream_filter.reset()
+        self.lead_buffer.reset()
+        self.emitted_count = 0
+        self.emit_seq = 0
+        self.sample_counter = 0
+        self.pending_since = None
+        for stats in self.latency_stats.values():
+            stats.reset()
+    
+    def set_wire_format(self, wire_format):
+        """设置 ecg_data 事件的负载格式
+        
+        Args:
+            wire_format (str): 'json'（默认），或二进制的 'int16' / 'float32'
+        """
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"不支持的推送格式: {wire_format}")
+        self.wire_format = wire_format
+        print(f"ecg_data 推送格式设置为: {wire_format}")
+    
     def set_patient_id(self, patient_id):
         """设置当前监测的患者ID
         
@@ -436,13 +726,24 @@ class ECGMonitoringSystem:
     
     def process_and_send_data(self):
         """
-        处理累积的数据并发送到前端
-        使用改进的插值算法和数据处理流程
-        同时将数据存储到数据库中
+        取出上次推送之后新滤波的样本，交给推送阶段发送到前端、交给存储阶段写入数据库
         """
-        # 处理累积的数据
-        processed_signals = []
-        time_stamps = []
+        # 只取上次推送之后、已计入未推送样本的新样本并拷贝（推送和存储阶段在其他线程中使用，缓冲区会被后续数据覆盖）
+        # 结束位置不取 write_count：写入方在工作进程中时（分片模式）缓冲区可能同时在增长，
+        # 每次推送不超过 max_samples 个样本；拷贝期间被覆盖的样本由 copy_since 去掉并计入 skipped
+        count = self.emitted_count + self.sample_counter
+        recent_times, recent_leads, indices, skipped = self.lead_buffer.copy_since(self.emitted_count, count)
+        self.emitted_count = count
+        self.emit_stats['samples_skipped'] += skipped
+        new_samples = len(recent_times)
+        if new_samples <= 0:
+            return
+        first_sample_index = int(indices[0])
+        time_stamps = recent_times.tolist()
+        
+        self.emit_seq += 1
+        self.emit_stats['events'] += 1
+        self.emit_stats['samples'] += new_samples
         
         # 检查数据连续性的辅助函数
         def check_continuity(times):
@@ -489,95 +790,81 @@ class ECGMonitoringSystem:
             
             return not has_large_gap, interval_stats
         
-        # 处理每个导联的数据
-        for i in range(12):
-            # 获取最近的 max_samples 个数据点
-            data = self.accumulated_data[i][-self.max_samples:]
-            
-            # 如果数据点数量足够，进行处理
-            if len(data) >= 10:  # 降低最小数据点要求从18降到10
-                # 分离时间戳和数据值
-                times, values = zip(*data)
-                times = list(times)
-                values = list(values)
-                
-                # 检查时间序列是否单调递增
-                is_monotonic = True
-                for j in range(len(times)-1):
-                    if times[j] >= times[j+1]:
-                        is_monotonic = False
-                        break
-                        
-                if not is_monotonic:
-                    # 每10次检测只输出一次日志，减少日志数量
-                    if self.sample_counter % 10 == 0:
-                        print("时间序列不是单调递增的，但保留原始顺序")
-                    # 不再对时间和值进行排序，保留原始顺序
-                    pass
-                
-                # 检查数据连续性
-                continuity_ok, _ = check_continuity(times)
-                
-                # 禁用插值处理，直接使用原始数据
-                if not continuity_ok and len(times) > 2:
-                    # 记录数据不连续的情况，但不进行插值处理
-                    if self.sample_counter % 10 == 0:
-                        print(f"检测到数据不连续，但保留原始数据 (间隔: {_.get('max'):.4f}秒)")
-                
-                # 对数据进行清洗
-                try:
-                    cleaned_signal = self.data_processor.clean_signal(values)
-                    
-                    # 将清洗后的信号转换为列表并添加到处理结果中
-                    if isinstance(cleaned_signal, np.ndarray):
-                        cleaned_signal = cleaned_signal.tolist()
-                    processed_signals.append(cleaned_signal)
-                except Exception as e:
-                    print(f"信号清洗失败: {e}")
-                    # 如果清洗失败，使用原始数据
-                    processed_signals.append(values)
-
-                # 仅在第一次迭代时获取时间戳
-                if i == 0:
-                    time_stamps = times
-            else:
-                # 数据长度不足，直接使用原始数据
-                if data:  # 确保有数据
-                    times, values = zip(*data)
-                    processed_signals.append(list(values))  # 确保转换为列表
-                    if i == 0:
-                        time_stamps = list(times)  # 确保转换为列表
-                else:
-                    # 如果没有数据，添加空列表
-                    processed_signals.append([])
-                    if i == 0:
-                        time_stamps = []
-
-        # 确保所有数据都是JSON可序列化的
-        def ensure_serializable(obj):
-            if isinstance(obj, list):
-                return [ensure_serializable(item) for item in obj]
-            elif hasattr(obj, 'tolist'):
-                return obj.tolist()
-            elif hasattr(obj, 'item'):
-                return obj.item()  # 处理标量类型
-            else:
-                return obj
-                
-        # 对所有数据进行处理
-        serializable_signals = ensure_serializable(processed_signals)
-        serializable_timestamps = ensure_serializable(time_stamps)
-        
-        # 将处理后的数据发送到前端
-        self.socketio.emit('ecg_data', {
-            'leads': serializable_signals,  # 12个导联的列表
-            'time_stamps': serializable_timestamps  # 时间戳列表
-        })
-        print(f"Data emitted to frontend with {len(serializable_signals[0]) if serializable_signals and serializable_signals[0] else 0} samples")
-        
-        # 存储数据到数据库
+        # 检查时间序列是否单调递增以及数据连续性（只记录，不修改数据）
+        if len(time_stamps) >= 10:
+            if (np.diff(recent_times) <= 0).any() and self.sample_counter % 10 == 0:
+                print("时间序列不是单调递增的，但保留原始顺序")
+            continuity_ok, interval_stats = check_continuity(time_stamps)
+            if not continuity_ok and self.sample_counter % 10 == 0:
+                print(f"检测到数据不连续，但保留原始数据 (间隔: {interval_stats.get('max'):.4f}秒)")
+        
+        span = recent_times[-1] - recent_times[0]
+        if new_samples > 1 and span > 0:
+            sampling_rate = (new_samples - 1) / span
+        else:
+            sampling_rate = self.stream_filter.sampling_rate if self.stream_filter is not None else self.sampling_rate
+        
+        # 推送和存储交给各自的处理阶段（数据已是拷贝）
+        block = {
+            'leads': recent_leads,
+            'times': recent_times,
+            'first_sample_index': first_sample_index,
+            'seq': self.emit_seq,
+            'sampling_rate': sampling_rate
+        }
+        self.emit_stage.submit(block)
+        self.store_stage.submit(block)
+    
+    def _emit_block(self, block):
+        """
+        推送阶段：把一块新样本推送到前端（全速率 ecg_data 和订阅的 ecg_data_lod），并记录端到端延迟
+        
+        参数:
+            block: process_and_send_data 提交的数据块
+        """
+        self._send_block(block)
+        now = time.time()
+        self.latency_stats['oldest'].add(now - block['times'][0])
+        self.latency_stats['newest'].add(now - block['times'][-1])
+    
+    def _send_block(self, block):
+        # 推送到订阅了本会话的房间（全速率 ecg_data 和分级抽取的 ecg_data_lod），没有订阅时不编码
+        stream = get_stream_service()
+        if stream is not None:
+            stream.publish(self.session_id, block['leads'], block['times'], block['first_sample_index'],
+                           block['sampling_rate'], block['seq'], wire_format=self.wire_format)
+            return
+        
+        # 未初始化推送服务时广播给所有客户端
+        self.socketio.emit('ecg_data', build_ecg_payload(
+            block['leads'], block['times'], block['first_sample_index'], block['seq'], block['sampling_rate'],
+            self.wire_format, session_id=self.session_id))
+        print(f"Data emitted to frontend with {len(block['times'])} samples")
+    
+    def _store_blocks(self, blocks):
+        """
+        存储阶段：把排队的数据块合并为一次数据库写入
+        
+        参数:
+            blocks: process_and_send_data 提交的数据块列表
+        """
+        if len(blocks) == 1:
+            leads, times = blocks[0]['leads'], blocks[0]['times']
+        else:
+            leads = np.concatenate([block['leads'] for block in blocks], axis=1)
+            times = np.concatenate([block['times'] for block in blocks])
+        self._store_to_database(leads, times.tolist())
+    
+    def _store_to_database(self, leads_data, timestamps):
+        """
+        把一次推送的数据存储到数据库
+        
+        参数:
+            leads_data: 12个导联的数据（列表或 (12, n) 数组）
+            timestamps: 时间戳序列
+        """
         try:
-            if serializable_signals and serializable_signals[0] and serializable_timestamps:
+            if len(leads_data) and len(leads_data[0]) and len(timestamps):
                 # 准备元数据
                 metadata = {
                     'session_id': self.session_id,
@@ -593,8 +880,8 @@ class ECGMonitoringSystem:
                 # 存储到InfluxDB
                 database_manager.store_ecg_data(
                     patient_id=self.patient_id or 'unknown',
-                    leads_data=serializable_signals,
-                    timestamps=serializable_timestamps,
+                    leads_data=leads_data,
+                    timestamps=timestamps,
                     metadata=metadata
                 )
                 
@@ -605,8 +892,3 @@ class ECGMonitoringSystem:
         except Exception as e:
             print(f"数据存储失败: {e}")
 
-        # 保持累计数据的长度，防止内存占用过大
-        max_length = self.max_samples * 10  # 保留最近的数据
-        for i in range(12):
-            if len(self.accumulated_data[i]) > max_length:
-                self.accumulated_data[i] = self.accumulated_data[i][-max_length:]
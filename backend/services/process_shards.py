@@ -0,0 +1,448 @@
+# process_shards.py
+
+"""
+多进程分片监测（可选）
+
+单进程模式下所有会话的设备读取、导联计算和滤波都在 web 进程中，受一个解释器的 CPU 限制。
+分片模式把会话分配到若干工作进程（见 shard_worker）：
+    - 每个工作进程拥有一组会话的设备读取器，在进程内完成12导联计算和流式滤波
+    - 滤波后的样本写入 web 进程创建的共享环形缓冲区（utils.ring_buffer.SharedLeadRing），
+      web 进程按 write_count 直接读取共享内存中的视图，样本数据不经过管道、不被 pickle
+    - web 进程保留推送和存储：ShardedMonitoringSystem 复用 ECGMonitoringSystem 的推送策略、
+      推送/存储阶段、按会话订阅的房间和延迟统计
+    - 新会话放到会话数最少的工作进程，会话数相同时选上报 CPU 占用最低的进程；
+      轮询绿线程发现共享缓冲区有新样本时把会话交给 SessionExecutor，推送到期由其定时线程调度
+
+工作进程以 python -m backend.services.shard_worker 启动，通过 socketpair 管道与 web 进程通信：
+不 fork（fork 出的子进程会共享父进程 eventlet hub 的 epoll 实例），也不用 multiprocessing 的 spawn
+（会在工作进程中重新导入 web 进程的主模块，即整个应用和数据库连接）。
+分片数为 0、共享内存不可用或工作进程无法启动时，ecg_manager 使用单进程会话。
+"""
+
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+
+import eventlet
+from eventlet.hubs import trampoline
+
+from ..utils.ring_buffer import SharedLeadRing
+from .monitoring_service import ECGMonitoringSystem
+from .session_executor import SessionExecutor
+
+# backend 包所在的目录，工作进程按包名导入 shard_worker
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ShardHandle:
+    """web 进程中一个工作进程的句柄：发送命令、等待应答、保存最近一次负载统计"""
+
+    def __init__(self, shard_id, request_timeout=5.0):
+        """
+        Args:
+            shard_id: 分片编号
+            request_timeout: 等待命令应答的最长秒数
+        """
+        self.shard_id = shard_id
+        self.request_timeout = request_timeout
+        self.sessions = set()
+        self.stats = {}
+        self.ready = threading.Event()   # 收到工作进程的第一次负载上报
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+
+        parent, child = socket.socketpair()
+        for sock in (parent, child):
+            # eventlet 的套接字在系统层面是非阻塞的，Connection 需要阻塞的文件描述符
+            os.set_blocking(sock.fileno(), True)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [_PROJECT_ROOT, env.get('PYTHONPATH')]))
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'backend.services.shard_worker', str(shard_id), str(child.fileno())],
+            pass_fds=(child.fileno(),), env=env)
+        child.close()
+        # 读取前先用 trampoline 等待可读，Connection 本身做阻塞读写
+        self.conn = Connection(parent.detach())
+        self._reader = threading.Thread(target=self._read_loop, name=f"shard-reader-{shard_id}", daemon=True)
+        self._reader.start()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def request(self, command, **kwargs):
+        """
+        发送一个命令并等待工作进程应答
+
+        Returns:
+            命令的返回值
+
+        Raises:
+            RuntimeError: 工作进程执行失败、已退出或应答超时
+        """
+        if not self.is_alive():
+            raise RuntimeError(f"处理分片 {self.shard_id} 已退出")
+        request_id = next(self._ids)
+        entry = self._pending[request_id] = {'done': threading.Event()}
+        try:
+            with self._send_lock:
+                self.conn.send((request_id, command, kwargs))
+            if not entry['done'].wait(self.request_timeout):
+                raise RuntimeError(f"处理分片 {self.shard_id} 响应超时: {command}")
+        finally:
+            self._pending.pop(request_id, None)
+        ok, result = entry['reply']
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+    def _read_loop(self):
+        while True:
+            try:
+                trampoline(self.conn.fileno(), read=True, timeout=1.0)
+            except eventlet.Timeout:
+                if not self.is_alive():
+                    break
+                continue
+            except OSError:
+                break
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == 'stats':
+                self.stats = message[1]
+                self.ready.set()
+            elif message[0] == 'reply':
+                entry = self._pending.get(message[1])
+                if entry is not None:
+                    entry['reply'] = (message[2], message[3])
+                    entry['done'].set()
+        # 工作进程退出：让等待中的请求立即失败
+        for entry in list(self._pending.values()):
+            entry['reply'] = (False, f"处理分片 {self.shard_id} 已退出")
+            entry['done'].set()
+        print(f"处理分片 {self.shard_id} 的连接已关闭")
+
+    def load(self):
+        """放置新会话时比较的负载：(会话数, 上报的 CPU 占用比例)"""
+        return len(self.sessions), self.stats.get('cpu', 0.0)
+
+    def stop(self, timeout=2.0):
+        try:
+            if self.is_alive():
+                with self._send_lock:
+                    self.conn.send((0, 'shutdown', {}))
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+        self.conn.close()
+
+    def get_stats(self):
+        return {
+            'shard_id': self.shard_id,
+            'pid': self.process.pid,
+            'alive': self.is_alive(),
+            'sessions': len(self.sessions),
+            'cpu': self.stats.get('cpu'),
+            'worker': self.stats.get('sessions', {})
+        }
+
+
+class ShardManager:
+    """工作进程池：放置会话并轮询各会话的共享环形缓冲区"""
+
+    def __init__(self, shards=2, poll_interval=0.002, ring_seconds=10.0, startup_timeout=60.0):
+        """
+        Args:
+            shards: 工作进程数
+            startup_timeout: 等待工作进程就绪（完成导入）的最长秒数
+            poll_interval: 轮询共享缓冲区 write_count 的间隔（秒）
+            ring_seconds: 每个会话共享环形缓冲区保留的秒数（按 500 Hz 计算容量）
+        """
+        self.shard_count = shards
+        self.poll_interval = poll_interval
+        self.ring_seconds = ring_seconds
+        self.startup_timeout = startup_timeout
+        self.shards = []
+        self.active = set()      # 正在监测的会话
+        self.is_running = False
+        self._lock = threading.Lock()
+        self._poller = None
+        self.stats = {
+            'polls': 0,
+            'wakeups': 0
+        }
+
+    def start(self):
+        """启动工作进程和轮询绿线程
+
+        Raises:
+            共享内存不可用或工作进程无法启动时抛出异常，调用方退回单进程模式
+        """
+        # 先确认共享内存可用
+        SharedLeadRing(capacity=1, leads=1).close()
+        try:
+            for shard_id in range(self.shard_count):
+                self.shards.append(ShardHandle(shard_id))
+            for shard in self.shards:
+                if not shard.ready.wait(self.startup_timeout):
+                    raise RuntimeError(f"处理分片 {shard.shard_id} 启动超时")
+        except Exception:
+            self.stop()
+            raise
+        self.is_running = True
+        self._poller = threading.Thread(target=self._poll_loop, name="shard-poller", daemon=True)
+        self._poller.start()
+        print(f"已启动 {self.shard_count} 个处理分片")
+
+    def stop(self):
+        self.is_running = False
+        if self._poller is not None:
+            self._poller.join(timeout=1.0)
+            self._poller = None
+        for shard in self.shards:
+            shard.stop()
+        self.shards = []
+
+    def place(self):
+        """选择负载最低的存活工作进程"""
+        alive = [shard for shard in self.shards if shard.is_alive()]
+        if not alive:
+            raise RuntimeError("没有可用的处理分片")
+        return min(alive, key=lambda shard: shard.load())
+
+    def create_session(self, socketio, executor=None):
+        """
+        在负载最低的工作进程中创建一个会话
+
+        Returns:
+            ShardedMonitoringSystem实例
+        """
+        return ShardedMonitoringSystem(socketio, self.place(), self, executor=executor,
+                                       ring_capacity=int(self.ring_seconds * 500))
+
+    def activate(self, system):
+        with self._lock:
+            self.active.add(system)
+
+    def deactivate(self, system):
+        with self._lock:
+            self.active.discard(system)
+
+    def _poll_loop(self):
+        # 只比较共享内存中的 write_count，有新样本的会话交给处理线程池
+        while self.is_running:
+            time.sleep(self.poll_interval)
+            self.stats['polls'] += 1
+            with self._lock:
+                systems = list(self.active)
+            for system in systems:
+                try:
+                    if not system.has_new_samples():
+                        continue
+                except Exception:
+                    # 会话在取得列表之后已关闭
+                    continue
+                self.stats['wakeups'] += 1
+                system.executor.schedule(system)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: 轮询计数和各工作进程的进程号、会话数、CPU 占用和会话处理统计
+        """
+        return dict(self.stats, active=len(self.active), shards=[shard.get_stats() for shard in self.shards])
+
+
+class ShardedMonitoringSystem(ECGMonitoringSystem):
+    """设备读取和滤波在工作进程中、推送和存储在 web 进程中的监测会话
+
+    lead_buffer 是共享环形缓冲区，由工作进程写入；web 进程不调用 _process_block，
+    _run_pending 只把新写入的样本计入待推送样本并按推送策略推送。
+    文件回放和已创建的数据源对象不能跨进程，分片会话的 local_sources 为 False，
+    /connect 对其拒绝文件数据源，文件回放需要创建单进程会话（sharded=false）；
+    逐样本的 DataStorage 记录也不在分片会话中保留，数据仍由存储阶段写入数据库。
+    """
+
+    local_sources = False
+
+    def __init__(self, socketio, shard, manager, executor=None, ring_capacity=5000):
+        """
+        参数:
+            socketio: SocketIO实例
+            shard: 会话所在工作进程的 ShardHandle
+            manager: ShardManager，负责轮询共享缓冲区
+            executor: 共享的 SessionExecutor；为 None 时创建只有一个工作线程的线程池
+            ring_capacity: 共享环形缓冲区容量（样本数）
+        """
+        self.ring_capacity = ring_capacity
+        super().__init__(socketio, executor=executor or SessionExecutor(max_workers=1))
+        self.shard = shard
+        self.manager = manager
+        self.seen_count = 0   # 已计入待推送样本的 write_count 位置
+        try:
+            shard.request('open', session_id=self.session_id, ring_name=self.lead_buffer.name)
+        except Exception:
+            self.lead_buffer.close()
+            raise
+        shard.sessions.add(self.session_id)
+        print(f"会话 {self.session_id} 分配到处理分片 {shard.shard_id}")
+
+    def _create_buffers(self):
+        # 滤波在工作进程中进行，本进程只需要共享环形缓冲区，不分配滤波器状态和输入缓冲区
+        self.stream_filter = None
+        self.input_buffer = None
+        self.lead_buffer = SharedLeadRing(capacity=self.ring_capacity, leads=12)
+
+    def _connect_remote(self, source_type, options, status, message, label):
+        # 与单进程模式相同的断开、通知和错误处理，数据源在工作进程中创建
+        self.disconnect()
+        try:
+            result = self.shard.request('connect', session_id=self.session_id, source_type=source_type,
+                                        options=options)
+            if result and result.get('sampling_rate'):
+                self.sampling_rate = result['sampling_rate']
+            self.data_source_type = source_type
+            self._notify('connection_status', dict(status, status='connected', type=source_type))
+            self._notify('notification', {'message': message})
+            return True
+        except Exception as e:
+            error_msg = f"{label}连接失败: {str(e)}"
+            print(error_msg)
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
+            self._notify('connection_status', {'status': 'disconnected'})
+            raise
+
+    def connect_serial(self, port='COM7', baudrate=921600, acquisition_manager=None):
+        """连接串口设备；读取器在工作进程中创建，acquisition_manager 不适用"""
+        print(f"Connecting to serial port {port} at {baudrate} baud (shard {self.shard.shard_id})")
+        return self._connect_remote('serial', {'port': port, 'baudrate': baudrate},
+                                    {'port': port, 'baudrate': baudrate},
+                                    f'已连接到串口 {port}，波特率 {baudrate}', '串口')
+
+    def connect_udp(self, local_ip='0.0.0.0', local_port=5001, remote_ip=None, remote_port=None):
+        print(f"Connecting to UDP on {local_ip}:{local_port} (shard {self.shard.shard_id})")
+        options = {'local_ip': local_ip, 'local_port': local_port, 'remote_ip': remote_ip,
+                   'remote_port': remote_port}
+        status = {'local_ip': local_ip, 'local_port': local_port}
+        message = f'已连接到UDP，监听 {local_ip}:{local_port}'
+        if remote_ip and remote_port:
+            status.update(remote_ip=remote_ip, remote_port=remote_port)
+            message += f'，远程端点 {remote_ip}:{remote_port}'
+        return self._connect_remote('udp', options, status, message, 'UDP')
+
+    def connect_bluetooth(self, port, baudrate=921600):
+        print(f"Connecting to bluetooth device on port {port} at {baudrate} baud (shard {self.shard.shard_id})")
+        return self._connect_remote('bluetooth', {'port': port, 'baudrate': int(baudrate)},
+                                    {'port': port, 'baudrate': int(baudrate)},
+                                    f'已连接到蓝牙设备 {port}，波特率 {baudrate}', '蓝牙')
+
+    def disconnect(self):
+        print("Disconnecting from current data source")
+        if self.data_source_type:
+            try:
+                self.shard.request('disconnect', session_id=self.session_id)
+                self.stop()
+            except Exception as e:
+                print(f"Error while disconnecting: {e}")
+        self.data_source_type = None
+        self._notify('connection_status', {'status': 'disconnected'})
+        self._notify('notification', {'message': '已断开数据源连接'})
+
+    def start_monitoring(self, speed=1.0):
+        print(f"Starting monitoring with data source type: {self.data_source_type} (shard {self.shard.shard_id})")
+        if not self.data_source_type:
+            error_msg = "没有连接数据源，无法开始监测"
+            print(error_msg)
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
+            return False
+
+        self.start_timestamp = time.time()
+        self._reset_stream()
+        try:
+            self._start_processing()
+            self.shard.request('start', session_id=self.session_id)
+            source_type_name = {'serial': '串口', 'udp': 'UDP', 'bluetooth': '蓝牙'}.get(self.data_source_type,
+                                                                                     self.data_source_type)
+            self._notify('notification', {'message': f'{source_type_name}数据监测已开始'})
+            return True
+        except Exception as e:
+            self._stop_processing()
+            error_msg = f"启动监测失败: {str(e)}"
+            print(error_msg)
+            self._notify('notification', {'message': error_msg, 'type': 'error'})
+            return False
+
+    def stop(self):
+        print("Stopping ECG monitoring")
+        self.end_timestamp = time.time()
+        try:
+            self.shard.request('stop', session_id=self.session_id)
+        except Exception as e:
+            print(f"停止处理分片读取失败: {e}")
+        # 推送共享缓冲区中剩余的样本后停止推送/存储阶段
+        self._stop_processing()
+        self._notify('notification', {'message': '数据监测已停止'})
+        return {'status': 'stopped'}
+
+    def close(self):
+        """会话被移除时调用：通知工作进程释放数据源，删除共享环形缓冲区"""
+        self.manager.deactivate(self)
+        try:
+            self.shard.request('close', session_id=self.session_id)
+        except Exception as e:
+            print(f"关闭分片会话失败: {e}")
+        self.shard.sessions.discard(self.session_id)
+        self.lead_buffer.close()
+        super().close()
+
+    def _start_processing(self):
+        super()._start_processing()
+        self.manager.activate(self)
+
+    def _stop_processing(self):
+        self.manager.deactivate(self)
+        super()._stop_processing()
+
+    def has_new_samples(self):
+        """工作进程是否写入了尚未计入的样本（只读共享内存中的 write_count）"""
+        return self.lead_buffer.write_count != self.seen_count
+
+    def _run_pending(self):
+        """把工作进程新写入共享环形缓冲区的样本计入待推送样本，按推送策略推送；积压的样本按最大样本数分批推送"""
+        count = self.lead_buffer.write_count
+        while count > self.seen_count:
+            n = min(count - self.seen_count, max(1, self.max_samples - self.sample_counter))
+            self.sample_counter += n
+            self.seen_count += n
+            if self.pending_since is None:
+                self.pending_since = time.time()
+            self._maybe_flush()
+        self._maybe_flush()
+
+    def _reset_stream(self):
+        """从共享缓冲区当前的位置开始推送；滤波器状态由工作进程在开始读取时重置"""
+        self.seen_count = self.emitted_count = self.lead_buffer.write_count
+        self.emit_seq = 0
+        self.sample_counter = 0
+        self.pending_since = None
+        for stats in self.latency_stats.values():
+            stats.reset()
+
+    def get_pipeline_stats(self):
+        stats = super().get_pipeline_stats()
+        stats['shard'] = {
+            'shard_id': self.shard.shard_id,
+            'pid': self.shard.process.pid,
+            'worker': self.shard.stats.get('sessions', {}).get(self.session_id)
+        }
+        return stats
@@ -0,0 +1,178 @@
+# session_executor.py
+
+"""
+多会话共享的处理线程池
+
+每个 ECGMonitoringSystem 原本有自己的处理线程，会话数增加时线程数随之增加。
+SessionExecutor 让所有会话共用固定数量的工作线程：
+    - 读取器回调把数据写入会话的输入环形缓冲区后调用 schedule(system)，
+      会话进入就绪队列（已在队列中或正在处理的会话不重复加入）
+    - 工作线程取出就绪的会话，处理其缓冲区中全部已到达的样本（导联计算、滤波）并按推送策略推送
+    - 同一会话同一时刻只由一个工作线程处理（并持有会话的 run_lock，与停止监测时的最后一次处理互斥），
+      保证会话内的滤波器状态和样本顺序
+    - 注销后的会话不再被调度，注销前已在就绪队列中的会话被跳过
+    - 定时线程每 tick 秒检查各会话的推送延迟目标，到期的会话即使没有新数据也会被调度，
+      设备变慢或停顿时仍按时推送
+    - submit(fn, ...) 把一次性的分析任务交给同一个线程池，与实时处理共享并发上限
+"""
+
+import queue
+import threading
+import time
+
+from ..utils.pipeline_stage import LatencyStats
+
+
+class SessionExecutor:
+    """多会话共享的有界处理线程池"""
+
+    def __init__(self, max_workers=4, tick=0.005):
+        """
+        Args:
+            max_workers: 工作线程数
+            tick: 定时线程检查推送延迟目标的间隔（秒）
+        """
+        self.max_workers = max_workers
+        self.tick = tick
+        self.systems = set()
+        self.is_running = False
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._scheduled = set()     # 在就绪队列中或正在处理的会话
+        self._workers = []
+        self._timer = None
+        self.schedule_delay = LatencyStats()  # 会话从就绪到开始处理的等待时间
+        self.stats = {
+            'runs': 0,
+            'tasks': 0,
+            'timer_wakeups': 0,
+            'skipped': 0,      # 出队时会话已注销而跳过的处理
+            'busy_time': 0.0,
+            'errors': 0
+        }
+
+    def start(self):
+        """启动工作线程和定时线程，重复调用无副作用"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._workers = [threading.Thread(target=self._worker, name=f"session-worker-{i}", daemon=True)
+                         for i in range(self.max_workers)]
+        for worker in self._workers:
+            worker.start()
+        self._timer = threading.Thread(target=self._timer_loop, name="session-timer", daemon=True)
+        self._timer.start()
+        print(f"Session executor started with {self.max_workers} workers")
+
+    def stop(self):
+        """停止线程池，就绪队列中的会话和任务会先处理完"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        for thread in self._workers + [self._timer]:
+            thread.join(timeout=2.0)
+        self._workers = []
+        self._timer = None
+
+    def register(self, system):
+        """登记一个会话，由定时线程检查其推送延迟目标"""
+        self.start()
+        with self._lock:
+            self.systems.add(system)
+
+    def unregister(self, system, timeout=2.0):
+        """注销一个会话，等待正在进行的处理结束"""
+        with self._lock:
+            self.systems.discard(system)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if system not in self._scheduled:
+                    return
+            time.sleep(0.001)
+
+    def schedule(self, system):
+        """把会话加入就绪队列（未登记、已在队列中或正在处理时不加入）"""
+        with self._lock:
+            if system not in self.systems or system in self._scheduled:
+                return
+            self._scheduled.add(system)
+        self._ready.put((system, time.time()))
+
+    def submit(self, fn, *args, **kwargs):
+        """把一次性的任务（例如信号分析）交给线程池执行
+
+        Returns:
+            dict: 任务完成后包含 'result' 或 'error'，'done' 事件在完成时被设置
+        """
+        task = {'done': threading.Event()}
+        self._ready.put((('task', fn, args, kwargs, task), time.time()))
+        return task
+
+    def _worker(self):
+        while self.is_running or not self._ready.empty():
+            try:
+                item, queued_at = self._ready.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            started = time.time()
+            self.schedule_delay.add(started - queued_at)
+            if isinstance(item, tuple):
+                self._run_task(*item[1:])
+            else:
+                self._run_system(item)
+            self.stats['busy_time'] += time.time() - started
+
+    def _run_system(self, system):
+        try:
+            with self._lock:
+                registered = system in self.systems
+            if registered:
+                with system.run_lock:
+                    system._run_pending()
+            else:
+                self.stats['skipped'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"处理会话 {system.session_id} 时出错: {e}")
+        finally:
+            with self._lock:
+                self._scheduled.discard(system)
+            self.stats['runs'] += 1
+        # 处理期间又到达的数据需要再次调度
+        if system in self.systems and system.has_new_samples():
+            self.schedule(system)
+
+    def _run_task(self, fn, args, kwargs, task):
+        try:
+            task['result'] = fn(*args, **kwargs)
+        except Exception as e:
+            self.stats['errors'] += 1
+            task['error'] = str(e)
+        finally:
+            self.stats['tasks'] += 1
+            task['done'].set()
+
+    def _timer_loop(self):
+        while self.is_running:
+            time.sleep(self.tick)
+            now = time.time()
+            with self._lock:
+                systems = list(self.systems)
+            for system in systems:
+                if system._flush_due(now):
+                    self.stats['timer_wakeups'] += 1
+                    self.schedule(system)
+
+    def get_stats(self):
+        """返回线程池的调度统计
+
+        Returns:
+            dict: 工作线程数、会话数、就绪队列长度、处理次数、忙碌时间和调度等待时间分布
+        """
+        stats = dict(self.stats)
+        stats['max_workers'] = self.max_workers
+        stats['sessions'] = len(self.systems)
+        stats['ready'] = self._ready.qsize()
+        stats['schedule_delay'] = self.schedule_delay.get_stats()
+        return stats
@@ -0,0 +1,233 @@
+# shard_worker.py
+
+"""
+处理分片的工作进程（见 process_shards）
+
+每个工作进程负责一组监测会话的设备读取、导联计算和滤波：
+    - 设备读取器（串口 / UDP）在工作进程中创建，块回调直接在工作进程中计算12导联并滤波
+    - 滤波后的导联写入 web 进程创建的共享环形缓冲区（SharedLeadRing），样本数据不经过管道
+    - 管道上只传递控制命令、应答和每秒一次的负载统计
+
+本模块不导入数据库和推送相关的模块，工作进程启动时只加载采集和处理需要的代码。
+
+命令格式 (request_id, command, kwargs)，应答格式 ('reply', request_id, ok, result)，
+统计格式 ('stats', stats)。
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import time
+
+from eventlet.hubs import trampoline
+
+from ..processing.ecg_data_processor import ECGDataProcessor
+from ..processing.stream_filter import StreamingLeadFilter
+from ..utils.ring_buffer import SharedLeadRing
+
+
+class ShardSession:
+    """工作进程中的一个监测会话：数据源 -> 12导联计算 -> 流式滤波 -> 共享环形缓冲区"""
+
+    def __init__(self, session_id, ring_name, sampling_rate=500):
+        self.session_id = session_id
+        self.ring = SharedLeadRing.attach(ring_name)
+        self.data_processor = ECGDataProcessor()
+        self.stream_filter = StreamingLeadFilter(sampling_rate=sampling_rate, leads=self.ring.leads)
+        self.data_source = None
+        self.source_type = None
+        self.stats = {
+            'blocks': 0,
+            'samples': 0,
+            'busy_time': 0.0
+        }
+
+    def connect(self, source_type, options):
+        """在工作进程中创建并打开数据源
+
+        Returns:
+            dict: 数据源的标称采样率
+        """
+        self.disconnect()
+        if source_type in ('serial', 'bluetooth'):
+            from ..devices.serial_reader import SerialPortReader
+            source = SerialPortReader(port=options['port'], baudrate=int(options.get('baudrate', 921600)))
+        elif source_type == 'udp':
+            from ..devices.udp_reader import UDPReader
+            remote_port = options.get('remote_port')
+            source = UDPReader(local_ip=options.get('local_ip', '0.0.0.0'), local_port=int(options['local_port']),
+                               remote_ip=options.get('remote_ip'),
+                               remote_port=int(remote_port) if remote_port else None)
+        else:
+            raise ValueError(f"分片会话不支持的数据源类型: {source_type}")
+        source.register_block_callback(self.handle_new_block)
+        source.open()
+        self.data_source = source
+        self.source_type = source_type
+        clock = getattr(source, 'sample_clock', None)
+        return {'sampling_rate': getattr(clock, 'nominal_rate', None)}
+
+    def start(self):
+        """按数据源的标称采样率重置滤波器后开始读取
+
+        共享环形缓冲区的 write_count 不清零，web 进程从开始时的 write_count 起推送
+        """
+        if self.data_source is None:
+            raise RuntimeError("没有连接数据源")
+        clock = getattr(self.data_source, 'sample_clock', None)
+        rate = getattr(clock, 'nominal_rate', None) or self.stream_filter.sampling_rate
+        if rate != self.stream_filter.sampling_rate:
+            self.stream_filter = StreamingLeadFilter(sampling_rate=rate, leads=self.ring.leads)
+        self.stream_filter.reset()
+        self.data_source.start_reading()
+
+    def stop(self):
+        if self.data_source is not None and hasattr(self.data_source, 'is_running'):
+            self.data_source.is_running = False
+
+    def disconnect(self):
+        if self.data_source is not None:
+            self.stop()
+            try:
+                self.data_source.close()
+            except Exception as e:
+                print(f"关闭数据源出错: {e}")
+        self.data_source = None
+        self.source_type = None
+
+    def close(self):
+        """断开数据源并释放共享内存映射（共享内存由 web 进程删除）"""
+        self.disconnect()
+        self.ring.close()
+
+    def handle_new_block(self, values, timestamps):
+        """读取器块回调：整块计算12导联、滤波后写入共享环形缓冲区
+
+        参数:
+            values: (n, 8) 的原始数据数组
+            timestamps: 长度为 n 的时间戳数组
+        """
+        started = time.perf_counter()
+        leads_12 = self.data_processor.compute_12_leads_block(values)
+        self.ring.append(self.stream_filter.process(leads_12.T), timestamps)
+        self.stats['busy_time'] += time.perf_counter() - started
+        self.stats['blocks'] += 1
+        self.stats['samples'] += len(values)
+
+    def get_stats(self):
+        stats = dict(self.stats, source_type=self.source_type, write_count=self.ring.write_count)
+        stats['running'] = bool(getattr(self.data_source, 'is_running', False))
+        source_stats = getattr(self.data_source, 'get_stats', None)
+        if source_stats is not None:
+            try:
+                stats['source'] = source_stats()
+            except Exception:
+                pass
+        return stats
+
+
+class ShardWorker:
+    """工作进程的命令循环：等待管道上的命令，每 stats_interval 秒上报一次负载"""
+
+    def __init__(self, shard_id, conn, stats_interval=1.0):
+        self.shard_id = shard_id
+        self.conn = conn
+        self.stats_interval = stats_interval
+        self.sessions = {}   # 会话ID -> ShardSession
+        self.is_running = False
+        self._last_report = (time.time(), time.process_time())
+
+    def run(self):
+        self.is_running = True
+        # 启动后立即上报一次，web 进程据此确认工作进程已就绪
+        next_report = time.time()
+        while self.is_running:
+            try:
+                trampoline(self.conn.fileno(), read=True, timeout=max(0.0, next_report - time.time()))
+            except eventlet.Timeout:
+                pass
+            try:
+                while self.is_running and self.conn.poll():
+                    self._handle(self.conn.recv())
+                if time.time() >= next_report:
+                    self.conn.send(('stats', self.get_stats()))
+                    next_report = time.time() + self.stats_interval
+            except (EOFError, OSError):
+                # web 进程已退出
+                break
+        for session in list(self.sessions.values()):
+            session.close()
+        self.sessions.clear()
+
+    def _handle(self, message):
+        request_id, command, kwargs = message
+        try:
+            result = getattr(self, f'_cmd_{command}')(**kwargs)
+            reply = ('reply', request_id, True, result)
+        except Exception as e:
+            print(f"处理分片 {self.shard_id} 执行 {command} 出错: {e}")
+            reply = ('reply', request_id, False, str(e))
+        self.conn.send(reply)
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"分片中没有会话 {session_id}")
+        return session
+
+    def _cmd_open(self, session_id, ring_name):
+        self.sessions[session_id] = ShardSession(session_id, ring_name)
+        return {'pid': os.getpid()}
+
+    def _cmd_connect(self, session_id, source_type, options):
+        return self._session(session_id).connect(source_type, options)
+
+    def _cmd_start(self, session_id):
+        self._session(session_id).start()
+
+    def _cmd_stop(self, session_id):
+        self._session(session_id).stop()
+
+    def _cmd_disconnect(self, session_id):
+        self._session(session_id).disconnect()
+
+    def _cmd_close(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def _cmd_shutdown(self):
+        self.is_running = False
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: 分片编号、进程号、上次上报以来的 CPU 占用比例和各会话的处理统计
+        """
+        now, cpu = time.time(), time.process_time()
+        last_wall, last_cpu = self._last_report
+        self._last_report = (now, cpu)
+        return {
+            'shard_id': self.shard_id,
+            'pid': os.getpid(),
+            'cpu': (cpu - last_cpu) / (now - last_wall) if now > last_wall else 0.0,
+            'sessions': {session_id: session.get_stats() for session_id, session in self.sessions.items()}
+        }
+
+
+def shard_main(shard_id, conn):
+    """工作进程入口"""
+    print(f"处理分片 {shard_id} 已启动，进程号 {os.getpid()}")
+    try:
+        ShardWorker(shard_id, conn).run()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    # 由 process_shards.ShardHandle 启动：python -m backend.services.shard_worker <分片编号> <管道文件描述符>
+    import sys
+    from multiprocessing.connection import Connection
+
+    shard_main(int(sys.argv[1]), Connection(int(sys.argv[2])))
@@ -0,0 +1,347 @@
+# stream_service.py
+
+"""
+ecg_data 按会话订阅推送与分级抽取（LOD）
+
+每个监测会话（ECGMonitoringSystem.session_id）的数据只推送到订阅了该会话的房间，
+服务端出口流量随实际订阅增长，而不是随 会话数 × 客户端数 增长：
+    - 客户端连接后默认订阅主监测系统（ecg_manager.get_ecg_system()）的全速率全部导联
+    - 发送 ecg_subscribe {'session_id': ..., 'leads': [0, 1], 'points_per_second': 200}
+      订阅某个会话的导联子集；points_per_second 为 None 时接收全速率 ecg_data，
+      否则接收抽取后的 ecg_data_lod。session_id 省略时为主监测系统的会话
+    - 发送 ecg_unsubscribe {'session_id': ...} 取消对该会话的订阅
+    - 一个客户端可以同时订阅多个会话，每个会话一个订阅
+    - 订阅了某个会话任一数据流的客户端同时在该会话的会话房间（session_room）中，接收会话的
+      connection_status、notification 和 respiration_data（见 emit_session_event）
+
+会话、点率和导联子集相同的客户端在同一个房间，每个房间每块数据只编码一次，由 Socket.IO
+分发给房间内所有客户端。LOD 的每个抽取级别（桶长 = ceil(2 * 采样率 / 点率)）在每个会话中
+只对 12 个导联计算一次最小/最大值包络（见 processing.decimation）。没有订阅的会话不编码任何负载。
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+
+from ..processing.decimation import MinMaxDecimator
+from ..utils.ecg_wire import encode_ecg_block
+
+LEAD_COUNT = 12
+ALL_LEADS = list(range(LEAD_COUNT))
+
+
+def build_ecg_payload(leads, times, first_index, seq, sampling_rate, wire_format='json', session_id=None,
+                      lead_ids=None, **extra):
+    """
+    编码一个 ecg_data / ecg_data_lod 负载
+
+    Args:
+        leads: (k, n) 的导联数据
+        times: 长度为 n 的时间戳
+        first_index: 第一个样本（点）的序号
+        seq: 事件序号
+        sampling_rate: 样本（点）率，写入二进制包头
+        wire_format: 'json' 或二进制的 'int16' / 'float32'
+        session_id: 会话ID
+        lead_ids: 导联下标，只推送导联子集时写入 JSON 负载（二进制包头总是带导联下标）
+        extra: LOD 负载的 points_per_second 和 decimation；JSON 负载中原样写入，
+            二进制负载中点率即包头的 sampling_rate，decimation 写入包头
+
+    Returns:
+        dict 或 bytes: JSON 负载或二进制负载
+    """
+    if wire_format != 'json':
+        # 二进制负载：包头 + 打包的导联数据，作为 Socket.IO 二进制附件发送；
+        # 时间戳间隔不均匀时（丢包、LOD 的最小/最大值点）包头后带时间偏移数组
+        unsupported = set(extra) - {'points_per_second', 'decimation'}
+        if unsupported:
+            raise ValueError(f"二进制负载不支持的字段: {sorted(unsupported)}")
+        return encode_ecg_block(leads, float(times[0]), sampling_rate, first_sample_index=first_index, seq=seq,
+                                session_id=session_id, dtype=wire_format, lead_ids=lead_ids,
+                                decimation=extra.get('decimation', 0), timestamps=times)
+    payload = {
+        'leads': np.where(np.isnan(leads), None, leads).tolist(),  # 缺失样本（NaN）以 null 发送
+        'time_stamps': times.tolist(),
+        'seq': seq,
+        'first_sample_index': first_index,
+        'sample_count': len(times),
+        'session_id': session_id
+    }
+    if lead_ids is not None:
+        payload['lead_ids'] = lead_ids
+    payload.update(extra)
+    return payload
+
+
+class ECGStreamService:
+    """ecg_data 按会话订阅管理和分级抽取推送"""
+
+    def __init__(self, socketio=None):
+        """
+        Args:
+            socketio: SocketIO实例，为 None 时不注册事件处理（监测系统退回广播）
+        """
+        self.socketio = socketio
+        self.clients = {}          # sid -> {会话ID: 房间名}
+        self.rooms = {}            # 房间名 -> {'session_id', 'points_per_second', 'leads', 'members', 'seq', 'stats'}
+        self.decimators = {}       # (会话ID, 桶长) -> MinMaxDecimator
+        self._lock = threading.Lock()
+        self.stats = {
+            'events': 0,
+            'lod_events': 0,
+            'lod_points': 0,
+            'levels_computed': 0,
+            'blocks_unsubscribed': 0  # 没有任何订阅、未编码的数据块
+        }
+        if socketio is not None:
+            self._register_handlers(socketio)
+
+    def _register_handlers(self, socketio):
+        from flask import request
+        from flask_socketio import join_room, leave_room
+
+        @socketio.on('connect')
+        def on_connect(auth=None):
+            session_id = self._default_session()
+            if session_id is not None:
+                room, subscription = self.room_for({'session_id': session_id})
+                self._move_client(request.sid, room, subscription, join_room, leave_room)
+
+        @socketio.on('disconnect')
+        def on_disconnect(*args):
+            with self._lock:
+                for room in self.clients.pop(request.sid, {}).values():
+                    self._release_room(room)
+
+        @socketio.on('ecg_subscribe')
+        def on_subscribe(data=None):
+            data = dict(data or {})
+            data['session_id'] = data.get('session_id') or self._default_session()
+            try:
+                room, subscription = self.room_for(data)
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+            self._move_client(request.sid, room, subscription, join_room, leave_room)
+            return dict(subscription, success=True, room=room)
+
+        @socketio.on('ecg_unsubscribe')
+        def on_unsubscribe(data=None):
+            session_id = (data or {}).get('session_id') or self._default_session()
+            with self._lock:
+                room = self.clients.get(request.sid, {}).pop(session_id, None)
+                if room is not None:
+                    leave_room(room, sid=request.sid)
+                    leave_room(session_room(session_id), sid=request.sid)
+                    self._release_room(room)
+            return {'success': room is not None, 'session_id': session_id}
+
+    @staticmethod
+    def _default_session():
+        # 主监测系统的会话，导入放在函数内部避免循环导入
+        from .ecg_manager import get_ecg_system
+        system = get_ecg_system()
+        return system.session_id if system is not None else None
+
+    def room_for(self, data):
+        """
+        根据订阅参数返回房间名和规范化的订阅
+
+        Args:
+            data (dict): {'session_id': 会话ID, 'points_per_second': 每个导联每秒的点数（None 为全速率）,
+                          'leads': 导联下标列表（None 为全部）}
+
+        Returns:
+            tuple: (房间名, {'session_id', 'points_per_second', 'leads'})
+        """
+        session_id = data.get('session_id')
+        if not session_id:
+            raise ValueError("缺少会话ID")
+        leads = data.get('leads')
+        leads = sorted({int(lead) for lead in leads}) if leads else ALL_LEADS
+        if leads[0] < 0 or leads[-1] >= LEAD_COUNT:
+            raise ValueError(f"导联下标超出范围: {leads}")
+        lead_key = 'all' if leads == ALL_LEADS else '-'.join(map(str, leads))
+
+        points_per_second = data.get('points_per_second')
+        if points_per_second is None:
+            room = f"ecg_{session_id}_full_{lead_key}"
+        else:
+            points_per_second = float(points_per_second)
+            if points_per_second <= 0:
+                raise ValueError("points_per_second 必须大于 0")
+            # 点率取整到整数，使相近的请求共用一个级别
+            points_per_second = max(1, int(round(points_per_second)))
+            room = f"ecg_{session_id}_lod_{points_per_second}_{lead_key}"
+        return room, {'session_id': session_id, 'points_per_second': points_per_second, 'leads': leads}
+
+    def _move_client(self, sid, room, subscription, join_room, leave_room):
+        with self._lock:
+            subscriptions = self.clients.setdefault(sid, {})
+            previous = subscriptions.get(subscription['session_id'])
+            if previous == room:
+                return
+            if previous is not None:
+                leave_room(previous, sid=sid)
+                self._release_room(previous)
+            else:
+                join_room(session_room(subscription['session_id']), sid=sid)
+            join_room(room, sid=sid)
+            subscriptions[subscription['session_id']] = room
+            entry = self.rooms.get(room)
+            if entry is None:
+                entry = self.rooms[room] = dict(subscription, members=0, seq=0, stats={
+                    'events': 0, 'values': 0, 'bytes': 0, 'egress_values': 0, 'egress_bytes': 0,
+                    'encode_time': 0.0
+                })
+            entry['members'] += 1
+
+    def _release_room(self, room):
+        # 在锁内调用
+        entry = self.rooms.get(room)
+        if entry is None:
+            return
+        entry['members'] -= 1
+        if entry['members'] <= 0:
+            del self.rooms[room]
+
+    def publish(self, session_id, leads, times, first_index, sampling_rate, seq, wire_format='json'):
+        """
+        把一个会话的一块新数据推送到订阅了该会话的房间
+
+        Args:
+            session_id: 会话ID
+            leads: (12, n) 的导联数据
+            times: 长度为 n 的时间戳
+            first_index: 第一个样本的序号
+            sampling_rate: 采样率（Hz）
+            seq: 全速率 ecg_data 的事件序号
+            wire_format: 'json' 或二进制的 'int16' / 'float32'
+
+        Returns:
+            int: 推送的房间数
+        """
+        with self._lock:
+            rooms = [(room, entry) for room, entry in self.rooms.items() if entry['session_id'] == session_id]
+        if not rooms:
+            self.stats['blocks_unsubscribed'] += 1
+            return 0
+
+        # 全速率房间直接编码导联子集，LOD 房间按桶长分组，每个级别只抽取一次
+        levels = {}
+        for room, entry in rooms:
+            if entry['points_per_second'] is None:
+                subset = leads if entry['leads'] == ALL_LEADS else leads[entry['leads']]
+                self._emit_room('ecg_data', room, entry, subset, times, first_index, sampling_rate, seq,
+                                wire_format)
+            else:
+                factor = max(1, math.ceil(2 * sampling_rate / entry['points_per_second']))
+                levels.setdefault(factor, []).append((room, entry))
+        for key in list(self.decimators):
+            if key[0] == session_id and key[1] not in levels:
+                del self.decimators[key]
+
+        for factor, members in levels.items():
+            decimator = self.decimators.get((session_id, factor))
+            if decimator is None:
+                decimator = self.decimators[(session_id, factor)] = MinMaxDecimator(factor, leads=LEAD_COUNT)
+            points, point_times, first_point = decimator.process(leads, times, first_index)
+            self.stats['levels_computed'] += 1
+            if first_point is None:
+                continue
+            point_rate = sampling_rate * 2 / factor if factor > 1 else sampling_rate
+            for room, entry in members:
+                self._emit_room('ecg_data_lod', room, entry, points[entry['leads']], point_times, first_point,
+                                point_rate, None, wire_format, factor=factor)
+                self.stats['lod_events'] += 1
+                self.stats['lod_points'] += len(entry['leads']) * len(point_times)
+        return len(rooms)
+
+    def _emit_room(self, event, room, entry, subset, times, first_index, rate, seq, wire_format, factor=None):
+        with self._lock:
+            if room not in self.rooms:
+                return
+            if seq is None:
+                # LOD 房间的点序列独立编号
+                entry['seq'] += 1
+                seq = entry['seq']
+            members = entry['members']
+
+        started = time.perf_counter()
+        lead_ids = None if entry['leads'] == ALL_LEADS and factor is None else entry['leads']
+        extra = {} if factor is None else {'points_per_second': rate, 'decimation': factor}
+        payload = build_ecg_payload(subset, times, first_index, seq, rate, wire_format,
+                                    session_id=entry['session_id'], lead_ids=lead_ids, **extra)
+        self.socketio.emit(event, payload, to=room)
+
+        stats = entry['stats']
+        stats['encode_time'] += time.perf_counter() - started
+        stats['events'] += 1
+        stats['values'] += subset.size
+        stats['egress_values'] += subset.size * members
+        if isinstance(payload, (bytes, bytearray)):
+            stats['bytes'] += len(payload)
+            stats['egress_bytes'] += len(payload) * members
+        self.stats['events'] += 1
+
+    def get_stats(self):
+        """
+        返回各房间的订阅人数和推送开销
+
+        Returns:
+            dict: 总体计数，以及每个房间的事件数、编码的数值个数、编码耗时和按订阅人数放大后的出口流量
+                  （bytes 只统计二进制负载，JSON 负载的大小由 Socket.IO 序列化时决定）
+        """
+        with self._lock:
+            rooms = {room: {'session_id': entry['session_id'], 'members': entry['members'],
+                            'points_per_second': entry['points_per_second'], 'leads': entry['leads'],
+                            **entry['stats']} for room, entry in self.rooms.items()}
+            sessions = {}
+            for entry in rooms.values():
+                session = sessions.setdefault(entry['session_id'], {'rooms': 0, 'members': 0})
+                session['rooms'] += 1
+                session['members'] += entry['members']
+        return dict(self.stats, clients=len(self.clients), rooms=rooms, sessions=sessions,
+                    levels=sorted(self.decimators))
+
+
+# 推送服务实例，由 init_stream_service 创建
+stream_service = None
+
+def init_stream_service(socketio):
+    """
+    初始化推送服务并注册 Socket.IO 事件处理
+    """
+    global stream_service
+    stream_service = ECGStreamService(socketio)
+    return stream_service
+
+def get_stream_service():
+    """
+    获取推送服务实例
+    """
+    return stream_service
+
+def session_room(session_id):
+    """
+    会话房间名：订阅了该会话任一数据流的客户端都在其中
+    """
+    return f"session_{session_id}"
+
+def emit_session_event(socketio, session_id, event, data):
+    """
+    把一个会话的状态事件（connection_status、notification、respiration_data）发送到会话房间，
+    负载中带会话ID；推送服务未初始化或没有会话ID时广播给所有客户端
+
+    Args:
+        socketio: SocketIO实例
+        session_id: 会话ID
+        event: 事件名
+        data (dict): 事件负载
+    """
+    payload = dict(data, session_id=session_id)
+    if stream_service is None or session_id is None:
+        socketio.emit(event, payload)
+    else:
+        socketio.emit(event, payload, to=session_room(session_id))
@@ -15,7 +15,8 @@ let chartConfig = {
             tension: 0.1,
             borderWidth: 1.5,
             pointRadius: 0,
-            fill: false
+            fill: false,
+            spanGaps: false  // 丢包填补的缺失样本以 null 发送，在此处断开波形
         }]
     },
     options: {
@@ -69,6 +70,114 @@ let dataBuffer = {
 // 最大缓冲区大小
 const MAX_BUFFER_SIZE = 5000;
 
+// 增量推送的拼接状态：事件序号和下一个期望的样本序号
+// sessionId 为图表显示的会话，null 表示服务端连接时自动订阅的主监测会话（收到第一块数据时确定）；
+// subscribing 为 true 时订阅请求尚未确认
+let streamState = {
+    lastSeq: null,
+    nextSampleIndex: null,
+    missedEvents: 0,
+    gaps: 0,
+    leadIds: null,
+    sessionId: null,
+    subscribing: false
+};
+
+// 最近一次 subscribeEcgStream 的参数，重连后按此重新订阅
+let streamSubscription = null;
+
+// 服务端抽取（LOD）：每个导联每秒的点数，null 表示接收全速率 ecg_data
+const LOD_POINTS_PER_SECOND = null;
+
+// 订阅服务端抽取后的 ecg_data_lod，pointsPerSecond 为 null 时接收全速率 ecg_data
+// leads 为导联下标数组，省略时订阅全部 12 个导联；sessionId 省略时为主监测系统的会话
+function subscribeEcgStream(pointsPerSecond, leads, sessionId) {
+    const target = sessionId || null;
+    streamSubscription = {pointsPerSecond: pointsPerSecond, leads: leads, sessionId: target};
+    if (streamState.sessionId !== target) {
+        // 切换会话：先取消原会话（或自动订阅的主会话）的订阅，服务端不再推送原会话的数据
+        chartSocket.emit('ecg_unsubscribe', {session_id: streamState.sessionId});
+        streamState.sessionId = target;
+    }
+    resetDataBuffer();
+    streamState.subscribing = true;
+    const request = {points_per_second: pointsPerSecond, leads: leads || null, session_id: target};
+    chartSocket.emit('ecg_subscribe', request, (reply) => {
+        streamState.subscribing = false;
+        if (!reply || !reply.success) {
+            console.error('订阅ECG数据流失败', reply);
+            return;
+        }
+        // 二进制负载不带导联下标，按订阅结果映射
+        streamState.leadIds = reply.leads;
+        streamState.sessionId = reply.session_id;
+    });
+}
+
+// 是否显示这块数据：只接收当前会话的数据，切换会话后仍在途中的原会话数据直接丢弃
+function acceptsSession(sessionId) {
+    if (!sessionId) {
+        return true;
+    }
+    if (streamState.sessionId === null) {
+        // 主会话：订阅确认前无法判断数据来自哪个会话
+        if (streamState.subscribing) {
+            return false;
+        }
+        streamState.sessionId = sessionId;
+    }
+    return sessionId === streamState.sessionId;
+}
+
+// 清空缓冲区和拼接状态（服务端重新开始监测时）
+function resetDataBuffer() {
+    dataBuffer.leads = Array(12).fill().map(() => []);
+    dataBuffer.timeStamps = [];
+    streamState.lastSeq = null;
+    streamState.nextSampleIndex = null;
+}
+
+// 按事件序号和样本序号拼接一块数据：去掉与已收到数据重叠的部分，缺口处插入 null 断开波形
+// 返回 {leads, timeStamps}，没有新样本时返回 null
+function stitchEcgBlock(data) {
+    let leads = data.leads;
+    let timeStamps = data.time_stamps;
+    if (data.seq === undefined || data.first_sample_index === undefined) {
+        return {leads: leads, timeStamps: timeStamps};
+    }
+
+    if (streamState.lastSeq !== null && data.seq <= streamState.lastSeq) {
+        // 事件序号回退：服务端重新开始了监测
+        resetDataBuffer();
+    } else if (streamState.lastSeq !== null && data.seq !== streamState.lastSeq + 1) {
+        streamState.missedEvents += data.seq - streamState.lastSeq - 1;
+    }
+    streamState.lastSeq = data.seq;
+
+    const expected = streamState.nextSampleIndex;
+    streamState.nextSampleIndex = data.first_sample_index + timeStamps.length;
+    if (expected === null) {
+        return {leads: leads, timeStamps: timeStamps};
+    }
+
+    const offset = expected - data.first_sample_index;
+    if (offset > 0) {
+        // 与已收到的样本重叠，只保留新样本
+        if (offset >= timeStamps.length) {
+            return null;
+        }
+        leads = leads.map(lead => lead.slice(offset));
+        timeStamps = timeStamps.slice(offset);
+    } else if (offset < 0) {
+        // 有样本没有收到：插入一个 null 点，图表在此断开
+        streamState.gaps += 1;
+        console.warn(`ECG数据缺少 ${-offset} 个样本 (序号 ${expected} 到 ${data.first_sample_index - 1})`);
+        leads = leads.map(lead => [null].concat(lead));
+        timeStamps = [timeStamps[0]].concat(timeStamps);
+    }
+    return {leads: leads, timeStamps: timeStamps};
+}
+
 // 初始化图表
 function initChart() {
     const ctx = document.getElementById('ecg-chart').getContext('2d');
@@ -79,6 +188,19 @@ function initChart() {
     
     // 监听ECG数据
     chartSocket.on('ecg_data', handleEcgData);
+    chartSocket.on('ecg_data_lod', handleEcgData);
+    
+    // 服务端在每次连接时把客户端订阅到主会话的全速率数据，重连后按原订阅重新订阅
+    chartSocket.on('connect', () => {
+        streamState.sessionId = null;
+        streamState.subscribing = false;
+        if (streamSubscription) {
+            subscribeEcgStream(streamSubscription.pointsPerSecond, streamSubscription.leads,
+                               streamSubscription.sessionId);
+        } else if (LOD_POINTS_PER_SECOND) {
+            subscribeEcgStream(LOD_POINTS_PER_SECOND);
+        }
+    });
 }
 
 // 设置导联按钮事件监听器
@@ -104,16 +226,33 @@ function setupLeadButtons() {
 
 // 处理接收到的ECG数据
 function handleEcgData(data) {
+    // 二进制负载（ArrayBuffer）先解码为与 JSON 相同的结构
+    if (data instanceof ArrayBuffer) {
+        data = decodeEcgBinary(data);
+    }
+    
     // 检查数据格式
     if (!data || !data.leads || !data.time_stamps) {
         console.error('接收到的ECG数据格式不正确', data);
         return;
     }
     
-    // 添加数据到缓冲区
-    for (let i = 0; i < data.leads.length; i++) {
+    if (!acceptsSession(data.session_id)) {
+        return;
+    }
+    
+    // 按序号拼接增量数据
+    const block = stitchEcgBlock(data);
+    if (!block) {
+        return;
+    }
+    
+    // 添加数据到缓冲区（订阅了导联子集时按导联下标放入对应位置）
+    const leadIds = data.lead_ids || (block.leads.length < dataBuffer.leads.length ? streamState.leadIds : null);
+    for (let j = 0; j < block.leads.length; j++) {
+        const i = leadIds ? leadIds[j] : j;
         if (i < dataBuffer.leads.length) {
-            dataBuffer.leads[i] = dataBuffer.leads[i].concat(data.leads[i]);
+            dataBuffer.leads[i] = dataBuffer.leads[i].concat(block.leads[j]);
             
             // 限制缓冲区大小
             if (dataBuffer.leads[i].length > MAX_BUFFER_SIZE) {
@@ -123,7 +262,7 @@ function handleEcgData(data) {
     }
     
     // 添加时间戳
-    dataBuffer.timeStamps = dataBuffer.timeStamps.concat(data.time_stamps);
+    dataBuffer.timeStamps = dataBuffer.timeStamps.concat(block.timeStamps);
     
     // 限制时间戳缓冲区大小
     if (dataBuffer.timeStamps.length > MAX_BUFFER_SIZE) {
@@ -0,0 +1,91 @@
+// ecg-wire.js - ecg_data / ecg_data_lod 二进制负载解码（格式见 backend/utils/ecg_wire.py）
+
+const ECG_WIRE_VERSION = 2;
+const ECG_WIRE_FIXED_HEADER_SIZE = 44;
+const ECG_WIRE_INT16 = 1;
+const ECG_WIRE_FLOAT32 = 2;
+const ECG_WIRE_INT16_MISSING = -32768;
+const ECG_WIRE_FLAG_TIME_OFFSETS = 0x01;
+
+// 把二进制负载解码为与 JSON 格式相同的对象 {leads, time_stamps, seq, first_sample_index, lead_ids, ...}
+// 导联数据用 TypedArray 视图直接读取，缺失样本转换为 null
+function decodeEcgBinary(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+    if (magic !== 'ECGB' || view.getUint8(4) !== ECG_WIRE_VERSION) {
+        console.error('无法识别的ecg_data二进制负载');
+        return null;
+    }
+
+    const dtype = view.getUint8(5);
+    const leadCount = view.getUint16(6, true);
+    const samples = view.getUint32(8, true);
+    const firstSampleIndex = Number(view.getBigUint64(12, true));
+    const firstTimestamp = view.getFloat64(20, true);
+    const samplingRate = view.getFloat32(28, true);
+    const scale = view.getFloat32(32, true);
+    const seq = view.getUint32(36, true);
+    const decimation = view.getUint16(40, true);
+    const flags = view.getUint8(42);
+    const sessionLength = view.getUint8(43);
+
+    let offset = ECG_WIRE_FIXED_HEADER_SIZE;
+    const sessionId = sessionLength
+        ? new TextDecoder().decode(new Uint8Array(buffer, offset, sessionLength))
+        : null;
+    offset += sessionLength;
+    const leadIds = Array.from(new Uint8Array(buffer, offset, leadCount));
+    // 变长部分填充到 8 字节对齐
+    offset = Math.ceil((offset + leadCount) / 8) * 8;
+
+    const timeStamps = new Array(samples);
+    if (flags & ECG_WIRE_FLAG_TIME_OFFSETS) {
+        // 时间戳间隔不均匀：使用随负载发送的相对时间偏移
+        const offsets = new Float32Array(buffer, offset, samples);
+        for (let i = 0; i < samples; i++) {
+            timeStamps[i] = firstTimestamp + offsets[i];
+        }
+        offset += 4 * samples;
+    } else {
+        for (let i = 0; i < samples; i++) {
+            timeStamps[i] = firstTimestamp + i / samplingRate;
+        }
+    }
+
+    const count = leadCount * samples;
+    const raw = dtype === ECG_WIRE_INT16
+        ? new Int16Array(buffer, offset, count)
+        : new Float32Array(buffer, offset, count);
+
+    const leads = [];
+    for (let lead = 0; lead < leadCount; lead++) {
+        const values = new Array(samples);
+        const start = lead * samples;
+        for (let i = 0; i < samples; i++) {
+            const v = raw[start + i];
+            if (dtype === ECG_WIRE_INT16) {
+                values[i] = v === ECG_WIRE_INT16_MISSING ? null : v * scale;
+            } else {
+                values[i] = Number.isNaN(v) ? null : v;
+            }
+        }
+        leads.push(values);
+    }
+
+    const data = {
+        leads: leads,
+        time_stamps: timeStamps,
+        seq: seq,
+        first_sample_index: firstSampleIndex,
+        sample_count: samples,
+        sampling_rate: samplingRate,
+        session_id: sessionId,
+        lead_ids: leadIds
+    };
+    if (decimation) {
+        // 与 JSON 格式的 ecg_data_lod 字段相同
+        data.points_per_second = samplingRate;
+        data.decimation = decimation;
+    }
+    return data;
+}
@@ -0,0 +1,230 @@
+# serial_simulator.py
+
+"""
+基于 Linux 伪终端的串口 ECG 设备模拟器
+
+模拟器打开一对伪终端，在主端按给定帧率写入合成的 8 通道 Firewater 数据流
+（帧尾 00 00 80 7F），从端的设备路径可以直接交给 SerialPortReader 打开。
+可选地按比例注入损坏字节，用于测试解码器的重同步。
+
+用法:
+    python -m backend.tools.serial_simulator --rate 500 --corrupt 0.001
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import time
+import tty
+from collections import deque
+
+import numpy as np
+
+from backend.devices.firewater import encode_frames
+
+# 写入线程使用原生线程和time，不依赖eventlet调度
+_native_threading = eventlet.patcher.original('threading')
+_native_time = eventlet.patcher.original('time')
+
+
+def synthetic_ecg(rate, channels=8, heart_rate=72.0, duration=None):
+    """生成一个心动周期的合成多通道 ECG（PQRST 高斯波形叠加）
+
+    Args:
+        rate: 采样率（Hz）
+        channels: 通道数
+        heart_rate: 心率（次/分）
+        duration: 生成的时长（秒），默认一个心动周期
+
+    Returns:
+        np.ndarray: (n, channels) 的 float32 数组，单位 mV
+    """
+    period = 60.0 / heart_rate
+    n = int(round((duration or period) * rate))
+    t = (np.arange(n) / rate) % period
+    # (中心时刻, 宽度, 幅度)：P, Q, R, S, T
+    waves = ((0.20, 0.025, 0.15), (0.34, 0.010, -0.10), (0.37, 0.012, 1.20),
+             (0.40, 0.010, -0.25), (0.60, 0.040, 0.30))
+    beat = np.zeros(n)
+    for center, width, amplitude in waves:
+        beat += amplitude * np.exp(-0.5 * ((t - center) / width) ** 2)
+    # 各通道使用不同的增益，模拟 I, II, V1..V6 的幅度差异
+    gains = np.linspace(0.6, 1.4, channels)
+    gains[2 % channels] *= -0.5
+    return (beat[:, None] * gains[None, :]).astype(np.float32)
+
+
+class SerialDeviceSimulator:
+    """伪终端串口设备模拟器"""
+
+    def __init__(self, rate=500, channels=8, corrupt_rate=0.0, embed_sequence=True,
+                 write_interval=0.002, seed=None):
+        """
+        Args:
+            rate: 帧率（Hz），支持 250 Hz 到 8 kHz 及以上
+            channels: 每帧通道数
+            corrupt_rate: 每帧被注入损坏字节的概率
+            embed_sequence: 是否在最后一个通道写入帧序号（用于测量丢帧和延迟）
+            write_interval: 写入线程的节奏（秒），每次写入期间应发的全部帧
+            seed: 随机种子
+        """
+        self.rate = rate
+        self.channels = channels
+        self.corrupt_rate = corrupt_rate
+        self.embed_sequence = embed_sequence
+        self.write_interval = write_interval
+        self.rng = np.random.default_rng(seed)
+
+        self.master_fd = None
+        self.slave_fd = None
+        self.port = None
+        self.is_running = False
+        self._thread = None
+        self._waveform = synthetic_ecg(rate, channels)
+
+        # 每次写入记录 (首帧序号, 写入时间)，用于计算端到端延迟
+        self.write_log = deque(maxlen=1000000)
+        self.stats = {
+            'frames_sent': 0,
+            'bytes_sent': 0,
+            'frames_corrupted': 0,
+            'writes': 0,
+            'start_time': None,
+            'end_time': None
+        }
+
+    def open(self):
+        """打开伪终端，返回从端设备路径"""
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        return self.port
+
+    def close(self):
+        self.stop()
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master_fd = None
+        self.slave_fd = None
+
+    def start(self, duration=None):
+        """启动写入线程
+
+        Args:
+            duration: 写入时长（秒），None 表示持续到 stop()
+        """
+        if self.master_fd is None:
+            self.open()
+        self.is_running = True
+        self._thread = _native_threading.Thread(target=self._write_loop, args=(duration,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.is_running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def join(self, timeout=None):
+        """等待写入线程结束（有限时长模式）"""
+        if self._thread:
+            self._thread.join(timeout)
+        return not (self._thread and self._thread.is_alive())
+
+    def make_frames(self, first_seq, n):
+        """生成序号从 first_seq 开始的 n 帧采样值"""
+        idx = np.arange(first_seq, first_seq + n) % len(self._waveform)
+        values = self._waveform[idx]
+        if self.embed_sequence:
+            # float32 可精确表示 2^24 以内的整数
+            values[:, -1] = np.arange(first_seq, first_seq + n) % (1 << 24)
+        return values
+
+    def _corrupt(self, payload, n):
+        """按概率在帧中插入随机字节"""
+        hits = np.flatnonzero(self.rng.random(n) < self.corrupt_rate)
+        if len(hits) == 0:
+            return payload
+        frame_size = 4 * self.channels + 4
+        data = bytearray(payload)
+        # 从后往前插入，避免前面的插入改变后面的偏移
+        for i in hits[::-1]:
+            pos = int(i) * frame_size + int(self.rng.integers(0, frame_size))
+            data[pos:pos] = self.rng.integers(0, 256, int(self.rng.integers(1, 8)), dtype=np.uint8).tobytes()
+        self.stats['frames_corrupted'] += len(hits)
+        return bytes(data)
+
+    def _write_loop(self, duration):
+        sent = 0
+        start = _native_time.monotonic()
+        self.stats['start_time'] = time.time()
+        total = None if duration is None else int(self.rate * duration)
+
+        while self.is_running and (total is None or sent < total):
+            due = int((_native_time.monotonic() - start) * self.rate) + 1
+            if total is not None:
+                due = min(due, total)
+            if due > sent:
+                payload = encode_frames(self.make_frames(sent, due - sent))
+                if self.corrupt_rate > 0:
+                    payload = self._corrupt(payload, due - sent)
+                try:
+                    self.write_log.append((sent, time.time()))
+                    os.write(self.master_fd, payload)
+                except OSError as e:
+                    print(f"模拟器写入失败: {e}")
+                    break
+                self.stats['frames_sent'] += due - sent
+                self.stats['bytes_sent'] += len(payload)
+                self.stats['writes'] += 1
+                sent = due
+            _native_time.sleep(self.write_interval)
+
+        self.stats['end_time'] = time.time()
+        self.is_running = False
+
+    def send_times(self, sequences):
+        """查询给定帧序号的写入时间
+
+        Args:
+            sequences: 帧序号数组
+
+        Returns:
+            np.ndarray: 对应的写入时间（time.time()）
+        """
+        log = np.array(self.write_log, dtype=np.float64)
+        pos = np.searchsorted(log[:, 0], np.asarray(sequences, dtype=np.float64), side='right') - 1
+        return log[np.clip(pos, 0, len(log) - 1), 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='伪终端串口 ECG 设备模拟器')
+    parser.add_argument('--rate', type=int, default=500, help='帧率（Hz），250 到 8000')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='每帧注入损坏字节的概率')
+    parser.add_argument('--no-sequence', action='store_true', help='最后一个通道不写入帧序号')
+    parser.add_argument('--duration', type=float, default=None, help='运行秒数，默认一直运行')
+    args = parser.parse_args()
+
+    simulator = SerialDeviceSimulator(rate=args.rate, corrupt_rate=args.corrupt,
+                                      embed_sequence=not args.no_sequence)
+    port = simulator.open()
+    print(f"模拟串口设备: {port} ({args.rate} Hz)")
+    simulator.start(args.duration)
+    try:
+        while simulator.is_running:
+            _native_time.sleep(1.0)
+            print(f"已发送 {simulator.stats['frames_sent']} 帧, 损坏 {simulator.stats['frames_corrupted']} 帧")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.close()
+
+
+if __name__ == '__main__':
+    main()
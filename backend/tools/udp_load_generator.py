@@ -0,0 +1,280 @@
+# udp_load_generator.py
+
+"""
+UDP 网络负载生成器：把录制的 ECG 数据作为多台虚拟设备的 Firewater 数据流回放
+
+数据来源：
+    - 项目保存的导联文件 lead_<i>_<开始>_<结束>.npy（给出其中任意一个文件，同一次录制的
+      12 个导联一起读取）
+    - data/ecg_data_*.json（DataStorage.save_data 保存的 lead_0 .. lead_11）
+    - 'synthetic'：合成 ECG（与串口模拟器相同）
+
+录制数据保存的是 12 导联 [I, II, III, aVR, aVL, aVF, V1..V6]，回放时取设备实际发送的
+8 个通道 [I, II, V1..V6]。每台虚拟设备使用独立的套接字（来源端口不同）和各自的起始
+位置，按 rate * speed 的帧率对单调时钟定时发送，可选：
+    - 'sequence' 包头（见 packet_format），包头中的 stream_id 为设备编号
+    - 'device-id' 前缀（UDPDeviceServer 的 demux='payload' 模式）
+    - 最后一个通道写入帧序号，供接收端检测丢帧
+
+用法:
+    python -m backend.tools.udp_load_generator --source synthetic --devices 32 --speed 1 --port 5001
+    python -m backend.tools.udp_load_generator --source data/ecg_data_20250518_014042.json --speed 10 --header sequence
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import socket
+import struct
+import time
+
+import numpy as np
+
+from backend.devices.firewater import encode_frames
+from backend.devices.packet_format import encode_packet
+
+# 12 导联中设备实际发送的通道：I, II, V1..V6
+DEVICE_LEADS = (0, 1, 6, 7, 8, 9, 10, 11)
+HEADER_MODES = ('none', 'sequence', 'device-id')
+DEVICE_ID = struct.Struct('<I')
+
+
+def load_recording(source, rate=500, channels=8):
+    """读取回放数据
+
+    Args:
+        source: 'synthetic'、lead_*.npy 文件路径或 ecg_data_*.json 文件路径
+        rate: 合成数据的采样率
+        channels: 合成数据的通道数
+
+    Returns:
+        np.ndarray: (n, channels) 的 float32 数组
+    """
+    if source == 'synthetic':
+        # 串口模拟器模块会启用 eventlet，只在需要合成数据时导入
+        from backend.tools.serial_simulator import synthetic_ecg
+        # 一分钟的合成数据，回放时循环
+        return synthetic_ecg(rate, channels, duration=60.0)
+
+    if source.endswith('.json'):
+        with open(source) as f:
+            data = json.load(f)
+        leads = [np.asarray(data[f'lead_{i}'], dtype=np.float32) for i in range(12)]
+    elif source.endswith('.npy'):
+        # 同一次录制的导联文件只有 lead_<i> 前缀不同
+        match = re.match(r'lead_\d+_(.+)\.npy$', os.path.basename(source))
+        if not match:
+            raise ValueError(f"无法识别的导联文件名: {source}")
+        pattern = os.path.join(os.path.dirname(source), f"lead_*_{glob.escape(match.group(1))}.npy")
+        files = {int(re.match(r'lead_(\d+)_', os.path.basename(path)).group(1)): path
+                 for path in glob.glob(pattern)}
+        missing = [i for i in range(12) if i not in files]
+        if missing:
+            raise ValueError(f"录制缺少导联文件: {missing}")
+        leads = [np.load(files[i]).astype(np.float32) for i in range(12)]
+    else:
+        raise ValueError(f"不支持的数据来源: {source}")
+
+    n = min(len(lead) for lead in leads)
+    if n == 0:
+        raise ValueError(f"录制数据为空: {source}")
+    return np.stack([leads[i][:n] for i in DEVICE_LEADS], axis=1)
+
+
+class UDPLoadGenerator:
+    """多台虚拟设备的 UDP 数据流发送器"""
+
+    def __init__(self, waveform, host='127.0.0.1', port=5001, devices=1, rate=500, speed=1.0,
+                 frames_per_datagram=10, header='none', embed_sequence=False, first_device_id=1):
+        """
+        Args:
+            waveform: (n, channels) 的回放数据，循环发送
+            host: 目标地址
+            port: 目标端口
+            devices: 虚拟设备数
+            rate: 录制数据的采样率（Hz）
+            speed: 回放速率倍数，每台设备的帧率为 rate * speed
+            frames_per_datagram: 每个数据报包含的帧数
+            header: 'none'、'sequence'（带序号包头）或 'device-id'（4 字节设备ID前缀）
+            embed_sequence: 是否在最后一个通道写入帧序号
+            first_device_id: 第一台设备的编号（包头 stream_id / 设备ID）
+        """
+        if header not in HEADER_MODES:
+            raise ValueError(f"不支持的包头模式: {header}")
+        self.waveform = np.ascontiguousarray(waveform, dtype=np.float32)
+        self.target = (host, port)
+        self.devices = devices
+        self.rate = rate
+        self.speed = speed
+        self.frames_per_datagram = frames_per_datagram
+        self.header = header
+        self.embed_sequence = embed_sequence
+        self.device_ids = [first_device_id + i for i in range(devices)]
+        self.sockets = []
+        self.is_running = False
+
+        # 各设备从录制的不同位置开始，避免所有设备发送完全相同的数据
+        self.offsets = [(i * len(self.waveform)) // devices for i in range(devices)]
+
+        self.stats = {
+            'datagrams_sent': 0,
+            'frames_sent': 0,
+            'bytes_sent': 0,
+            'send_errors': 0,
+            'max_lag': 0.0,
+            'start_time': None,
+            'end_time': None
+        }
+
+    @property
+    def datagram_rate(self):
+        """每台设备的目标数据报速率（个/秒）"""
+        return self.rate * self.speed / self.frames_per_datagram
+
+    def open(self):
+        for _ in range(self.devices):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024 * 1024)
+            self.sockets.append(sock)
+
+    def close(self):
+        for sock in self.sockets:
+            sock.close()
+        self.sockets = []
+
+    def make_datagram(self, device, seq):
+        """生成第 device 台设备的第 seq 个数据报"""
+        n = self.frames_per_datagram
+        first_sample = seq * n
+        idx = (self.offsets[device] + first_sample + np.arange(n)) % len(self.waveform)
+        values = self.waveform[idx]
+        if self.embed_sequence:
+            # float32 可精确表示 2^24 以内的整数
+            values[:, -1] = np.arange(first_sample, first_sample + n) % (1 << 24)
+        frames = encode_frames(values)
+        if self.header == 'sequence':
+            return encode_packet(self.device_ids[device], seq, first_sample, frames)
+        if self.header == 'device-id':
+            return DEVICE_ID.pack(self.device_ids[device]) + frames
+        return frames
+
+    def run(self, duration=None, report_interval=1.0):
+        """按单调时钟定时发送，直到 duration 秒后或 stop()
+
+        每一轮计算到当前时刻为止每台设备应发送的数据报数，补发全部到期的数据报，
+        然后睡眠到下一个数据报的到期时刻；发送跟不上时不丢弃，记录最大滞后。
+
+        Args:
+            duration: 发送时长（秒），None 表示一直发送
+            report_interval: 打印实际发送速率的间隔（秒），None 表示不打印
+        """
+        if not self.sockets:
+            self.open()
+        self.is_running = True
+        interval = 1.0 / self.datagram_rate
+        sent = 0  # 每台设备已发送的数据报数（所有设备同步推进）
+        start = time.monotonic()
+        self.stats['start_time'] = time.time()
+        next_report = start + report_interval if report_interval else None
+        last_report = (start, 0)
+
+        while self.is_running:
+            now = time.monotonic()
+            elapsed = now - start
+            if duration is not None and elapsed >= duration:
+                break
+
+            due = int(elapsed / interval) + 1
+            if duration is not None:
+                due = min(due, int(duration / interval))
+            if due > sent:
+                self.stats['max_lag'] = max(self.stats['max_lag'], elapsed - sent * interval)
+            while sent < due:
+                for device, sock in enumerate(self.sockets):
+                    self._send(sock, self.make_datagram(device, sent))
+                sent += 1
+
+            if next_report is not None and now >= next_report:
+                last_report = self._report(now, last_report)
+                next_report = now + report_interval
+            # 睡眠到下一个数据报的到期时刻
+            time.sleep(max(0.0, start + sent * interval - time.monotonic()))
+
+        self.stats['end_time'] = time.time()
+        self.is_running = False
+        return self.get_stats()
+
+    def stop(self):
+        self.is_running = False
+
+    def _send(self, sock, datagram):
+        try:
+            sock.sendto(datagram, self.target)
+        except OSError:
+            self.stats['send_errors'] += 1
+            return
+        self.stats['datagrams_sent'] += 1
+        self.stats['frames_sent'] += self.frames_per_datagram
+        self.stats['bytes_sent'] += len(datagram)
+
+    def _report(self, now, last_report):
+        last_time, last_datagrams = last_report
+        rate = (self.stats['datagrams_sent'] - last_datagrams) / (now - last_time)
+        target = self.datagram_rate * self.devices
+        print(f"发送 {rate:,.0f} 数据报/秒 (目标 {target:,.0f}), "
+              f"{rate * self.frames_per_datagram:,.0f} 帧/秒, 发送失败 {self.stats['send_errors']}, "
+              f"最大滞后 {self.stats['max_lag'] * 1000:.1f} ms")
+        return now, self.stats['datagrams_sent']
+
+    def get_stats(self):
+        """返回发送计数以及实际发送速率"""
+        stats = dict(self.stats)
+        end = stats['end_time'] or time.time()
+        elapsed = end - stats['start_time'] if stats['start_time'] else 0.0
+        stats['elapsed'] = elapsed
+        stats['target_datagram_rate'] = self.datagram_rate * self.devices
+        stats['datagram_rate'] = stats['datagrams_sent'] / elapsed if elapsed else 0.0
+        stats['frame_rate'] = stats['frames_sent'] / elapsed if elapsed else 0.0
+        stats['byte_rate'] = stats['bytes_sent'] / elapsed if elapsed else 0.0
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UDP 网络负载生成器（多台虚拟 Firewater 设备）')
+    parser.add_argument('--source', type=str, default='synthetic',
+                        help="'synthetic'、lead_*.npy 文件或 ecg_data_*.json 文件")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='目标地址')
+    parser.add_argument('--port', type=int, default=5001, help='目标端口')
+    parser.add_argument('--devices', type=int, default=1, help='虚拟设备数')
+    parser.add_argument('--rate', type=int, default=500, help='录制数据的采样率（Hz）')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放速率倍数')
+    parser.add_argument('--frames-per-datagram', type=int, default=10, help='每个数据报包含的帧数')
+    parser.add_argument('--header', choices=HEADER_MODES, default='none', help='数据报包头')
+    parser.add_argument('--embed-sequence', action='store_true', help='最后一个通道写入帧序号')
+    parser.add_argument('--duration', type=float, default=None, help='运行秒数，默认一直运行')
+    args = parser.parse_args()
+
+    waveform = load_recording(args.source, rate=args.rate)
+    generator = UDPLoadGenerator(waveform, host=args.host, port=args.port, devices=args.devices,
+                                 rate=args.rate, speed=args.speed,
+                                 frames_per_datagram=args.frames_per_datagram, header=args.header,
+                                 embed_sequence=args.embed_sequence)
+    print(f"回放 {args.source} ({len(waveform)} 帧, {waveform.shape[1]} 通道) -> "
+          f"{args.host}:{args.port}, {args.devices} 台设备, 每台 {args.rate * args.speed:,.0f} 帧/秒")
+    try:
+        generator.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        generator.close()
+
+    stats = generator.get_stats()
+    print(f"共发送 {stats['datagrams_sent']} 数据报 ({stats['frames_sent']} 帧), "
+          f"实际 {stats['datagram_rate']:,.0f} 数据报/秒 (目标 {stats['target_datagram_rate']:,.0f}), "
+          f"{stats['byte_rate'] / 1e6:.2f} MB/s, 发送失败 {stats['send_errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# ecg_wire.py
+
+"""
+ecg_data / ecg_data_lod 事件的二进制负载格式（可选，作为 Socket.IO 二进制附件发送）
+
+所有字段为小端：
+
+    偏移  长度  字段
+    0     4     magic               b'ECGB'
+    4     1     version             2
+    5     1     dtype               1 = int16，2 = float32
+    6     2     leads               uint16，导联数
+    8     4     samples             uint32，每个导联的样本（点）数
+    12    8     first_sample_index  uint64，第一个样本（点）的序号
+    20    8     first_timestamp     float64，第一个样本的时间戳（秒）
+    28    4     sampling_rate       float32，样本（点）率；没有时间偏移数组时
+                                    样本 i 的时间戳为 first_timestamp + i / sampling_rate
+    32    4     scale               float32，int16 时实际值 = 原始值 * scale，float32 时为 1
+    36    4     seq                 uint32，事件序号
+    40    2     decimation          uint16，LOD 抽取桶长，0 表示全速率数据
+    42    1     flags               bit0 = 带时间偏移数组
+    43    1     session_length      uint8，会话ID的字节数
+    44    ...   session             会话ID（UTF-8，session_length 字节）
+    ...   ...   lead_ids            uint8[leads]，各导联的导联下标
+    ...   ...   填充到 8 字节对齐
+    ...   ...   time_offsets        float32[samples]，相对 first_timestamp 的时间偏移（秒），
+                                    只在 flags bit0 置位时存在（时间戳间隔不均匀）
+    ...   ...   导联数据，按导联连续存放 (leads, samples)
+
+变长部分填充到 8 字节对齐，时间偏移和导联数据都满足 TypedArray 的对齐要求，浏览器可以直接构造视图。
+int16 格式中缺失样本（NaN）编码为 -32768，float32 格式中仍为 NaN。
+"""
+
+import struct
+
+import numpy as np
+
+WIRE_MAGIC = b'ECGB'
+WIRE_VERSION = 2
+WIRE_HEADER = struct.Struct('<4sBBHIQdffIHBB')
+WIRE_DTYPES = {'int16': 1, 'float32': 2}
+WIRE_FORMATS = ('json',) + tuple(WIRE_DTYPES)
+INT16_MISSING = -32768
+FLAG_TIME_OFFSETS = 0x01
+# 时间戳与 first_timestamp + i / sampling_rate 的偏差超过该值（秒）时发送时间偏移数组
+TIME_TOLERANCE = 1e-5
+
+
+def _aligned(size, alignment=8):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def encode_ecg_block(leads, first_timestamp, sampling_rate, first_sample_index=0, seq=0, session_id=None,
+                     dtype='int16', lead_ids=None, decimation=0, timestamps=None):
+    """把一块导联数据编码为二进制负载
+
+    Args:
+        leads: (leads, n) 的导联数据，缺失样本为 NaN
+        first_timestamp: 第一个样本的时间戳（秒）
+        sampling_rate: 样本（点）率（Hz）
+        first_sample_index: 第一个样本的序号
+        seq: 事件序号
+        session_id: 会话ID字符串（最多 255 字节），None 表示不带会话ID
+        dtype: 'int16'（按块峰值缩放）或 'float32'
+        lead_ids: 各导联的导联下标，默认为 0..leads-1
+        decimation: LOD 抽取桶长，0 表示全速率数据
+        timestamps: 长度为 n 的时间戳；间隔与 sampling_rate 不一致时随负载发送时间偏移数组
+
+    Returns:
+        bytes: 包头 + 导联数据
+    """
+    if dtype not in WIRE_DTYPES:
+        raise ValueError(f"不支持的二进制数据类型: {dtype}")
+    leads = np.asarray(leads, dtype=np.float32)
+    lead_count, samples = leads.shape
+
+    if dtype == 'int16':
+        missing = np.isnan(leads)
+        peak = float(np.nanmax(np.abs(leads))) if samples and not missing.all() else 0.0
+        # 最大值映射到 32767，-32768 留作缺失样本标记
+        scale = peak / 32767.0 if peak > 0 else 1.0
+        data = np.rint(np.where(missing, 0.0, leads) / scale).astype('<i2')
+        data[missing] = INT16_MISSING
+    else:
+        scale = 1.0
+        data = leads.astype('<f4', copy=False)
+
+    session = session_id.encode('utf-8') if session_id else b''
+    if len(session) > 255:
+        raise ValueError("会话ID超过 255 字节")
+    lead_ids = np.arange(lead_count) if lead_ids is None else np.asarray(lead_ids)
+    if len(lead_ids) != lead_count or (lead_count and not 0 <= lead_ids.min() <= lead_ids.max() <= 255):
+        raise ValueError("lead_ids 必须与导联数一致且在 0 到 255 之间")
+
+    # 时间戳间隔不均匀（丢包、时钟校准、LOD 的最小/最大值点）时发送相对时间偏移
+    flags = 0
+    offsets = b''
+    if timestamps is not None and samples > 1:
+        relative = np.asarray(timestamps, dtype=np.float64) - first_timestamp
+        expected = np.arange(samples) / np.float64(np.float32(sampling_rate))
+        if np.abs(relative - expected).max() > TIME_TOLERANCE:
+            flags |= FLAG_TIME_OFFSETS
+            offsets = relative.astype('<f4').tobytes()
+
+    prefix = WIRE_HEADER.size + len(session) + lead_count
+    header = WIRE_HEADER.pack(WIRE_MAGIC, WIRE_VERSION, WIRE_DTYPES[dtype], lead_count, samples,
+                              first_sample_index, first_timestamp, sampling_rate, scale, seq % (1 << 32),
+                              decimation, flags, len(session))
+    padding = bytes(_aligned(prefix) - prefix)
+    return b''.join((header, session, lead_ids.astype(np.uint8).tobytes(), padding, offsets, data.tobytes()))
+
+
+def decode_ecg_block(payload):
+    """解码二进制负载（与浏览器端 decodeEcgBinary 相同，用于测试和基准）
+
+    Returns:
+        dict: 包头字段以及 leads（(leads, n) float32，缺失样本为 NaN）、time_stamps 和 lead_ids；
+            LOD 负载另有 points_per_second 和 decimation，与 JSON 负载的字段相同
+    """
+    magic, version, dtype, lead_count, samples, first_index, first_timestamp, sampling_rate, scale, seq, \
+        decimation, flags, session_length = WIRE_HEADER.unpack_from(payload)
+    if magic != WIRE_MAGIC or version != WIRE_VERSION:
+        raise ValueError("不是 ecg_data 二进制负载")
+    offset = WIRE_HEADER.size
+    session = bytes(payload[offset:offset + session_length]).decode('utf-8')
+    offset += session_length
+    lead_ids = np.frombuffer(payload, dtype=np.uint8, count=lead_count, offset=offset).tolist()
+    offset = _aligned(offset + lead_count)
+    if flags & FLAG_TIME_OFFSETS:
+        time_stamps = first_timestamp + np.frombuffer(payload, dtype='<f4', count=samples, offset=offset)
+        offset += 4 * samples
+    else:
+        time_stamps = first_timestamp + np.arange(samples) / sampling_rate
+    if dtype == WIRE_DTYPES['int16']:
+        raw = np.frombuffer(payload, dtype='<i2', count=lead_count * samples, offset=offset)
+        leads = raw.astype(np.float32) * np.float32(scale)
+        leads[raw == INT16_MISSING] = np.nan
+    else:
+        leads = np.frombuffer(payload, dtype='<f4', count=lead_count * samples, offset=offset).copy()
+    decoded = {
+        'leads': leads.reshape(lead_count, samples),
+        'time_stamps': time_stamps,
+        'first_sample_index': first_index,
+        'sampling_rate': sampling_rate,
+        'scale': scale,
+        'seq': seq,
+        'session_id': session or None,
+        'lead_ids': lead_ids
+    }
+    if decimation:
+        decoded.update(points_per_second=sampling_rate, decimation=decimation)
+    return decoded
@@ -0,0 +1,200 @@
+# pipeline_stage.py
+
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class PipelineStage:
+    """带有界队列和独立工作线程的处理阶段
+
+    上游通过 submit() 把任务放入队列后立即返回，工作线程按顺序调用 handler，
+    因此慢的下游（数据库写入、推送）不会拖慢上游的采集和处理。
+
+    队列满时的策略：
+        - 'drop_oldest': 丢弃队列中最旧的任务，保证处理的是最新数据（适合实时推送）
+        - 'drop_newest': 丢弃新提交的任务
+        - 'block': 上游等待队列腾出空间，超过 block_timeout 仍无空间时丢弃新任务
+
+    batch=True 时工作线程一次取出队列中所有已到达的任务（最多 max_batch 个），
+    以列表交给 handler，下游落后时可以合并为一次写入。
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+    def __init__(self, name, handler, max_queue=64, policy='drop_oldest', block_timeout=1.0,
+                 batch=False, max_batch=32):
+        """
+        Args:
+            name: 阶段名称，用于日志和统计
+            handler: 处理函数，batch=False 时接收单个任务，batch=True 时接收任务列表
+            max_queue: 队列容量（任务数）
+            policy: 队列满时的策略，'block' / 'drop_oldest' / 'drop_newest'
+            block_timeout: 'block' 策略下上游最长等待秒数
+            batch: 是否批量交给 handler
+            max_batch: 批量模式下每批最多的任务数
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的队列满策略: {policy}")
+        self.name = name
+        self.handler = handler
+        self.max_queue = max_queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.batch = batch
+        self.max_batch = max_batch
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.is_running = False
+        self.thread = None
+
+        self.stats = {
+            'submitted': 0,
+            'processed': 0,
+            'batches': 0,
+            'dropped': 0,
+            'errors': 0,
+            'busy_time': 0.0,
+            'max_process_time': 0.0,
+            'max_queue_delay': 0.0,
+            'queue_high_watermark': 0
+        }
+
+    def start(self):
+        """启动工作线程，重复调用无副作用"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._worker, name=f"stage-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        """停止工作线程，队列中已有的任务会先处理完"""
+        if not self.thread:
+            return
+        self.is_running = False
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def submit(self, item):
+        """
+        提交一个任务；工作线程未启动时在当前线程直接处理
+
+        Returns:
+            bool: 任务是否进入队列（或已处理）
+        """
+        if not self.is_running:
+            self._handle([(item, time.time())])
+            return True
+
+        entry = (item, time.time())
+        self.stats['submitted'] += 1
+        try:
+            if self.policy == 'block':
+                self.queue.put(entry, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(entry)
+        except queue.Full:
+            if self.policy != 'drop_oldest':
+                self.stats['dropped'] += 1
+                return False
+            try:
+                self.queue.get_nowait()
+                self.stats['dropped'] += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(entry)
+            except queue.Full:
+                self.stats['dropped'] += 1
+                return False
+        self.stats['queue_high_watermark'] = max(self.stats['queue_high_watermark'], self.queue.qsize())
+        return True
+
+    def _worker(self):
+        """工作线程：取出任务并处理，停止后处理完队列中剩余的任务"""
+        while self.is_running or not self.queue.empty():
+            try:
+                entries = [self.queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            if self.batch:
+                try:
+                    while len(entries) < self.max_batch:
+                        entries.append(self.queue.get_nowait())
+                except queue.Empty:
+                    pass
+            self._handle(entries)
+
+    def _handle(self, entries):
+        started = time.time()
+        self.stats['max_queue_delay'] = max(self.stats['max_queue_delay'], started - entries[0][1])
+        try:
+            if self.batch:
+                self.handler([item for item, _ in entries])
+            else:
+                for item, _ in entries:
+                    self.handler(item)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"处理阶段 {self.name} 出错: {e}")
+        elapsed = time.time() - started
+        self.stats['processed'] += len(entries)
+        self.stats['batches'] += 1
+        self.stats['busy_time'] += elapsed
+        self.stats['max_process_time'] = max(self.stats['max_process_time'], elapsed)
+
+    def get_stats(self):
+        """返回队列深度和处理耗时
+
+        Returns:
+            dict: 队列容量、当前深度、丢弃数以及每批平均/最大处理耗时（秒）
+        """
+        stats = dict(self.stats)
+        stats['name'] = self.name
+        stats['policy'] = self.policy
+        stats['max_queue'] = self.max_queue
+        stats['queue_depth'] = self.queue.qsize()
+        stats['mean_process_time'] = stats['busy_time'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+
+class LatencyStats:
+    """最近 window 次测量的延迟统计（秒）"""
+
+    def __init__(self, window=1000):
+        """
+        Args:
+            window: 参与分位数计算的最近测量次数
+        """
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value):
+        value = float(value)
+        self.samples.append(value)
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def reset(self):
+        self.samples.clear()
+        self.count = 0
+        self.max = 0.0
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: 测量次数、最近窗口内的平均值和 p50/p95/p99，以及全部测量的最大值
+        """
+        stats = {'count': self.count, 'max': self.max}
+        samples = np.array(self.samples)
+        if len(samples):
+            stats['mean'] = float(samples.mean())
+            for q in (50, 95, 99):
+                stats[f'p{q}'] = float(np.percentile(samples, q))
+        return stats
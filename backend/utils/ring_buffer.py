@@ -0,0 +1,443 @@
+# ring_buffer.py
+
+import threading
+import time
+
+import numpy as np
+
+
+class SampleRingBuffer:
+    """读取器与处理阶段之间的预分配单生产者/单消费者环形缓冲区
+
+    样本值保存在 (capacity, channels) 的数组中，时间戳保存在长度 capacity 的数组中，
+    写入和读取都按块进行，环绕时最多拆成两段拷贝，运行期间不再分配缓冲区。
+    写入计数 write_count 只由生产者推进，读取计数 read_count 只由消费者推进
+    （drop_oldest 策略下生产者在锁内推进 read_count 丢弃最旧样本）。
+
+    缓冲区满时的策略：
+        - 'block': 生产者等待消费者腾出空间，超过 block_timeout 仍无空间时丢弃剩余的新样本
+        - 'drop_oldest': 覆盖最旧的未读样本，保证处理的是最新数据
+        - 'drop_newest': 丢弃写不下的新样本，保证已缓冲的数据连续
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+    def __init__(self, capacity=8192, channels=8, policy='drop_oldest', block_timeout=1.0, dtype=np.float32):
+        """
+        Args:
+            capacity: 可缓冲的样本数
+            channels: 每个样本的通道数
+            policy: 缓冲区满时的策略，'block' / 'drop_oldest' / 'drop_newest'
+            block_timeout: 'block' 策略下生产者最长等待秒数，None 表示一直等待
+            dtype: 样本值的数据类型
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的缓冲区满策略: {policy}")
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.values = np.zeros((self.capacity, self.channels), dtype=dtype)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.write_count = 0
+        self.read_count = 0
+        self.closed = False
+
+        self._lock = threading.Lock()
+        self._readable = threading.Condition(self._lock)
+        self._writable = threading.Condition(self._lock)
+
+        self.stats = {
+            'written': 0,
+            'read': 0,
+            'dropped_oldest': 0,
+            'dropped_newest': 0,
+            'high_watermark': 0,
+            'blocked_time': 0.0,
+            'block_timeouts': 0
+        }
+
+    def occupancy(self):
+        """当前未读样本数"""
+        return self.write_count - self.read_count
+
+    def free_space(self):
+        return self.capacity - self.occupancy()
+
+    def write(self, values, timestamps):
+        """写入一块样本
+
+        Args:
+            values: (n, channels) 的样本数组
+            timestamps: 长度为 n 的时间戳数组
+
+        Returns:
+            int: 实际写入的样本数（drop_oldest 策略下总是 n）
+        """
+        values = np.asarray(values)
+        n = len(values)
+        if n == 0:
+            return 0
+        if values.ndim != 2 or values.shape[1] != self.channels:
+            raise ValueError(f"样本通道数不匹配: 期望 {self.channels}, 实际 {values.shape}")
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+
+        with self._lock:
+            if n > self.capacity:
+                # 单块超过容量时只有最后 capacity 个样本可能保留
+                if self.policy == 'drop_oldest':
+                    self.stats['dropped_oldest'] += n - self.capacity
+                    values, timestamps = values[-self.capacity:], timestamps[-self.capacity:]
+                else:
+                    self.stats['dropped_newest'] += n - self.capacity
+                    values, timestamps = values[:self.capacity], timestamps[:self.capacity]
+                n = self.capacity
+
+            free = self.capacity - (self.write_count - self.read_count)
+            if n > free:
+                if self.policy == 'drop_oldest':
+                    overflow = n - free
+                    self.read_count += overflow
+                    self.stats['dropped_oldest'] += overflow
+                    free = n
+                elif self.policy == 'block':
+                    free = self._wait_for_space(n)
+                if n > free:
+                    self.stats['dropped_newest'] += n - free
+                    values, timestamps = values[:free], timestamps[:free]
+                    n = free
+                if n == 0:
+                    return 0
+
+            start = self.write_count % self.capacity
+            first = min(n, self.capacity - start)
+            self.values[start:start + first] = values[:first]
+            self.timestamps[start:start + first] = timestamps[:first]
+            if first < n:
+                self.values[:n - first] = values[first:]
+                self.timestamps[:n - first] = timestamps[first:]
+
+            self.write_count += n
+            self.stats['written'] += n
+            self.stats['high_watermark'] = max(self.stats['high_watermark'], self.write_count - self.read_count)
+            self._readable.notify()
+        return n
+
+    def _wait_for_space(self, n):
+        # 在锁内调用：等待消费者腾出 n 个样本的空间，返回当前可用空间
+        started = time.time()
+        deadline = None if self.block_timeout is None else started + self.block_timeout
+        while not self.closed:
+            free = self.capacity - (self.write_count - self.read_count)
+            if free >= n:
+                break
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                self.stats['block_timeouts'] += 1
+                break
+            self._writable.wait(remaining)
+        self.stats['blocked_time'] += time.time() - started
+        return self.capacity - (self.write_count - self.read_count)
+
+    def read(self, max_samples=None):
+        """读取全部（或最多 max_samples 个）未读样本
+
+        Returns:
+            tuple: (values, timestamps)，都是拷贝，读取后缓冲区空间即可被复用
+        """
+        with self._lock:
+            available = self.write_count - self.read_count
+            n = available if max_samples is None else min(available, max_samples)
+            if n <= 0:
+                return np.empty((0, self.channels), dtype=self.values.dtype), np.empty(0, dtype=np.float64)
+
+            start = self.read_count % self.capacity
+            first = min(n, self.capacity - start)
+            if first == n:
+                values = self.values[start:start + n].copy()
+                timestamps = self.timestamps[start:start + n].copy()
+            else:
+                values = np.concatenate((self.values[start:], self.values[:n - first]))
+                timestamps = np.concatenate((self.timestamps[start:], self.timestamps[:n - first]))
+
+            self.read_count += n
+            self.stats['read'] += n
+            self._writable.notify()
+        return values, timestamps
+
+    def wait_readable(self, timeout=None):
+        """等待有未读样本，返回是否有数据可读"""
+        with self._lock:
+            if self.write_count == self.read_count and not self.closed:
+                self._readable.wait(timeout)
+            return self.write_count > self.read_count
+
+    def close(self):
+        """唤醒所有等待中的生产者和消费者"""
+        with self._lock:
+            self.closed = True
+            self._readable.notify_all()
+            self._writable.notify_all()
+
+    def reset(self):
+        with self._lock:
+            self.write_count = 0
+            self.read_count = 0
+            self.closed = False
+
+    def get_stats(self):
+        """返回占用率和丢弃计数
+
+        Returns:
+            dict: 容量、当前占用、占用率、峰值以及按策略统计的丢弃样本数
+        """
+        stats = dict(self.stats)
+        stats['capacity'] = self.capacity
+        stats['policy'] = self.policy
+        stats['occupancy'] = self.occupancy()
+        stats['fill_ratio'] = stats['occupancy'] / self.capacity
+        stats['dropped'] = stats['dropped_oldest'] + stats['dropped_newest']
+        return stats
+
+
+class LeadRingBuffer:
+    """固定容量的多导联历史数据环形缓冲区
+
+    导联数据保存在 (leads, 2 * capacity) 的 float32 数组中，时间戳和样本序号保存在
+    长度 2 * capacity 的共享列中。每个样本同时写入位置 pos 和 pos + capacity（镜像），
+    因此任意"最近 k 个样本"在数组中总是连续的，latest() 直接返回视图而不拷贝。
+    缓冲区只在创建时分配一次，内存占用与运行时长无关。
+
+    返回的视图在下一次 append 后可能被覆盖，需要保留的数据应由调用方拷贝。
+    """
+
+    def __init__(self, capacity=2000, leads=12, dtype=np.float32):
+        """
+        Args:
+            capacity: 保留的最近样本数
+            leads: 导联数
+            dtype: 导联数据的数据类型
+        """
+        self.capacity = int(capacity)
+        self.leads = int(leads)
+        self.values = np.zeros((self.leads, 2 * self.capacity), dtype=dtype)
+        self.timestamps = np.zeros(2 * self.capacity, dtype=np.float64)
+        self.sample_index = np.zeros(2 * self.capacity, dtype=np.int64)
+        self.write_count = 0
+
+    def __len__(self):
+        return min(self.write_count, self.capacity)
+
+    def append(self, values, timestamps, first_index=None):
+        """追加一块样本
+
+        Args:
+            values: (leads, n) 的导联数据
+            timestamps: 长度为 n 的时间戳数组
+            first_index: 块内第一个样本的序号，默认接续上一块
+        """
+        n = values.shape[1]
+        if n == 0:
+            return
+        if first_index is None:
+            first_index = int(self.sample_index[self._end() - 1]) + 1 if self.write_count else 0
+        indices = np.arange(first_index, first_index + n, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if n > self.capacity:
+            # 只有最后 capacity 个样本会被保留
+            values, timestamps, indices = values[:, -self.capacity:], timestamps[-self.capacity:], indices[-self.capacity:]
+            self.write_count += n - self.capacity
+            n = self.capacity
+
+        start = self.write_count % self.capacity
+        first = min(n, self.capacity - start)
+        for offset in (0, self.capacity):
+            # 写入主区和镜像区，环绕部分写到开头
+            self._put(start + offset, values[:, :first], timestamps[:first], indices[:first])
+            if first < n:
+                self._put(offset, values[:, first:], timestamps[first:], indices[first:])
+        self.write_count += n
+
+    def _put(self, position, values, timestamps, indices):
+        end = position + len(timestamps)
+        self.values[:, position:end] = values
+        self.timestamps[position:end] = timestamps
+        self.sample_index[position:end] = indices
+
+    def _end(self, count=None):
+        # 最新样本之后的位置：write_count 对应的位置加上 capacity，保证其前 capacity 个样本连续
+        count = self.write_count if count is None else count
+        return count % self.capacity + self.capacity
+
+    def latest(self, k=None, count=None):
+        """最近 k 个样本的视图（不拷贝）
+
+        Args:
+            k: 样本数，默认为全部
+            count: 按 write_count 为该值时的位置取视图，默认为当前位置；
+                写入方在其他进程时，读取方用同一个 count 取时间戳、数据和序号，结果相互对应
+
+        Returns:
+            tuple: (timestamps[k], values[leads, k])
+        """
+        count = self.write_count if count is None else count
+        k = min(count, self.capacity) if k is None else min(k, count, self.capacity)
+        end = self._end(count)
+        return self.timestamps[end - k:end], self.values[:, end - k:end]
+
+    def latest_indices(self, k=None, count=None):
+        """最近 k 个样本的样本序号视图"""
+        count = self.write_count if count is None else count
+        k = min(count, self.capacity) if k is None else min(k, count, self.capacity)
+        end = self._end(count)
+        return self.sample_index[end - k:end]
+
+    def copy_since(self, start, count=None):
+        """拷贝写入位置 [start, count) 中仍保留在缓冲区内的样本
+
+        Args:
+            start: 起始写入位置（例如上次读取时的 write_count）
+            count: 结束写入位置，默认为当前 write_count
+
+        Returns:
+            tuple: (timestamps[k], values[leads, k], sample_indices[k], skipped)，
+                skipped 为读取前已被覆盖而没有取到的样本数
+        """
+        count = self.write_count if count is None else count
+        pending = max(0, count - start)
+        k = min(pending, self.capacity)
+        times, values = self.latest(k, count=count)
+        indices = self.latest_indices(k, count=count)
+        return times.copy(), values.copy(), indices.copy(), pending - k
+
+    def reset(self):
+        self.write_count = 0
+
+    def nbytes(self):
+        """缓冲区占用的内存字节数"""
+        return self.values.nbytes + self.timestamps.nbytes + self.sample_index.nbytes
+
+
+class SharedLeadRing(LeadRingBuffer):
+    """放在 multiprocessing.shared_memory 中的多导联环形缓冲区
+
+    布局和镜像写入方式与 LeadRingBuffer 相同，数组直接建在一块共享内存上：
+
+        偏移                      内容
+        0                         int64[4]  write_count, capacity, leads, write_target
+        32                        float32[leads, 2 * capacity]  导联数据
+        ...                       float64[2 * capacity]  时间戳
+        ...                       int64[2 * capacity]  样本序号
+
+    单写多读：写入方（工作进程）先把 write_target 设为本块写完后的位置，写数据后再推进
+    write_count，读取方（web 进程）按 write_count 在共享内存上直接取视图，样本数据不经过 pickle。
+    读取方落后超过 capacity 个样本时，拷贝期间写入方可能正在覆盖它要读的位置：
+    copy_since() 拷贝后重新读取 write_target，丢弃其中可能已被覆盖的样本并计入 skipped。
+    """
+
+    HEADER_FIELDS = 4
+
+    def __init__(self, capacity=5000, leads=12, name=None, create=True):
+        """
+        Args:
+            capacity: 保留的最近样本数
+            leads: 导联数
+            name: 共享内存名称，create=False 时必须指定
+            create: True 创建新的共享内存，False 连接已有的共享内存
+        """
+        from multiprocessing import shared_memory
+
+        self.capacity = int(capacity)
+        self.leads = int(leads)
+        self.owner = create
+        size = self._layout_size(self.capacity, self.leads)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        if not create:
+            # 连接方不负责回收共享内存，避免 resource_tracker 在本进程退出时删除它
+            _untrack(self.shm)
+        self._map_arrays()
+        if create:
+            self._header[:] = (0, self.capacity, self.leads, 0)
+
+    @classmethod
+    def attach(cls, name):
+        """连接已有的共享环形缓冲区，容量和导联数从共享内存的头部读取"""
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((cls.HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        capacity, leads = int(header[1]), int(header[2])
+        del header
+        shm.close()
+        return cls(capacity=capacity, leads=leads, name=name, create=False)
+
+    @classmethod
+    def _layout_size(cls, capacity, leads):
+        return cls.HEADER_FIELDS * 8 + 2 * capacity * (leads * 4 + 8 + 8)
+
+    def _map_arrays(self):
+        buf = self.shm.buf
+        span = 2 * self.capacity
+        offset = 0
+        self._header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.HEADER_FIELDS * 8
+        self.values = np.ndarray((self.leads, span), dtype=np.float32, buffer=buf, offset=offset)
+        offset += self.values.nbytes
+        self.timestamps = np.ndarray((span,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self.timestamps.nbytes
+        self.sample_index = np.ndarray((span,), dtype=np.int64, buffer=buf, offset=offset)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def append(self, values, timestamps, first_index=None):
+        # 先公布本块写完后的位置：读取方据此判断拷贝期间哪些位置可能被覆盖
+        self._header[3] = self.write_count + values.shape[1]
+        super().append(values, timestamps, first_index)
+
+    def copy_since(self, start, count=None):
+        """拷贝写入位置 [start, count) 中的样本，去掉拷贝期间可能已被写入方覆盖的部分
+
+        Returns:
+            tuple: (timestamps[k], values[leads, k], sample_indices[k], skipped)
+        """
+        count = self.write_count if count is None else count
+        times, values, indices, skipped = super().copy_since(start, count)
+        # 写入位置小于 write_target - capacity 的样本所在的槽位已被（或正在被）覆盖
+        torn = min(len(times), max(0, int(self._header[3]) - self.capacity - (count - len(times))))
+        if torn:
+            times, values, indices = times[torn:], values[:, torn:], indices[torn:]
+        return times, values, indices, skipped + torn
+
+    def reset(self):
+        self._header[3] = 0
+        self.write_count = 0
+
+    @property
+    def write_count(self):
+        return int(self._header[0])
+
+    @write_count.setter
+    def write_count(self, value):
+        self._header[0] = value
+
+    def close(self):
+        """释放本进程的映射（之前取得的视图不能再使用），创建方同时删除共享内存"""
+        self._header = self.values = self.timestamps = self.sample_index = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _untrack(shm):
+    # Python 3.13 之前连接已有共享内存也会登记到 resource_tracker，进程退出时会被误删
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
@@ -0,0 +1,5 @@
+"""单元测试环境：本地没有数据库服务时缩短 MongoDB 的连接超时，导入监测服务时不必等待 30 秒"""
+
+import os
+
+os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017/?serverSelectionTimeoutMS=500')
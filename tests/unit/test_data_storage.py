@@ -0,0 +1,62 @@
+"""DataStorage 的分块写入、溢出到磁盘和 JSON 保存"""
+
+import json
+import os
+
+import numpy as np
+
+from backend.data.data_storage import DataStorage
+
+
+def _block(start, n):
+    values = np.random.default_rng(start).standard_normal((n, 12))
+    return np.arange(start, start + n, dtype=np.float64), values
+
+
+def test_blocks_spill_to_disk_and_read_back(tmp_path):
+    storage = DataStorage(chunk_samples=16, spill_dir=str(tmp_path))
+    blocks = [_block(0, 10), _block(10, 30), _block(40, 5)]
+    for timestamps, values in blocks:
+        storage.save_block(timestamps, values)
+
+    assert len(storage) == 45
+    assert storage.stats['chunks_spilled'] == 2
+    expected = np.concatenate([values for _, values in blocks])
+    np.testing.assert_array_equal(storage.get_lead(3), expected[:, 3])
+    np.testing.assert_array_equal(storage.get_timestamps(), np.arange(45))
+
+
+def test_save_data_matches_json_dump(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    storage = DataStorage(chunk_samples=7, spill_dir=str(tmp_path))
+    timestamps, values = _block(0, 20)
+    storage.save_block(timestamps[:13], values[:13])
+    storage.save_data_point(timestamps[13], values[13].tolist())
+    storage.save_block(timestamps[14:], values[14:])
+
+    path = storage.save_data('record.json')
+    with open(path) as f:
+        content = f.read()
+    assert content == json.dumps({f'lead_{i}': values[:, i].tolist() for i in range(12)})
+
+
+def test_empty_storage_saves_empty_leads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = DataStorage().save_data('empty.json')
+    with open(path) as f:
+        assert json.load(f) == {f'lead_{i}': [] for i in range(12)}
+
+
+def test_reset_and_close_remove_spilled_chunks(tmp_path):
+    storage = DataStorage(chunk_samples=4, spill_dir=str(tmp_path))
+    storage.save_block(*_block(0, 10))
+    spill_dir = storage._spill_dir
+    assert os.path.isdir(spill_dir)
+    storage.reset_data()
+    assert not os.path.exists(spill_dir)
+    assert len(storage) == 0
+
+    storage.save_block(*_block(0, 10))
+    spill_dir = storage._spill_dir
+    storage.close()
+    assert not os.path.exists(spill_dir)
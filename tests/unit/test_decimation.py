@@ -0,0 +1,98 @@
+"""MinMaxDecimator 的包络点、桶对齐和跨块状态"""
+
+import numpy as np
+
+from backend.processing.decimation import MinMaxDecimator
+
+RATE = 500.0
+
+
+def _block(first_index, n, leads=2, seed=0):
+    rng = np.random.default_rng(seed + first_index)
+    values = rng.standard_normal((leads, n)).astype(np.float32)
+    return values, (first_index + np.arange(n)) / RATE
+
+
+def _reference(values, factor):
+    # 逐桶计算的最小/最大值，按出现的先后顺序
+    leads, n = values.shape
+    points = []
+    for start in range(0, n - n % factor, factor):
+        bucket = values[:, start:start + factor]
+        low, high = np.argmin(bucket, axis=1), np.argmax(bucket, axis=1)
+        first = np.where(low <= high, bucket[np.arange(leads), low], bucket[np.arange(leads), high])
+        second = np.where(low <= high, bucket[np.arange(leads), high], bucket[np.arange(leads), low])
+        points.append(np.stack([first, second], axis=1))
+    return np.concatenate(points, axis=1)
+
+
+def test_envelope_matches_reference_and_keeps_peaks():
+    values, times = _block(0, 400)
+    values[1, 123] = 50.0  # QRS 尖峰
+    points, point_times, first_point = MinMaxDecimator(8, leads=2).process(values, times, 0)
+    np.testing.assert_array_equal(points, _reference(values, 8))
+    assert points[1].max() == 50.0
+    assert first_point == 0
+    np.testing.assert_allclose(point_times[0::2], times[0::8])
+    np.testing.assert_allclose(point_times[1::2], times[4::8])
+
+
+def test_blocks_split_anywhere_give_same_points():
+    values, times = _block(0, 1000)
+    whole, whole_times, _ = MinMaxDecimator(10, leads=2).process(values, times, 0)
+
+    decimator = MinMaxDecimator(10, leads=2)
+    parts, part_times, firsts = [], [], []
+    for start in range(0, 1000, 37):
+        points, point_times, first_point = decimator.process(values[:, start:start + 37],
+                                                             times[start:start + 37], start)
+        if first_point is not None:
+            parts.append(points)
+            part_times.append(point_times)
+            firsts.append(first_point)
+    np.testing.assert_array_equal(np.concatenate(parts, axis=1), whole)
+    np.testing.assert_allclose(np.concatenate(part_times), whole_times)
+    # 点序号连续
+    assert firsts == list(np.cumsum([0] + [p.shape[1] for p in parts[:-1]]))
+
+
+def test_buckets_align_to_sample_index():
+    values, times = _block(13, 40)
+    points, _, first_point = MinMaxDecimator(10, leads=2).process(values, times, 13)
+    # 第一个完整的桶从样本 20 开始
+    assert first_point == 4
+    np.testing.assert_array_equal(points, _reference(values[:, 7:], 10))
+
+
+def test_index_gap_drops_partial_bucket():
+    decimator = MinMaxDecimator(10, leads=2)
+    values, times = _block(0, 15)
+    decimator.process(values, times, 0)
+    values, times = _block(100, 20)
+    points, _, first_point = decimator.process(values, times, 100)
+    assert first_point == 20
+    np.testing.assert_array_equal(points, _reference(values, 10))
+
+
+def test_nan_samples_are_ignored_and_empty_buckets_are_nan():
+    values, times = _block(0, 20)
+    values[0, :10] = np.nan
+    values[1, 3] = np.nan
+    points, _, _ = MinMaxDecimator(10, leads=2).process(values, times, 0)
+    assert np.isnan(points[0, :2]).all()
+    assert np.isfinite(points[1]).all()
+    assert set(points[1, :2]) == {np.nanmin(values[1, :10]), np.nanmax(values[1, :10])}
+
+
+def test_factor_one_passes_through():
+    values, times = _block(0, 10)
+    points, point_times, first_point = MinMaxDecimator(1, leads=2).process(values, times, 5)
+    np.testing.assert_array_equal(points, values)
+    assert first_point == 5
+
+
+def test_incomplete_bucket_returns_no_points():
+    values, times = _block(0, 5)
+    points, point_times, first_point = MinMaxDecimator(10, leads=2).process(values, times, 0)
+    assert points.shape == (2, 0)
+    assert first_point is None
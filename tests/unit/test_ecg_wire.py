@@ -0,0 +1,111 @@
+"""ecg_data 二进制负载的编码/解码往返和 build_ecg_payload"""
+
+import numpy as np
+import pytest
+
+from backend.services.stream_service import build_ecg_payload
+from backend.utils.ecg_wire import WIRE_HEADER, decode_ecg_block, encode_ecg_block
+
+RATE = 500.0
+
+
+def _block(leads=12, n=100, seed=0):
+    values = (np.random.default_rng(seed).standard_normal((leads, n)) * 500).astype(np.float32)
+    times = 1700000000.0 + np.arange(n) / RATE
+    return values, times
+
+
+def test_float32_round_trip_is_exact():
+    values, times = _block()
+    values[3, 10] = np.nan
+    payload = encode_ecg_block(values, times[0], RATE, first_sample_index=12345, seq=7,
+                               session_id='1f0c3a5e-7d2b-4c1e-9a8f-0b6d5e4c3b2a', dtype='float32')
+    decoded = decode_ecg_block(payload)
+    np.testing.assert_array_equal(decoded['leads'], values)
+    np.testing.assert_allclose(decoded['time_stamps'], times, atol=1e-6)
+    assert decoded['first_sample_index'] == 12345
+    assert decoded['seq'] == 7
+    assert decoded['session_id'] == '1f0c3a5e-7d2b-4c1e-9a8f-0b6d5e4c3b2a'
+    assert decoded['lead_ids'] == list(range(12))
+    assert 'decimation' not in decoded
+
+
+def test_int16_round_trip_within_quantisation():
+    values, times = _block()
+    values[0, :5] = np.nan
+    decoded = decode_ecg_block(encode_ecg_block(values, times[0], RATE, dtype='int16'))
+    step = np.nanmax(np.abs(values)) / 32767
+    assert np.isnan(decoded['leads'][0, :5]).all()
+    np.testing.assert_allclose(decoded['leads'][:, 5:], values[:, 5:], atol=step)
+
+
+def test_all_missing_block_and_empty_block():
+    values = np.full((2, 4), np.nan, dtype=np.float32)
+    decoded = decode_ecg_block(encode_ecg_block(values, 0.0, RATE, dtype='int16'))
+    assert np.isnan(decoded['leads']).all()
+    decoded = decode_ecg_block(encode_ecg_block(np.empty((12, 0)), 0.0, RATE))
+    assert decoded['leads'].shape == (12, 0)
+
+
+def test_lead_ids_decimation_and_session_id_are_carried():
+    values, times = _block(leads=3)
+    payload = encode_ecg_block(values, times[0], RATE, session_id='bed-7', lead_ids=[1, 6, 11], decimation=4,
+                               dtype='float32')
+    decoded = decode_ecg_block(payload)
+    assert decoded['lead_ids'] == [1, 6, 11]
+    assert decoded['decimation'] == 4
+    assert decoded['points_per_second'] == RATE
+    assert decoded['session_id'] == 'bed-7'
+    assert decode_ecg_block(encode_ecg_block(values, times[0], RATE))['session_id'] is None
+
+
+def test_data_is_aligned_for_typed_arrays():
+    values, times = _block(leads=3, n=10)
+    for session_id in (None, 'a', 'session-with-odd-length'):
+        payload = encode_ecg_block(values, times[0], RATE, session_id=session_id, dtype='float32')
+        assert (len(payload) - values.size * 4) % 8 == 0
+        assert len(payload) - values.size * 4 >= WIRE_HEADER.size
+
+
+def test_uniform_timestamps_send_no_offsets():
+    values, times = _block(n=50)
+    with_times = encode_ecg_block(values, times[0], RATE, timestamps=times)
+    assert len(with_times) == len(encode_ecg_block(values, times[0], RATE))
+
+
+def test_irregular_timestamps_are_sent_as_offsets():
+    values, times = _block(n=50)
+    times[25:] += 0.04  # 丢包后的时间缺口
+    payload = encode_ecg_block(values, times[0], RATE, dtype='float32', timestamps=times)
+    decoded = decode_ecg_block(payload)
+    np.testing.assert_allclose(decoded['time_stamps'], times, atol=1e-5)
+    np.testing.assert_array_equal(decoded['leads'], values)
+
+
+def test_invalid_arguments():
+    values, times = _block(leads=2, n=4)
+    with pytest.raises(ValueError):
+        encode_ecg_block(values, times[0], RATE, dtype='int8')
+    with pytest.raises(ValueError):
+        encode_ecg_block(values, times[0], RATE, lead_ids=[0])
+    with pytest.raises(ValueError):
+        encode_ecg_block(values, times[0], RATE, session_id='x' * 256)
+    with pytest.raises(ValueError):
+        decode_ecg_block(b'XXXX' + bytes(WIRE_HEADER.size))
+
+
+def test_build_ecg_payload_binary_matches_json_fields():
+    values, times = _block(leads=2, n=20)
+    kwargs = dict(session_id='s1', lead_ids=[0, 4], points_per_second=RATE, decimation=5)
+    json_payload = build_ecg_payload(values, times, 40, 3, RATE, 'json', **kwargs)
+    binary = decode_ecg_block(build_ecg_payload(values, times, 40, 3, RATE, 'float32', **kwargs))
+    for field in ('seq', 'first_sample_index', 'session_id', 'lead_ids', 'points_per_second', 'decimation'):
+        assert binary[field] == json_payload[field], field
+    np.testing.assert_allclose(binary['time_stamps'], json_payload['time_stamps'], atol=1e-6)
+    np.testing.assert_array_equal(binary['leads'], np.array(json_payload['leads'], dtype=np.float32))
+
+
+def test_build_ecg_payload_rejects_unknown_binary_fields():
+    values, times = _block(leads=2, n=4)
+    with pytest.raises(ValueError):
+        build_ecg_payload(values, times, 0, 1, RATE, 'int16', session_id='s1', color='red')
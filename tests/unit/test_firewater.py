@@ -0,0 +1,101 @@
+"""FirewaterDecoder 的块解码、跨块拼接和重同步"""
+
+import numpy as np
+
+from backend.devices.firewater import FirewaterDecoder, encode_frames
+
+
+def _frames(n, channels=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, channels)).astype(np.float32)
+
+
+def test_round_trip():
+    values = _frames(100)
+    decoder = FirewaterDecoder(channels=8)
+    decoder.feed(encode_frames(values))
+    np.testing.assert_array_equal(decoder.decode(), values)
+    assert decoder.pending_bytes() == 0
+    assert decoder.get_stats()['ok'] == 100
+
+
+def test_frames_split_across_feeds():
+    values = _frames(50)
+    data = encode_frames(values)
+    decoder = FirewaterDecoder(channels=8)
+    decoded = []
+    for start in range(0, len(data), 17):
+        decoder.feed(data[start:start + 17])
+        decoded.append(decoder.decode())
+    np.testing.assert_array_equal(np.concatenate(decoded), values)
+
+
+def test_resync_after_garbage_and_truncated_frame():
+    values = _frames(20)
+    data = encode_frames(values)
+    frame = len(data) // 20
+    # 第 5 帧前插入垃圾字节，第 10 帧截掉一半负载
+    corrupted = data[:5 * frame] + b'\x01\x02\x03' + data[5 * frame:10 * frame] \
+        + data[10 * frame + 16:11 * frame] + data[11 * frame:]
+    decoder = FirewaterDecoder(channels=8)
+    decoder.feed(corrupted)
+    decoded = decoder.decode()
+
+    expected = np.concatenate([values[:5], values[6:10], values[11:]])
+    np.testing.assert_array_equal(decoded, expected)
+    stats = decoder.get_stats()
+    assert stats['long'] == 1
+    assert stats['short'] == 1
+    assert stats['resyncs'] == 2
+
+
+def test_partial_tail_is_kept_until_next_feed():
+    values = _frames(3)
+    data = encode_frames(values)
+    decoder = FirewaterDecoder(channels=8)
+    decoder.feed(data[:-2])
+    assert len(decoder.decode()) == 2
+    decoder.feed(data[-2:])
+    np.testing.assert_array_equal(decoder.decode(), values[2:])
+
+
+def test_nan_frames_are_kept_and_counted():
+    values = _frames(4)
+    values[2, 3] = np.nan
+    decoder = FirewaterDecoder(channels=8)
+    decoder.feed(encode_frames(values))
+    decoded = decoder.decode()
+    assert len(decoded) == 4
+    assert np.isnan(decoded[2, 3])
+    assert decoder.get_stats()['nan'] == 1
+
+
+def test_channel_detection_skips_leading_partial_frame():
+    values = _frames(10, channels=4)
+    data = encode_frames(values)
+    decoder = FirewaterDecoder(channels=None)
+    # 从第一帧中间开始接收
+    decoder.feed(data[6:])
+    decoded = decoder.decode()
+    assert decoder.channels == 4
+    np.testing.assert_array_equal(decoded, values[1:])
+
+
+def test_decode_packet_fast_path_and_fallback():
+    values = _frames(10)
+    data = encode_frames(values)
+    decoder = FirewaterDecoder(channels=8)
+    np.testing.assert_array_equal(decoder.decode_packet(data), values)
+    assert decoder.get_stats()['fast_packets'] == 1
+
+    # 帧跨数据报时退回字节缓冲区
+    first = decoder.decode_packet(data[:50])
+    second = decoder.decode_packet(data[50:])
+    np.testing.assert_array_equal(np.concatenate([first, second]), values)
+    assert decoder.get_stats()['fast_packets'] == 1
+
+
+def test_decode_whole_rejects_misaligned_data():
+    data = encode_frames(_frames(3))
+    decoder = FirewaterDecoder(channels=8)
+    assert decoder.decode_whole(data[:-1]) is None
+    assert decoder.decode_whole(data[:-4] + b'\x00' * 4) is None
@@ -0,0 +1,88 @@
+"""derivation_matrix / compute_12_leads_block 与标准导联公式的一致性"""
+
+import numpy as np
+import pytest
+
+from backend.processing.ecg_data_processor import LEAD_NAMES, ECGDataProcessor, derivation_matrix
+
+
+def _device_block(n=64, seed=0):
+    # 设备通道 I, II, V1..V6
+    return np.random.default_rng(seed).standard_normal((n, 8)).astype(np.float32)
+
+
+def _standard_leads(values):
+    I, II = values[:, 0], values[:, 1]
+    return {
+        'I': I,
+        'II': II,
+        'III': II - I,
+        'aVR': -(I + II) / 2,
+        'aVL': I - II / 2,
+        'aVF': II - I / 2,
+        **{f'V{k}': values[:, 1 + k] for k in range(1, 7)}
+    }
+
+
+def test_default_matrix_matches_standard_formulas():
+    values = _device_block()
+    leads = ECGDataProcessor().compute_12_leads_block(values)
+    expected = _standard_leads(values)
+    assert leads.shape == (len(values), 12)
+    for i, name in enumerate(LEAD_NAMES):
+        np.testing.assert_allclose(leads[:, i], expected[name], rtol=1e-5, atol=1e-6, err_msg=name)
+
+
+def test_default_matrix_coefficients():
+    matrix, channels, missing = derivation_matrix()
+    assert channels == list(range(8))
+    assert len(missing) == 0
+    # 肢体导联只依赖 I、II
+    np.testing.assert_allclose(matrix[:2, :6], [[1, 0, -1, -0.5, 1, -0.5],
+                                                [0, 1, 1, -0.5, -0.5, 1]])
+    np.testing.assert_array_equal(matrix[2:, 6:], np.eye(6))
+    assert not matrix[2:, :6].any()
+
+
+def test_compute_12_leads_matches_block():
+    values = _device_block(n=5)
+    processor = ECGDataProcessor()
+    per_sample = np.array([processor.compute_12_leads(row) for row in values])
+    np.testing.assert_allclose(per_sample, processor.compute_12_leads_block(values), rtol=1e-5, atol=1e-6)
+
+
+def test_channel_map_with_ii_iii_and_extra_channel():
+    values = _device_block()
+    expected = _standard_leads(values)
+    # 设备发送 II、III、V1..V6 和一个非导联通道
+    device = np.column_stack([expected['II'], expected['III'], values[:, 2:], np.arange(len(values))])
+    processor = ECGDataProcessor(channel_map=('II', 'III', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6', None))
+    leads = processor.compute_12_leads_block(device)
+    for i, name in enumerate(LEAD_NAMES):
+        np.testing.assert_allclose(leads[:, i], expected[name], rtol=1e-5, atol=1e-5, err_msg=name)
+
+
+def test_underivable_leads_are_nan():
+    processor = ECGDataProcessor(channel_map=('II', None, 'V1', 'V2', 'V3', 'V4', 'V5', 'V6'))
+    leads = processor.compute_12_leads_block(_device_block())
+    missing = [LEAD_NAMES[i] for i in processor.missing_leads]
+    assert missing == ['I', 'III', 'aVR', 'aVL', 'aVF']
+    assert np.isnan(leads[:, processor.missing_leads]).all()
+    assert not np.isnan(leads[:, [1, 6, 7, 8, 9, 10, 11]]).any()
+
+
+def test_nan_rows_stay_missing():
+    values = _device_block(n=4)
+    values[2] = np.nan
+    leads = ECGDataProcessor().compute_12_leads_block(values)
+    assert np.isnan(leads[2]).all()
+    assert not np.isnan(leads[[0, 1, 3]]).any()
+
+
+def test_invalid_channel_maps():
+    with pytest.raises(ValueError):
+        derivation_matrix(('I', 'II', 'X'))
+    with pytest.raises(ValueError):
+        derivation_matrix((None, None))
+    with pytest.raises(ValueError):
+        ECGDataProcessor().compute_12_leads_block(np.zeros((3, 4)))
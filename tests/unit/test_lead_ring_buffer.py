@@ -0,0 +1,83 @@
+"""LeadRingBuffer 的镜像写入、环绕和按写入位置拷贝"""
+
+import numpy as np
+
+from backend.utils.ring_buffer import LeadRingBuffer
+
+
+def _block(start, n, leads=3):
+    values = np.tile(np.arange(start, start + n, dtype=np.float32), (leads, 1))
+    values += np.arange(leads, dtype=np.float32)[:, None] * 1000
+    return values, np.arange(start, start + n) / 500.0
+
+
+def test_latest_is_contiguous_across_wraparound():
+    ring = LeadRingBuffer(capacity=8, leads=3)
+    position = 0
+    for n in (5, 6, 7):
+        ring.append(*_block(position, n))
+        position += n
+    times, values = ring.latest()
+    assert len(ring) == 8
+    np.testing.assert_array_equal(values[0], np.arange(position - 8, position))
+    np.testing.assert_array_equal(values[2], np.arange(position - 8, position) + 2000)
+    np.testing.assert_allclose(times, np.arange(position - 8, position) / 500.0)
+    np.testing.assert_array_equal(ring.latest_indices(), np.arange(position - 8, position))
+    # latest 返回视图，不拷贝
+    assert values.base is ring.values
+
+
+def test_latest_k_and_count():
+    ring = LeadRingBuffer(capacity=8, leads=3)
+    ring.append(*_block(0, 6))
+    _, values = ring.latest(2)
+    np.testing.assert_array_equal(values[0], [4, 5])
+    # 按较早的 write_count 取视图
+    _, values = ring.latest(3, count=4)
+    np.testing.assert_array_equal(values[0], [1, 2, 3])
+    # k 超过已写入样本数时截断
+    assert ring.latest(100)[0].shape == (6,)
+
+
+def test_oversized_block_keeps_last_capacity_samples():
+    ring = LeadRingBuffer(capacity=4, leads=3)
+    ring.append(*_block(0, 10))
+    assert ring.write_count == 10
+    np.testing.assert_array_equal(ring.latest_indices(), [6, 7, 8, 9])
+    np.testing.assert_array_equal(ring.latest()[1][0], [6, 7, 8, 9])
+
+
+def test_first_index_continues_or_jumps():
+    ring = LeadRingBuffer(capacity=8, leads=3)
+    ring.append(*_block(0, 3))
+    ring.append(*_block(3, 2))
+    ring.append(*_block(100, 2), first_index=100)
+    np.testing.assert_array_equal(ring.latest_indices(), [0, 1, 2, 3, 4, 100, 101])
+
+
+def test_copy_since_returns_copies_and_counts_overwritten_samples():
+    ring = LeadRingBuffer(capacity=4, leads=3)
+    ring.append(*_block(0, 3))
+    times, values, indices, skipped = ring.copy_since(0)
+    np.testing.assert_array_equal(indices, [0, 1, 2])
+    assert skipped == 0
+    ring.append(*_block(3, 4))
+    # 拷贝不受后续写入影响
+    np.testing.assert_array_equal(values[0], [0, 1, 2])
+
+    times, values, indices, skipped = ring.copy_since(3)
+    np.testing.assert_array_equal(indices, [3, 4, 5, 6])
+    assert skipped == 0
+    ring.append(*_block(7, 6))
+    _, _, indices, skipped = ring.copy_since(7)
+    np.testing.assert_array_equal(indices, [9, 10, 11, 12])
+    assert skipped == 2
+    assert ring.copy_since(ring.write_count)[2].size == 0
+
+
+def test_reset_and_nbytes():
+    ring = LeadRingBuffer(capacity=10, leads=12)
+    ring.append(*_block(0, 5, leads=12))
+    ring.reset()
+    assert len(ring) == 0
+    assert ring.nbytes() == 12 * 20 * 4 + 20 * 8 + 20 * 8
@@ -0,0 +1,68 @@
+"""ECGMonitoringSystem 的停止保存"""
+
+import os
+import time
+
+import numpy as np
+
+from backend.services.monitoring_service import ECGMonitoringSystem
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data=None, **kwargs):
+        self.events.append((event, data, kwargs))
+
+
+def _recorded_system(socketio, seconds=10.0):
+    system = ECGMonitoringSystem(socketio)
+    system.start_timestamp = time.time() - seconds
+    times = system.start_timestamp + np.arange(50) / 500.0
+    system.data_storage.save_block(times, np.random.default_rng(0).standard_normal((50, 12)))
+    return system
+
+
+def test_sessions_stopped_in_the_same_second_keep_separate_recordings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(time, 'strftime', lambda fmt, *args: '20260101_120000')
+    socketio = RecordingSocketIO()
+    systems = [_recorded_system(socketio), _recorded_system(socketio)]
+    for system in systems:
+        system.stop()
+        system.close()
+
+    files = sorted(os.listdir(tmp_path / 'data'))
+    assert len(files) == 2
+    assert files == sorted(f'ecg_data_20260101_120000_{system.session_id}.json' for system in systems)
+
+
+def test_short_recording_is_not_saved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = _recorded_system(RecordingSocketIO(), seconds=1.0)
+    system.stop()
+    system.close()
+    assert not (tmp_path / 'data').exists()
+
+
+def test_backlog_is_emitted_in_capped_batches_without_loss():
+    system = ECGMonitoringSystem(RecordingSocketIO())
+    blocks = []
+    system._send_block = blocks.append
+    system._store_blocks = lambda blocks: None
+    # 积压超过12导联缓冲区容量（max_samples * 10）
+    n = system.lead_buffer.capacity * 2 + 123
+    times = 1700000000.0 + np.arange(n) / 500.0
+    system.input_buffer.write(np.random.default_rng(1).standard_normal((n, 8)).astype(np.float32), times)
+
+    system._run_pending()
+    system._flush('final')
+
+    sizes = [len(block['times']) for block in blocks]
+    assert max(sizes) == system.max_samples
+    assert sum(sizes) == n
+    assert system.emit_stats['samples_skipped'] == 0
+    assert [block['first_sample_index'] for block in blocks] == list(np.cumsum([0] + sizes[:-1]))
+    np.testing.assert_allclose(np.concatenate([block['times'] for block in blocks]), times)
+    system.close()
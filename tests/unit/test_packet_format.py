@@ -0,0 +1,130 @@
+"""PacketSequencer 的重排、丢包填补和 contiguous_runs"""
+
+import numpy as np
+
+from backend.devices.firewater import FirewaterDecoder, encode_frames
+from backend.devices.packet_format import (PacketSequencer, contiguous_runs, decode_datagram, encode_packet,
+                                           parse_packet)
+
+FRAMES = 10
+
+
+def _packet(seq):
+    # 每包 FRAMES 个样本，第一列为样本序号
+    values = np.zeros((FRAMES, 2), dtype=np.float32)
+    values[:, 0] = np.arange(seq * FRAMES, (seq + 1) * FRAMES)
+    return seq, seq * FRAMES, values
+
+
+def _indices(blocks):
+    return np.concatenate([values[:, 0] for _, values in blocks])
+
+
+def test_in_order_packets_are_released_immediately():
+    sequencer = PacketSequencer()
+    released = []
+    for seq in range(5):
+        released += sequencer.push(*_packet(seq), now=0.0)
+    np.testing.assert_array_equal(_indices(released), np.arange(5 * FRAMES))
+    assert sequencer.get_stats()['lost'] == 0
+
+
+def test_reordered_packet_within_window():
+    sequencer = PacketSequencer(reorder_window=4)
+    released = []
+    for seq in (0, 2, 1, 3):
+        released += sequencer.push(*_packet(seq), now=0.0)
+    np.testing.assert_array_equal(_indices(released), np.arange(4 * FRAMES))
+    stats = sequencer.get_stats()
+    assert stats['reordered'] == 1
+    assert stats['lost'] == 0
+
+
+def test_duplicate_packet_is_dropped():
+    sequencer = PacketSequencer()
+    sequencer.push(*_packet(0), now=0.0)
+    assert sequencer.push(*_packet(0), now=0.0) == []
+    assert sequencer.get_stats()['duplicated'] == 1
+
+
+def test_lost_packet_is_filled_with_nan_after_timeout():
+    sequencer = PacketSequencer(reorder_window=8, max_hold=0.05)
+    released = sequencer.push(*_packet(0), now=0.0)
+    # 包 1 丢失，包 2 在窗口内等待
+    assert sequencer.push(*_packet(2), now=0.01) == []
+    released += sequencer.flush(now=0.1)
+
+    first_indices = [first for first, _ in released]
+    assert first_indices == [0, FRAMES, 2 * FRAMES]
+    gap = released[1][1]
+    assert gap.shape == (FRAMES, 2)
+    assert np.isnan(gap).all()
+    stats = sequencer.get_stats()
+    assert stats['lost'] == 1
+    assert stats['gap_samples'] == FRAMES
+
+    # 缺口填补后才到达的包不再插回
+    assert sequencer.push(*_packet(1), now=0.2) == []
+    assert sequencer.get_stats()['late'] == 1
+
+
+def test_full_window_skips_gap_without_waiting():
+    sequencer = PacketSequencer(reorder_window=3, max_hold=10.0)
+    sequencer.push(*_packet(0), now=0.0)
+    released = []
+    for seq in (2, 3, 4):
+        released += sequencer.push(*_packet(seq), now=0.0)
+    assert [first for first, _ in released] == [FRAMES, 2 * FRAMES, 3 * FRAMES, 4 * FRAMES]
+    assert np.isnan(released[0][1]).all()
+
+
+def test_sequence_wraparound():
+    sequencer = PacketSequencer()
+    values = np.zeros((FRAMES, 2), dtype=np.float32)
+    released = []
+    for i, seq in enumerate((2 ** 32 - 2, 2 ** 32 - 1, 0, 1)):
+        released += sequencer.push(seq, i * FRAMES, values, now=0.0)
+    assert [first for first, _ in released] == [0, FRAMES, 2 * FRAMES, 3 * FRAMES]
+    assert sequencer.get_stats()['lost'] == 0
+
+
+def test_large_sample_jump_resyncs_without_fill():
+    sequencer = PacketSequencer(max_gap_samples=100)
+    sequencer.push(*_packet(0), now=0.0)
+    _, _, values = _packet(1)
+    released = sequencer.push(1, 10000, values, now=0.0)
+    assert [first for first, _ in released] == [10000]
+    assert sequencer.get_stats()['resyncs'] == 1
+
+
+def test_contiguous_runs_merges_adjacent_blocks():
+    a = np.ones((3, 2), dtype=np.float32)
+    b = np.full((2, 2), 2, dtype=np.float32)
+    c = np.full((4, 2), 3, dtype=np.float32)
+    runs = contiguous_runs([(0, a), (3, b), (10, c)])
+    assert [first for first, _ in runs] == [0, 10]
+    np.testing.assert_array_equal(runs[0][1], np.concatenate([a, b]))
+    assert runs[1][1] is c
+    assert contiguous_runs([]) == []
+
+
+def test_packet_header_round_trip():
+    frames = encode_frames(np.arange(16, dtype=np.float32).reshape(2, 8))
+    packet = encode_packet(7, 2 ** 32 + 5, 1234, frames)
+    stream_id, seq, first_index, payload = parse_packet(packet)
+    assert (stream_id, seq, first_index) == (7, 5, 1234)
+    assert bytes(payload) == frames
+    assert parse_packet(frames) is None
+
+
+def test_decode_datagram_with_and_without_header():
+    decoder = FirewaterDecoder(channels=8)
+    sequencer = PacketSequencer()
+    values = np.arange(16, dtype=np.float32).reshape(2, 8)
+    blocks = decode_datagram(decoder, sequencer, encode_packet(1, 0, 100, encode_frames(values)), now=0.0)
+    assert blocks[0][0] == 100
+    np.testing.assert_array_equal(blocks[0][1], values)
+
+    blocks = decode_datagram(decoder, sequencer, encode_frames(values), now=0.0)
+    assert blocks[0][0] is None
+    np.testing.assert_array_equal(blocks[0][1], values)
@@ -0,0 +1,67 @@
+"""SampleClock 的时间戳、漂移估计和离群/阶跃处理"""
+
+import numpy as np
+
+from backend.devices.sample_clock import SampleClock
+
+BLOCK = 10
+
+
+def _run(clock, rate, blocks, jitter=0.0, seed=0, start=1000.0):
+    # 设备按 rate 采样，每块最后一个样本到达时带随机的正向传输延迟
+    rng = np.random.default_rng(seed)
+    stamps = []
+    for b in range(blocks):
+        last = (b + 1) * BLOCK - 1
+        stamps.append(clock.stamp(BLOCK, start + last / rate + rng.uniform(0, jitter)))
+    return np.concatenate(stamps)
+
+
+def test_first_block_ends_at_arrival_time_with_nominal_spacing():
+    clock = SampleClock(nominal_rate=500)
+    stamps = clock.stamp(5, 100.0)
+    np.testing.assert_allclose(stamps, 100.0 - np.arange(4, -1, -1) / 500)
+    assert clock.next_index == 5
+
+
+def test_timestamps_strictly_increasing_under_jitter():
+    clock = SampleClock(nominal_rate=500)
+    stamps = _run(clock, 500, 500, jitter=0.005)
+    assert (np.diff(stamps) > 0).all()
+    assert clock.get_stats()['samples'] == 500 * BLOCK
+
+
+def test_drift_is_estimated():
+    clock = SampleClock(nominal_rate=500)
+    _run(clock, 505, 2000, jitter=0.002)
+    stats = clock.get_stats()
+    assert abs(stats['effective_rate'] - 505) < 0.5
+    assert abs(stats['drift_ppm'] + 1e6 * (1 - 500 / 505)) < 1000
+
+
+def test_outlier_arrival_does_not_move_the_model():
+    clock = SampleClock(nominal_rate=500)
+    _run(clock, 500, 200, jitter=0.001)
+    period = clock.period
+    # 一块数据晚到 0.2 秒（调度停顿）
+    index = clock.next_index + BLOCK - 1
+    clock.stamp(BLOCK, 1000.0 + index / 500 + 0.2)
+    assert clock.get_stats()['outliers'] == 1
+    assert clock.period == period
+
+
+def test_clock_step_resets_model():
+    clock = SampleClock(nominal_rate=500, reset_threshold=1.0)
+    _run(clock, 500, 50)
+    index = clock.next_index + BLOCK - 1
+    stamps = clock.stamp(BLOCK, 1000.0 + index / 500 + 5.0)
+    assert clock.get_stats()['resets'] == 1
+    assert abs(stamps[-1] - (1000.0 + index / 500 + 5.0)) < 1e-9
+
+
+def test_explicit_first_index_leaves_gap_in_time():
+    clock = SampleClock(nominal_rate=500)
+    clock.stamp(BLOCK, 10.0 + (BLOCK - 1) / 500, first_index=0)
+    stamps = clock.stamp(BLOCK, 10.0 + (3 * BLOCK - 1) / 500, first_index=2 * BLOCK)
+    np.testing.assert_allclose(stamps[0], 10.0 + 2 * BLOCK / 500)
+    assert clock.next_index == 3 * BLOCK
@@ -0,0 +1,99 @@
+"""SampleRingBuffer 的环绕读写和缓冲区满策略"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from backend.utils.ring_buffer import SampleRingBuffer
+
+
+def _block(start, n, channels=2):
+    values = np.repeat(np.arange(start, start + n, dtype=np.float32)[:, None], channels, axis=1)
+    return values, np.arange(start, start + n, dtype=np.float64)
+
+
+def test_write_read_wraparound():
+    buffer = SampleRingBuffer(capacity=8, channels=2)
+    position = 0
+    for n in (5, 6, 7, 3):
+        buffer.write(*_block(position, n))
+        values, timestamps = buffer.read()
+        np.testing.assert_array_equal(values[:, 0], np.arange(position, position + n))
+        np.testing.assert_array_equal(timestamps, np.arange(position, position + n))
+        position += n
+    assert buffer.occupancy() == 0
+    assert buffer.get_stats()['dropped'] == 0
+
+
+def test_read_returns_copies():
+    buffer = SampleRingBuffer(capacity=4, channels=2)
+    buffer.write(*_block(0, 4))
+    values, _ = buffer.read()
+    buffer.write(*_block(10, 4))
+    np.testing.assert_array_equal(values[:, 0], [0, 1, 2, 3])
+
+
+def test_read_max_samples():
+    buffer = SampleRingBuffer(capacity=8, channels=2)
+    buffer.write(*_block(0, 6))
+    values, _ = buffer.read(max_samples=4)
+    np.testing.assert_array_equal(values[:, 0], [0, 1, 2, 3])
+    assert buffer.occupancy() == 2
+
+
+def test_drop_oldest_keeps_newest_samples():
+    buffer = SampleRingBuffer(capacity=8, channels=2, policy='drop_oldest')
+    buffer.write(*_block(0, 6))
+    assert buffer.write(*_block(6, 5)) == 5
+    values, timestamps = buffer.read()
+    np.testing.assert_array_equal(timestamps, np.arange(3, 11))
+    assert buffer.get_stats()['dropped_oldest'] == 3
+
+
+def test_drop_oldest_oversized_block():
+    buffer = SampleRingBuffer(capacity=4, channels=2, policy='drop_oldest')
+    buffer.write(*_block(0, 10))
+    _, timestamps = buffer.read()
+    np.testing.assert_array_equal(timestamps, [6, 7, 8, 9])
+    assert buffer.get_stats()['dropped_oldest'] == 6
+
+
+def test_drop_newest_keeps_buffered_samples():
+    buffer = SampleRingBuffer(capacity=8, channels=2, policy='drop_newest')
+    buffer.write(*_block(0, 6))
+    assert buffer.write(*_block(6, 5)) == 2
+    _, timestamps = buffer.read()
+    np.testing.assert_array_equal(timestamps, np.arange(8))
+    assert buffer.get_stats()['dropped_newest'] == 3
+
+
+def test_block_policy_times_out_and_drops_newest():
+    buffer = SampleRingBuffer(capacity=4, channels=2, policy='block', block_timeout=0.01)
+    buffer.write(*_block(0, 4))
+    assert buffer.write(*_block(4, 2)) == 0
+    stats = buffer.get_stats()
+    assert stats['block_timeouts'] == 1
+    assert stats['dropped_newest'] == 2
+
+
+def test_block_policy_waits_for_consumer():
+    buffer = SampleRingBuffer(capacity=4, channels=2, policy='block', block_timeout=5.0)
+    buffer.write(*_block(0, 4))
+    consumer = threading.Timer(0.05, buffer.read)
+    consumer.start()
+    assert buffer.write(*_block(4, 4)) == 4
+    consumer.join()
+    _, timestamps = buffer.read()
+    np.testing.assert_array_equal(timestamps, [4, 5, 6, 7])
+
+
+def test_channel_mismatch_raises():
+    buffer = SampleRingBuffer(capacity=4, channels=2)
+    with pytest.raises(ValueError):
+        buffer.write(np.zeros((2, 3)), np.zeros(2))
+
+
+def test_unknown_policy_raises():
+    with pytest.raises(ValueError):
+        SampleRingBuffer(policy='overwrite')
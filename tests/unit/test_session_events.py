@@ -0,0 +1,58 @@
+"""会话房间：connection_status / notification 只发送到订阅了该会话的客户端"""
+
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO
+
+from backend.services import stream_service
+from backend.services.stream_service import emit_session_event, init_stream_service
+
+
+@pytest.fixture
+def socketio(monkeypatch):
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading')
+    monkeypatch.setattr(stream_service, 'stream_service', None)
+    init_stream_service(socketio)
+    return app, socketio
+
+
+def _received(client, event):
+    return [message['args'][0] for message in client.get_received() if message['name'] == event]
+
+
+def test_session_events_reach_only_subscribers(socketio):
+    app, io = socketio
+    bed_a, bed_b = io.test_client(app), io.test_client(app)
+    bed_a.emit('ecg_subscribe', {'session_id': 'A'}, callback=True)
+    bed_b.emit('ecg_subscribe', {'session_id': 'B', 'points_per_second': 100}, callback=True)
+    bed_a.get_received(), bed_b.get_received()
+
+    emit_session_event(io, 'A', 'connection_status', {'status': 'connected', 'type': 'udp'})
+    assert _received(bed_a, 'connection_status') == [{'status': 'connected', 'type': 'udp', 'session_id': 'A'}]
+    assert _received(bed_b, 'connection_status') == []
+
+
+def test_changing_subscription_keeps_session_room_until_unsubscribe(socketio):
+    app, io = socketio
+    client = io.test_client(app)
+    client.emit('ecg_subscribe', {'session_id': 'A'}, callback=True)
+    client.emit('ecg_subscribe', {'session_id': 'A', 'leads': [1]}, callback=True)
+    emit_session_event(io, 'A', 'notification', {'message': 'x'})
+    assert len(_received(client, 'notification')) == 1
+
+    assert client.emit('ecg_unsubscribe', {'session_id': 'A'}, callback=True)['success']
+    emit_session_event(io, 'A', 'notification', {'message': 'y'})
+    assert _received(client, 'notification') == []
+
+
+def test_broadcast_without_stream_service(monkeypatch):
+    sent = []
+
+    class Recorder:
+        def emit(self, event, data, **kwargs):
+            sent.append((event, data, kwargs))
+
+    monkeypatch.setattr(stream_service, 'stream_service', None)
+    emit_session_event(Recorder(), 'A', 'notification', {'message': 'x'})
+    assert sent == [('notification', {'message': 'x', 'session_id': 'A'}, {})]
@@ -0,0 +1,92 @@
+"""SharedLeadRing 的共享内存布局、跨映射读取和覆盖检测"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from backend.utils.ring_buffer import SharedLeadRing
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _block(start, n, leads=2):
+    values = np.tile(np.arange(start, start + n, dtype=np.float32), (leads, 1))
+    return values, np.arange(start, start + n) / 500.0
+
+
+@pytest.fixture
+def ring():
+    ring = SharedLeadRing(capacity=10, leads=2)
+    yield ring
+    ring.close()
+
+
+def test_samples_written_by_attached_process_are_visible(ring):
+    # 与处理分片相同：工作进程连接共享内存并写入，创建方读取
+    writer = (
+        "import sys\n"
+        "import numpy as np\n"
+        "from backend.utils.ring_buffer import SharedLeadRing\n"
+        "ring = SharedLeadRing.attach(sys.argv[1])\n"
+        "position = 0\n"
+        "for n in (4, 7, 6):\n"
+        "    ring.append(np.tile(np.arange(position, position + n, dtype=np.float32), (ring.leads, 1)),\n"
+        "                np.arange(position, position + n) / 500.0)\n"
+        "    position += n\n"
+        "print(ring.capacity, ring.leads)\n"
+        "ring.close()\n"
+    )
+    result = subprocess.run([sys.executable, '-c', writer, ring.name], cwd=PROJECT_ROOT, capture_output=True,
+                            text=True, timeout=60, check=True)
+    assert result.stdout.split() == ['10', '2']
+    assert ring.write_count == 17
+    times, values = ring.latest()
+    np.testing.assert_array_equal(values[1], np.arange(7, 17))
+    np.testing.assert_allclose(times, np.arange(7, 17) / 500.0)
+    np.testing.assert_array_equal(ring.latest_indices(), np.arange(7, 17))
+
+
+def test_copy_since_drops_samples_overwritten_during_copy(ring):
+    ring.append(*_block(0, 8))
+    # 读取方取得 write_count 后，写入方又写入了 5 个样本，覆盖了位置 0..2 的槽位
+    count = ring.write_count
+    ring.append(*_block(8, 5))
+    _, values, indices, skipped = ring.copy_since(0, count)
+    np.testing.assert_array_equal(indices, [3, 4, 5, 6, 7])
+    np.testing.assert_array_equal(values[0], [3, 4, 5, 6, 7])
+    assert skipped == 3
+
+
+def test_copy_since_counts_samples_lost_before_read(ring):
+    ring.append(*_block(0, 25))
+    _, _, indices, skipped = ring.copy_since(0)
+    np.testing.assert_array_equal(indices, np.arange(15, 25))
+    assert skipped == 15
+
+
+def test_copy_since_without_concurrent_write(ring):
+    ring.append(*_block(0, 6))
+    _, _, indices, skipped = ring.copy_since(2)
+    np.testing.assert_array_equal(indices, [2, 3, 4, 5])
+    assert skipped == 0
+
+
+def test_reset_clears_write_position(ring):
+    ring.append(*_block(0, 6))
+    ring.reset()
+    assert ring.write_count == 0
+    ring.append(*_block(0, 3))
+    _, _, indices, skipped = ring.copy_since(0)
+    assert len(indices) == 3
+    assert skipped == 0
+
+
+def test_owner_close_unlinks_segment():
+    ring = SharedLeadRing(capacity=4, leads=1)
+    name = ring.name
+    ring.close()
+    with pytest.raises(FileNotFoundError):
+        SharedLeadRing.attach(name)
@@ -0,0 +1,79 @@
+"""StreamingLeadFilter 的块间状态、频率响应和缺失样本处理"""
+
+import numpy as np
+
+from backend.processing.stream_filter import StreamingLeadFilter
+
+RATE = 500
+
+
+def _tone(freq, seconds=4.0, leads=2, amplitude=1.0):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return np.tile(amplitude * np.sin(2 * np.pi * freq * t), (leads, 1))
+
+
+def _amplitude(output, settle=RATE):
+    return np.abs(output[:, settle:]).max()
+
+
+def test_blockwise_output_equals_single_pass():
+    signal = np.random.default_rng(0).standard_normal((3, 2000))
+    whole = StreamingLeadFilter(sampling_rate=RATE, leads=3).process(signal)
+
+    stream = StreamingLeadFilter(sampling_rate=RATE, leads=3)
+    parts = [stream.process(signal[:, start:start + 137]) for start in range(0, 2000, 137)]
+    np.testing.assert_allclose(np.concatenate(parts, axis=1), whole, rtol=1e-5, atol=1e-5)
+    assert stream.samples_processed == 2000
+
+
+def test_baseline_offset_is_removed_without_startup_transient():
+    stream = StreamingLeadFilter(sampling_rate=RATE, leads=2)
+    output = stream.process(np.full((2, 1000), 5.0))
+    assert np.abs(output).max() < 1e-3
+
+
+def test_passband_kept_and_mains_and_drift_rejected():
+    passband = _amplitude(StreamingLeadFilter(sampling_rate=RATE, leads=2).process(_tone(10)))
+    mains = _amplitude(StreamingLeadFilter(sampling_rate=RATE, leads=2).process(_tone(50)))
+    drift = _amplitude(StreamingLeadFilter(sampling_rate=RATE, leads=2).process(_tone(0.05, seconds=40)),
+                       settle=10 * RATE)
+    assert 0.9 < passband < 1.1
+    assert mains < 0.05
+    assert drift < 0.05
+
+
+def test_missing_samples_stay_nan_and_state_stays_finite():
+    signal = _tone(10, seconds=1.0)
+    signal[0, 100:110] = np.nan
+    signal[1, 0:5] = np.nan
+    stream = StreamingLeadFilter(sampling_rate=RATE, leads=2)
+    output = stream.process(signal)
+    assert np.isnan(output[0, 100:110]).all()
+    assert np.isnan(output[1, 0:5]).all()
+    assert np.isfinite(output[0, :100]).all() and np.isfinite(output[0, 110:]).all()
+    assert np.isfinite(stream.zi).all()
+    assert np.isfinite(stream.process(_tone(10, seconds=0.1))).all()
+
+
+def test_all_missing_first_block_defers_initialisation():
+    stream = StreamingLeadFilter(sampling_rate=RATE, leads=2)
+    output = stream.process(np.full((2, 10), np.nan))
+    assert np.isnan(output).all()
+    assert stream.zi is None
+    assert np.isfinite(stream.process(np.ones((2, 10)))).all()
+
+
+def test_reset_and_empty_block():
+    stream = StreamingLeadFilter(sampling_rate=RATE, leads=2)
+    stream.process(_tone(10, seconds=0.5))
+    stream.reset()
+    assert stream.zi is None and stream.samples_processed == 0
+    assert stream.process(np.empty((2, 0))).shape == (2, 0)
+
+
+def test_low_sampling_rate_falls_back_to_highpass():
+    stream = StreamingLeadFilter(sampling_rate=50, leads=1)
+    t = np.arange(500) / 50
+    output = stream.process(np.sin(2 * np.pi * 5 * t)[None, :])
+    assert np.isfinite(output).all()
+    assert 0.8 < np.abs(output[:, 100:]).max() < 1.2
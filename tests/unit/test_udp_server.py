@@ -0,0 +1,90 @@
+"""UDPDeviceServer 新设备回调拒绝设备时的处理"""
+
+import socket
+import time
+
+import pytest
+
+from backend.devices.udp_server import UDPDeviceServer
+
+
+class SessionLimit:
+    """与 ecg_manager 相同：会话数达到上限时在新设备回调中抛出 RuntimeError"""
+
+    def __init__(self, max_sessions):
+        self.max_sessions = max_sessions
+        self.accepted = []
+        self.calls = 0
+
+    def __call__(self, session):
+        self.calls += 1
+        if len(self.accepted) >= self.max_sessions:
+            raise RuntimeError(f"会话数已达上限 {self.max_sessions}")
+        self.accepted.append(session.device_key)
+
+
+@pytest.fixture
+def server():
+    server = UDPDeviceServer(local_ip='127.0.0.1', local_port=0)
+    server.open()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def devices():
+    socks = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(2)]
+    for sock in socks:
+        sock.bind(('127.0.0.1', 0))
+    yield socks
+    for sock in socks:
+        sock.close()
+
+
+def _send_and_drain(server, devices, now):
+    for sock in devices:
+        sock.sendto(b'\x00' * 16, server.socket.getsockname())
+    time.sleep(0.05)
+    buffer = bytearray(server.max_datagram_size)
+    server._drain(server.socket, buffer, memoryview(buffer), now)
+
+
+def test_device_rejected_at_max_sessions_is_not_registered(server, devices):
+    limit = SessionLimit(max_sessions=1)
+    server.on_session_created(limit)
+    now = time.time()
+    _send_and_drain(server, devices, now)
+
+    accepted = devices[0].getsockname()
+    assert list(server.sessions) == [accepted]
+    assert server.stats['sessions_created'] == 1
+    assert server.stats['sessions_rejected'] == 1
+    assert server.stats['datagrams_rejected'] == 1
+
+    # 拒绝期内不再为该设备调用回调，数据报直接丢弃
+    _send_and_drain(server, devices, now + 1.0)
+    assert limit.calls == 2
+    assert server.stats['datagrams_rejected'] == 2
+    assert server.sessions[accepted].stats['datagrams_received'] == 2
+
+    # 拒绝期过后有空位时接受该设备
+    limit.max_sessions = 2
+    _send_and_drain(server, devices, now + server.reject_interval + 1.0)
+    assert set(server.sessions) == {sock.getsockname() for sock in devices}
+    assert not server.rejected
+
+
+def test_reject_session_removes_registered_device(server, devices):
+    evicted = []
+    server.on_session_evicted(evicted.append)
+    _send_and_drain(server, devices[:1], time.time())
+    key = devices[0].getsockname()
+    session = server.sessions[key]
+
+    server.reject_session(key)
+    assert key not in server.sessions
+    assert not session.is_running
+    assert evicted == []
+    _send_and_drain(server, devices[:1], time.time())
+    assert key not in server.sessions
+    assert server.get_stats()['rejected_devices'] == 1